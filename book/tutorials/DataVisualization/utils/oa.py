@@ -1,25 +1,155 @@
 import os
-import ee
-import geemap
+import time
+import hashlib
+import threading
 import json
 import requests
+import urllib.parse
 import numpy as np
 import pandas as pd
 import matplotlib.pylab as plt
+from matplotlib.colors import LogNorm
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timedelta
-import rasterio as rio
-from rasterio import plot
-from rasterio import warp
 
+# use a faster json parser if it's installed
 try:
-    ee.Initialize()
-except: 
-    ee.Authenticate()
-    ee.Initialize()
+    import orjson
+except ImportError:
+    orjson = None
+
+# Earth Engine, geemap and rasterio are only needed for the satellite imagery
+# (makeGEEmap and plotDataAndMap), the OpenAltimetry data works without them
+try:
+    import ee
+    import geemap
+except ImportError:
+    ee = geemap = None
+try:
+    import rasterio as rio
+    from rasterio import plot
+    from rasterio import warp
+except ImportError:
+    rio = plot = warp = None
+
+if ee is not None:
+    try:
+        ee.Initialize()
+    except: 
+        ee.Authenticate()
+        ee.Initialize()
+
+class dataCache:
+    # a disk cache of decoded OpenAltimetry responses, stored as compressed parquet files
+    # (or compressed pickles if no parquet engine is installed), with an expiry time and a size cap
+    # - each file is named <key>.<creation time><extension>, so responses expire a fixed time after the request
+    # - the modification time of each file is the last time it was used, for evicting the least recently used ones
+    extensions = ['.parquet', '.pkl.gz']
+
+    def __init__(self, directory=None, ttl=7*86400, max_bytes=2**30):
+        if directory is None:
+            cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join('~', '.cache'))
+            directory = os.path.join(cache_home, 'openaltimetry')
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # the collectors of a batch share one cache between their threads
+        self.lock = threading.Lock()
+        if not os.path.exists(self.directory): os.makedirs(self.directory)
+
+    @staticmethod
+    def key(url):
+        # normalize the url so the same request always maps to the same file
+        parts = urllib.parse.urlsplit(url)
+        query = sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query) if k != 'client')
+        normalized = urllib.parse.urlunsplit((parts.scheme, parts.netloc.lower(), parts.path,
+                                              urllib.parse.urlencode(query), ''))
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def files(self, key=None):
+        prefix = '' if key is None else key + '.'
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                if f.startswith(prefix) and any(f.endswith(ext) for ext in self.extensions)]
+
+    @staticmethod
+    def remove(filename):
+        # another thread or process may have removed the file already
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def get(self, url):
+        key = self.key(url)
+        for filename in sorted(self.files(key), reverse=True):
+            created = int(os.path.basename(filename)[len(key)+1:].split('.')[0])
+            # drop expired responses
+            if (self.ttl is not None) and (time.time() - created > self.ttl):
+                self.remove(filename)
+                continue
+            try:
+                df = pd.read_parquet(filename) if filename.endswith('.parquet') else pd.read_pickle(filename)
+                # remember when this file was last used, for evicting the least recently used files
+                os.utime(filename, None)
+            except (ImportError, ValueError, OSError):
+                return None
+            return df
+        return None
+
+    def put(self, url, df):
+        key = self.key(url)
+        filename = os.path.join(self.directory, '%s.%d' % (key, time.time()))
+        temp = '%s.%d.%d.tmp' % (filename, os.getpid(), threading.get_ident())
+        try:
+            try:
+                df.to_parquet(temp, compression='zstd')
+                filename += '.parquet'
+            except ImportError:
+                df.to_pickle(temp, compression='gzip')
+                filename += '.pkl.gz'
+            os.replace(temp, filename)
+        finally:
+            self.remove(temp)
+        # remove older copies of the same response
+        for f in self.files(key):
+            if f != filename:
+                self.remove(f)
+        self.evict()
+
+    def evict(self):
+        # remove the least recently used files until the cache fits into max_bytes
+        if self.max_bytes is None:
+            return
+        with self.lock:
+            files = []
+            for f in self.files():
+                try:
+                    stat = os.stat(f)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, f))
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            while files and (total > self.max_bytes):
+                _, size, f = files.pop(0)
+                total -= size
+                self.remove(f)
+
+    def clear(self):
+        for f in self.files():
+            self.remove(f)
 
 class dataCollector:
-    def __init__(self, beam=None, oaurl=None, track=None, date=None, latlims=None, lonlims=None, verbose=False):
+    # the columns of the dataframe for each product
+    product_columns = {'atl03': ['lat','lon','h','conf'],
+                       'atl06': ['lat','lon','h'],
+                       'atl08': ['lat','lon','h','canopy']}
+    # the ATL03 photon confidence classes, from lowest to highest
+    confidence_classes = ['Noise', 'Buffer', 'Low', 'Medium', 'High']
+
+    def __init__(self, beam=None, oaurl=None, track=None, date=None, latlims=None, lonlims=None, verbose=False,
+                 session=None, cache=None):
         if (beam is None) or ((oaurl is None) and (None in [track, date, latlims, lonlims])):
             raise Exception('''Please specify a beam and 
             - either: an OpenAltimetry API url, 
@@ -60,6 +190,10 @@ class dataCollector:
             self.beam = beam
             self.latlims = latlims
             self.lonlims = lonlims
+            # keep connections to OpenAltimetry alive between requests (can be shared between collectors)
+            self.session = session if session is not None else requests.Session()
+            # cache=True uses the default cache directory, or pass a dataCache
+            self.cache = dataCache() if cache is True else cache
             if verbose:
                 print('OpenAltimetry API URL:', self.url)
                 print('Date:', self.date)
@@ -68,42 +202,128 @@ class dataCollector:
                 print('Latitude limits:', self.latlims)
                 print('Longitude limits:', self.lonlims)
             
-    def requestData(self, verbose=False): 
+    def requestData(self, verbose=False, timeout=60):
         if verbose:
-            print('---> requesting ATL03 data...',end='')
-        product = 'atl03'
-        request_url = self.url.replace('atlXX',product)
-        data = requests.get(request_url).json()
-        lat, lon, h, confs = [], [], [], []
-        for beam in data:
-            for confidence in beam['series']:
-                for p in confidence['data']:
-                    confs.append(confidence['name'])
-                    lat.append(p[0])
-                    lon.append(p[1])
-                    h.append(p[2])
-        self.atl03 = pd.DataFrame(list(zip(lat,lon,h,confs)), columns = ['lat','lon','h','conf'])
-        if verbose:
-            print(' Done.')
-            
-            print('---> requesting ATL06 data...',end='')
-        product = 'atl06'
-        request_url = self.url.replace('atlXX',product)
-        data = requests.get(request_url).json()
-        self.atl06 = pd.DataFrame(data['series'][0]['lat_lon_elev'], columns = ['lat','lon','h'])
-        if verbose:
-            print(' Done.')
-            
-            print('---> requesting ATL08 data...',end='')
-        product = 'atl08'
-        request_url = self.url.replace('atlXX',product)
-        data = requests.get(request_url).json()
-        self.atl08 = pd.DataFrame(data['series'][0]['lat_lon_elev_canopy'], columns = ['lat','lon','h','canopy'])
+            print('---> requesting ATL03, ATL06 and ATL08 data...',end='')
+
+        # get the data for one product and turn it into a dataframe
+        decoders = {'atl03': self.decode_atl03, 'atl06': self.decode_atl06, 'atl08': self.decode_atl08}
+        def fetch(product):
+            request_url = self.url.replace('atlXX',product)
+            # use the cached data from an earlier request if we have it
+            if self.cache is not None:
+                df = self.cache.get(request_url)
+                if df is not None:
+                    return df
+            response = self.session.get(request_url, timeout=timeout)
+            response.raise_for_status()
+            data = orjson.loads(response.content) if orjson is not None else response.json()
+            df = decoders[product](data)
+            # a full or unwritable cache shouldn't lose the data we already have
+            if self.cache is not None:
+                try:
+                    self.cache.put(request_url, df)
+                except OSError:
+                    pass
+            return df
+
+        # request all three products at the same time, so we only wait for the slowest one
+        self.request_errors = {}
+        with ThreadPoolExecutor(max_workers=len(decoders)) as executor:
+            futures = {product: executor.submit(fetch, product) for product in decoders}
+            for product, future in futures.items():
+                try:
+                    df = future.result()
+                except (requests.exceptions.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+                    # keep going with an empty dataframe (with the usual dtypes) if one of the products fails
+                    self.request_errors[product] = e
+                    df = self.empty_product(product)
+                setattr(self, product, df)
+
         if verbose:
             print(' Done.')
+            for product, e in self.request_errors.items():
+                print('---> %s request failed: %s' % (product.upper(), e))
+
+    @classmethod
+    def empty_product(cls, product):
+        if product == 'atl03':
+            return cls.decode_atl03([])
+        return cls.decode_series([], cls.product_columns[product])
+
+    def require(self, product):
+        # raise a clear error if a product failed to download or has no data in the region
+        df = getattr(self, product)
+        if len(df) == 0:
+            reason = getattr(self, 'request_errors', {}).get(product, 'no data in the requested region')
+            raise Exception('No %s data for track %s-%s on %s: %s' % (product.upper(), self.track, self.beam,
+                                                                      self.date, reason))
+        return df
+
+    @classmethod
+    def decode_atl03(cls, data):
+        # convert each confidence series to arrays in one go, instead of appending photon by photon
+        arrays, codes = [], []
+        categories = list(cls.confidence_classes)
+        for beam in data:
+            for confidence in beam['series']:
+                if confidence['name'] not in categories:
+                    categories.append(confidence['name'])
+                photons = np.asarray(confidence['data'], dtype=float)
+                if photons.ndim < 2:
+                    photons = photons.reshape(-1, 3)
+                arrays.append(photons[:,:3])
+                codes.append(np.full(len(photons), categories.index(confidence['name']), dtype=np.int8))
+        photons = np.concatenate(arrays) if arrays else np.empty((0,3))
+        codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int8)
+
+        # build the dataframe column by column, with the confidence as a categorical
+        return pd.DataFrame({'lat': photons[:,0],
+                             'lon': photons[:,1],
+                             'h': photons[:,2],
+                             'conf': pd.Categorical.from_codes(codes, categories=categories)})
+
+    @staticmethod
+    def decode_series(values, columns):
+        values = np.asarray(values, dtype=float)
+        if values.ndim < 2:
+            values = values.reshape(-1, len(columns))
+        return pd.DataFrame({c: values[:,i] for i, c in enumerate(columns)}, columns=columns)
+
+    @classmethod
+    def decode_atl06(cls, data):
+        return cls.decode_series(data['series'][0]['lat_lon_elev'], ['lat','lon','h'])
+
+    @classmethod
+    def decode_atl08(cls, data):
+        return cls.decode_series(data['series'][0]['lat_lon_elev_canopy'], ['lat','lon','h','canopy'])
     
     ################################################################################################ 
-    def plotData(self,ax=None,title='some Data I found on OpenAltimetry'):
+    @staticmethod
+    def sample_photons(atl03, max_points, seed=0):
+        # pick at most max_points photons, sharing them out evenly between the confidence classes
+        # (classes with fewer photons than their share keep all of them, and pass the rest on to the others)
+        codes = pd.Categorical(atl03.conf).codes
+        classes, counts = np.unique(codes, return_counts=True)
+        rng = np.random.default_rng(seed)
+        remaining = max_points
+        keep = []
+        for i, c in enumerate(np.argsort(counts)):
+            share = remaining // (len(classes) - i)
+            members = np.flatnonzero(codes == classes[c])
+            if len(members) > share:
+                members = rng.choice(members, size=share, replace=False)
+            keep.append(members)
+            remaining -= len(members)
+        return np.sort(np.concatenate(keep)) if keep else np.empty(0, dtype=int)
+
+    ################################################################################################ 
+    def plotData(self,ax=None,title='some Data I found on OpenAltimetry',mode='auto',max_points=50000,bins=(1000,500)):
+        # how to draw the ATL03 photons:
+        # - 'scatter': every photon
+        # - 'sample': at most max_points photons, stratified by confidence class
+        # - 'density': a 2D histogram of photon counts along latitude and height (with bins bins)
+        # - 'auto': 'scatter' if there are no more than max_points photons, 'sample' otherwise
 
         # get data if not already there
         if 'atl03' not in vars(self).keys(): 
@@ -115,23 +335,49 @@ class dataCollector:
         # create the figure and axis
         if axes_not_specified:
             fig, ax = plt.subplots(figsize=[10,6])
-        atl03 = ax.scatter(self.atl03.lat, self.atl03.h, s=2, color='black', alpha=0.2, label='ATL03')
-        atl06, = ax.plot(self.atl06.lat, self.atl06.h, label='ATL06')
-        atl08, = ax.plot(self.atl08.lat, self.atl08.h, label='ATL08', linestyle='--')
 
+        # the photons are needed for the axis limits, but ATL06 or ATL08 can be missing
+        self.require('atl03')
         heights = self.atl03.h[self.atl03.conf != 'Noise']
-        y_min1 = np.min(heights)
-        y_max1 = np.max(heights)
-        maxprods = np.nanmax((self.atl06.h.max(), self.atl08.h.max()))
-        minprods = np.nanmin((self.atl06.h.min(), self.atl08.h.min()))
-        hrange = maxprods - minprods
-        y_min2 = minprods - hrange * 0.5
-        y_max2 = maxprods + hrange * 0.5
-        y_min = np.nanmin((y_min1, y_min2))
-        y_max = np.nanmax((y_max1, y_max2))
-
-        x_min = self.atl08.lat.min()
-        x_max = self.atl08.lat.max()
+        if len(heights) == 0:
+            heights = self.atl03.h
+        y_min = np.nanmin(heights)
+        y_max = np.nanmax(heights)
+        products = [df.h for df in (self.atl06, self.atl08) if df.h.notna().any()]
+        if products:
+            maxprods = max(h.max() for h in products)
+            minprods = min(h.min() for h in products)
+            hrange = maxprods - minprods
+            y_min = min(y_min, minprods - hrange * 0.5)
+            y_max = max(y_max, maxprods + hrange * 0.5)
+
+        # use the extent of the photons if there are no ATL08 segments
+        lats = self.atl08.lat if self.atl08.lat.notna().any() else self.atl03.lat
+        x_min = lats.min()
+        x_max = lats.max()
+
+        # plot the photons, keeping the number of drawn points fixed for large photon clouds
+        if mode == 'auto':
+            mode = 'scatter' if len(self.atl03) <= max_points else 'sample'
+        if mode == 'density':
+            counts, xedges, yedges = np.histogram2d(self.atl03.lat, self.atl03.h, bins=bins, 
+                                                    range=[[x_min, x_max], [y_min, y_max]])
+            counts = np.ma.masked_equal(counts, 0)
+            ax.imshow(counts.T, origin='lower', extent=[x_min, x_max, y_min, y_max], aspect='auto',
+                      cmap='Greys', norm=LogNorm(vmin=1, vmax=max(counts.max(), 2)), interpolation='nearest')
+            atl03 = ax.scatter([], [], s=2, color='black', alpha=0.5, label='ATL03 (density)')
+        elif mode == 'sample':
+            idx = self.sample_photons(self.atl03, max_points)
+            atl03 = ax.scatter(self.atl03.lat.values[idx], self.atl03.h.values[idx], s=2, color='black', alpha=0.2,
+                               label='ATL03 (%d of %d photons)' % (len(idx), len(self.atl03)), rasterized=True)
+        elif mode == 'scatter':
+            atl03 = ax.scatter(self.atl03.lat, self.atl03.h, s=2, color='black', alpha=0.2, label='ATL03')
+        else:
+            raise Exception("mode has to be one of 'auto', 'scatter', 'sample' or 'density'.")
+
+        # the ATL06 and ATL08 lines are always drawn in full
+        atl06, = ax.plot(self.atl06.lat, self.atl06.h, label='ATL06')
+        atl08, = ax.plot(self.atl08.lat, self.atl08.h, label='ATL08', linestyle='--')
 
         ax.set_xlim((x_min, x_max))
         ax.set_ylim((y_min, y_max))
@@ -170,7 +416,7 @@ class dataCollector:
         hv.extension('bokeh', 'matplotlib')
         
         confdict = {'Noise': -1.0, 'Buffer': 0.0, 'Low': 1.0, 'Medium': 2.0, 'High': 3.0}
-        self.atl03['conf_num'] = [confdict[x] for x in self.atl03.conf]
+        self.atl03['conf_num'] = self.atl03.conf.map(confdict).astype(float)
         self.atl08['canopy_h'] = self.atl08.h + self.atl08.canopy
         atl03scat = hv.Scatter(self.atl03, 'lat', vdims=['h', 'conf_num'], label='ATL03')\
                     .opts(color='conf_num', alpha=1, cmap='dimgray_r')
@@ -195,6 +441,8 @@ class dataCollector:
     
     ################################################################################################
     def makeGEEmap(self, days_buffer=25):
+        if (ee is None) or (geemap is None):
+            raise ImportError('makeGEEmap needs the earthengine-api and geemap packages.')
 
         # get data if not already there
         if 'atl03' not in vars(self).keys(): 
@@ -212,8 +460,10 @@ class dataCollector:
             c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
             return R * c
 
-        lat1, lat2 = self.atl08.lat[0], self.atl08.lat.iloc[-1]
-        lon1, lon2 = self.atl08.lon[0], self.atl08.lon.iloc[-1]
+        # use the ATL08 segments for the ends of the track, or the photons if there are none
+        track = self.atl08 if len(self.atl08) else self.require('atl03')
+        lat1, lat2 = track.lat.iloc[0], track.lat.iloc[-1]
+        lon1, lon2 = track.lon.iloc[0], track.lon.iloc[-1]
         center_lat = (lat1 + lat2) / 2
         center_lon = (lon1 + lon2) / 2
         ground_track_length = dist_latlon2meters(lat1, lon1, lat2, lon2)
@@ -322,8 +572,10 @@ class dataCollector:
         return Map
     
     ################################################################################################
-    def plotDataAndMap(self, scene_id, crs='EPSG:3857', title='ICESat-2 Data'):
+    def plotDataAndMap(self, scene_id, crs='EPSG:3857', title='ICESat-2 Data', mode='auto', max_points=50000):
 
+        if (ee is None) or (rio is None):
+            raise ImportError('plotDataAndMap needs the earthengine-api and rasterio packages.')
         from utils.curve_intersect import intersection
 
         # get data if not already there
@@ -334,7 +586,7 @@ class dataCollector:
         # plot the ICESat-2 data
         fig = plt.figure(figsize=[12,5])
         ax_data = fig.add_subplot(122)
-        self.plotData(ax_data, title=title)
+        self.plotData(ax_data, title=title, mode=mode, max_points=max_points)
 
         # get the image and plot
         ax_img = fig.add_subplot(121)
@@ -350,8 +602,10 @@ class dataCollector:
             c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
             return R * c
 
-        lat1, lat2 = self.atl08.lat[0], self.atl08.lat.iloc[-1]
-        lon1, lon2 = self.atl08.lon[0], self.atl08.lon.iloc[-1]
+        # use the ATL08 segments for the ends of the track, or the photons if there are none
+        track = self.atl08 if len(self.atl08) else self.require('atl03')
+        lat1, lat2 = track.lat.iloc[0], track.lat.iloc[-1]
+        lon1, lon2 = track.lon.iloc[0], track.lon.iloc[-1]
         center_lat = (lat1 + lat2) / 2
         center_lon = (lon1 + lon2) / 2
         ground_track_length = dist_latlon2meters(lat1, lon1, lat2, lon2)
@@ -507,4 +761,86 @@ class dataCollector:
         fig.savefig(plot_filename,dpi=600)
         print('Saved plot to: %s' % plot_filename)
 
-        return fig
\ No newline at end of file
+        return fig
+
+################################################################################################
+class batchCollector:
+    # all six ICESat-2 beams
+    all_beams = ['gt1l', 'gt1r', 'gt2l', 'gt2r', 'gt3l', 'gt3r']
+
+    def __init__(self, beams=None, oaurl=None, tracks=None, dates=None, latlims=None, lonlims=None, verbose=False,
+                 session=None, cache=None, max_workers=8):
+        # default to all six beams
+        beams = self.all_beams if beams is None else ([beams] if isinstance(beams, str) else list(beams))
+        if (oaurl is None) and (None in [tracks, dates, latlims, lonlims]):
+            raise Exception('''Please specify
+            - either: one or more OpenAltimetry API urls, 
+            - or: tracks, dates, latitude limits and longitude limits.''')
+
+        # share one session between all collectors, with enough connections for all requests at once
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=3*max_workers)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+        self.cache = dataCache() if cache is True else cache
+        self.max_workers = max_workers
+
+        # one collector for each track/date and beam
+        # (tracks and dates are paired up, since each track is only measured on its own dates)
+        if oaurl is not None:
+            urls = [oaurl] if isinstance(oaurl, str) else list(oaurl)
+            requests_list = [dict(oaurl=url) for url in urls]
+        else:
+            tracks = [tracks] if np.isscalar(tracks) else list(tracks)
+            dates = [dates] if isinstance(dates, str) else list(dates)
+            if len(tracks) == 1: tracks = tracks * len(dates)
+            if len(dates) == 1: dates = dates * len(tracks)
+            if len(tracks) != len(dates):
+                raise Exception('Please specify the same number of tracks and dates, or a single one of either.')
+            requests_list = [dict(track=track, date=date, latlims=latlims, lonlims=lonlims)
+                             for track, date in zip(tracks, dates)]
+        self.collectors = [dataCollector(beam=beam, session=self.session, cache=self.cache, **kwargs)
+                           for kwargs in requests_list for beam in beams]
+        if verbose:
+            print('Collecting %d track/date/beam combinations.' % len(self.collectors))
+
+    def requestData(self, verbose=False, timeout=60):
+        if verbose:
+            print('---> requesting ATL03, ATL06 and ATL08 data for %d beams...' % len(self.collectors), end='')
+
+        # request all collectors at the same time (each of them requests its three products at the same time)
+        def request(c):
+            try:
+                c.requestData(timeout=timeout)
+            except Exception as e:
+                # record the failure for this collector, instead of losing the data of all the others
+                c.request_errors = {product: e for product in dataCollector.product_columns}
+                for product in dataCollector.product_columns:
+                    setattr(c, product, c.empty_product(product))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(request, self.collectors))
+
+        # stack everything into one long table per product, with columns for the track, date and beam
+        self.request_errors = {}
+        for product, columns in dataCollector.product_columns.items():
+            frames = []
+            for c in self.collectors:
+                if product in c.request_errors:
+                    self.request_errors[(c.track, c.date, c.beam, product)] = c.request_errors[product]
+                df = getattr(c, product)
+                if len(df) > 0:
+                    frames.append(df.assign(track=c.track, date=c.date, beam=c.beam))
+            if frames:
+                df = pd.concat(frames, ignore_index=True)
+                df['beam'] = pd.Categorical(df['beam'], categories=self.all_beams)
+            else:
+                df = dataCollector.empty_product(product).assign(track=None, date=None)
+                df['beam'] = pd.Categorical([], categories=self.all_beams)
+            setattr(self, product, df)
+
+        if verbose:
+            print(' Done.')
+            for (track, date, beam, product), e in self.request_errors.items():
+                print('---> %s request failed for track %s-%s on %s: %s' % (product.upper(), track, beam, date, e))
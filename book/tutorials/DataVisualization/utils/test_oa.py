@@ -0,0 +1,367 @@
+"""
+Tests for collecting and plotting OpenAltimetry data with oa.py
+
+The OpenAltimetry API is replaced by a local http server, so no network
+connection is needed. The satellite imagery (makeGEEmap and plotDataAndMap)
+needs an Earth Engine account and is not tested, so the tests also run
+without the earthengine-api, geemap and rasterio packages.
+
+Run from book/tutorials/DataVisualization:
+    python -m pytest utils/test_oa.py
+"""
+import json
+import threading
+import http.server
+import urllib.parse
+import numpy as np
+import pandas as pd
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+from utils import oa
+
+# a small OpenAltimetry response for each product
+def atl03_response(n=20):
+    return [{'beam_name': 'gt1l', 'series': [{'name': name, 'data': [[60 + i*1e-4, -50 + i*1e-5, 100.0 + i]
+                                                                     for i in range(n)]}
+                                             for name in ['Noise', 'Low', 'High']]}]
+
+def atl06_response(n=10):
+    return {'series': [{'beam': 'gt1l', 'lat_lon_elev': [[60 + i*1e-3, -50 + i*1e-4, 100.0 + i] for i in range(n)]}]}
+
+def atl08_response(n=10):
+    return {'series': [{'beam': 'gt1l', 'lat_lon_elev_canopy': [[60 + i*1e-3, -50 + i*1e-4, 100.0 + i, 5.0]
+                                                                for i in range(n)]}]}
+
+class OpenAltimetryServer(http.server.ThreadingHTTPServer):
+    # local stand-in for the OpenAltimetry API, with the response (status, body) for each product
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), OpenAltimetryHandler)
+        self.responses = {'atl03': (200, atl03_response()),
+                          'atl06': (200, atl06_response()),
+                          'atl08': (200, atl08_response())}
+        self.requests = []
+
+    def url(self, track=338, date='2019-04-20', beam='gt1l'):
+        return ('http://127.0.0.1:%d/data/api/icesat2/atl03?date=%s&minx=-50.0&miny=60.0&maxx=-49.0&maxy=61.0'
+                '&trackId=%d&beamName=%s&outputFormat=json' % (self.server_address[1], date, track, beam))
+
+class OpenAltimetryHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        product = url.path.split('/')[-1]
+        self.server.requests.append((product, dict(urllib.parse.parse_qsl(url.query))))
+        status, body = self.server.responses.get(product, (404, None))
+        # bodies can be a response for each track and beam
+        if callable(body):
+            status, body = body(dict(urllib.parse.parse_qsl(url.query)))
+        content = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+@pytest.fixture
+def server():
+    server = OpenAltimetryServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_request_data(server):
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    assert (collector.track, collector.date, collector.beam) == (338, '2019-04-20', 'gt1l')
+    collector.requestData()
+    assert collector.request_errors == {}
+    assert len(collector.atl03) == 60 and len(collector.atl06) == 10 and len(collector.atl08) == 10
+    # the three products are requested for the same beam
+    assert sorted(product for product, query in server.requests) == ['atl03', 'atl06', 'atl08']
+    assert all(query['beamName'] == 'gt1l' for product, query in server.requests)
+
+@pytest.mark.parametrize('status,body', [(500, b''), (200, b'not json'), (200, {'series': []})])
+def test_request_errors(server, status, body):
+    # a failed product leaves an empty dataframe with the usual columns and dtypes
+    server.responses['atl08'] = (status, body)
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    collector.requestData()
+    assert list(collector.request_errors) == ['atl08']
+    assert list(collector.atl08.columns) == ['lat', 'lon', 'h', 'canopy']
+    assert len(collector.atl08) == 0 and (collector.atl08.dtypes == float).all()
+    assert len(collector.require('atl03')) == 60
+    with pytest.raises(Exception, match='No ATL08 data for track 338-gt1l'):
+        collector.require('atl08')
+
+def test_request_empty_region(server):
+    server.responses['atl06'] = (200, {'series': [{'beam': 'gt1l', 'lat_lon_elev': []}]})
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    collector.requestData()
+    assert collector.request_errors == {}
+    with pytest.raises(Exception, match='no data in the requested region'):
+        collector.require('atl06')
+
+def test_plot_failed_products(server):
+    # photons are plotted without the ATL06 and ATL08 lines
+    server.responses['atl06'] = (500, b'')
+    server.responses['atl08'] = (500, b'')
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    collector.requestData()
+    fig = collector.plotData()
+    ax, = fig.axes
+    assert ax.get_xlim() == (collector.atl03.lat.min(), collector.atl03.lat.max())
+    # but not without the photons
+    server.responses['atl03'] = (500, b'')
+    collector.requestData()
+    with pytest.raises(Exception, match='No ATL03 data'):
+        collector.plotData()
+
+def test_imagery_needs_earth_engine(server, monkeypatch):
+    monkeypatch.setattr(oa, 'ee', None)
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    with pytest.raises(ImportError):
+        collector.makeGEEmap()
+    with pytest.raises(ImportError):
+        collector.plotDataAndMap('COPERNICUS/S2_SR/scene')
+
+def test_decode_atl03():
+    data = atl03_response(n=4)
+    data[0]['series'].append({'name': 'Unknown', 'data': [[61.0, -49.0, 7.0]]})
+    atl03 = oa.dataCollector.decode_atl03(data)
+    assert list(atl03.columns) == ['lat', 'lon', 'h', 'conf']
+    assert (atl03[['lat', 'lon', 'h']].dtypes == float).all()
+    # confidence classes keep their order, with any unknown classes at the end
+    assert list(atl03.conf.cat.categories) == ['Noise', 'Buffer', 'Low', 'Medium', 'High', 'Unknown']
+    assert atl03.conf.value_counts().to_dict() == {'Noise': 4, 'Buffer': 0, 'Low': 4, 'Medium': 0, 'High': 4,
+                                                   'Unknown': 1}
+    assert atl03.h.tolist() == [100.0, 101.0, 102.0, 103.0]*3 + [7.0]
+    assert atl03.iloc[-1][['lat', 'lon']].tolist() == [61.0, -49.0]
+
+def test_decode_atl03_multiple_beams():
+    data = atl03_response(n=2) + atl03_response(n=3)
+    atl03 = oa.dataCollector.decode_atl03(data)
+    assert len(atl03) == 15
+    assert atl03.conf.value_counts()['High'] == 5
+
+def test_decode_atl03_empty_series():
+    # classes without photons and responses without beams
+    data = [{'beam_name': 'gt1l', 'series': [{'name': 'High', 'data': []}]}]
+    for response in (data, []):
+        atl03 = oa.dataCollector.decode_atl03(response)
+        assert len(atl03) == 0
+        assert list(atl03.columns) == ['lat', 'lon', 'h', 'conf']
+        assert isinstance(atl03.conf.dtype, pd.CategoricalDtype)
+
+def test_decode_atl06_atl08():
+    atl06 = oa.dataCollector.decode_atl06(atl06_response(n=3))
+    assert list(atl06.columns) == ['lat', 'lon', 'h']
+    assert atl06.h.tolist() == [100.0, 101.0, 102.0]
+    atl08 = oa.dataCollector.decode_atl08(atl08_response(n=3))
+    assert list(atl08.columns) == ['lat', 'lon', 'h', 'canopy']
+    assert atl08.canopy.tolist() == [5.0]*3
+    # missing values are decoded as NaN
+    atl08 = oa.dataCollector.decode_atl08({'series': [{'lat_lon_elev_canopy': [[60.0, -50.0, 100.0, None]]}]})
+    assert np.isnan(atl08.canopy[0])
+
+def test_decode_without_orjson(server, monkeypatch):
+    monkeypatch.setattr(oa, 'orjson', None)
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    collector.requestData()
+    assert collector.request_errors == {}
+    assert len(collector.atl03) == 60
+
+def test_cache_key():
+    url = 'https://OpenAltimetry.org/data/api/icesat2/atl03?date=2019-04-20&trackId=338&client=jupyter'
+    # the same request in another order or from another client has the same key
+    assert oa.dataCache.key(url) == oa.dataCache.key(
+        'https://openaltimetry.org/data/api/icesat2/atl03?trackId=338&date=2019-04-20&client=portal')
+    assert oa.dataCache.key(url) != oa.dataCache.key(url.replace('atl03', 'atl06'))
+
+def test_cache_put_get(tmp_path):
+    cache = oa.dataCache(directory=tmp_path)
+    url = 'https://openaltimetry.org/data/api/icesat2/atl03?date=2019-04-20'
+    assert cache.get(url) is None
+    atl03 = oa.dataCollector.decode_atl03(atl03_response())
+    cache.put(url, atl03)
+    pd.testing.assert_frame_equal(cache.get(url), atl03)
+    # newer responses replace older ones
+    cache.put(url, atl03.iloc[:5])
+    assert len(cache.files()) == 1
+    assert len(cache.get(url)) == 5
+    cache.clear()
+    assert cache.files() == [] and cache.get(url) is None
+
+def test_cache_expiry(tmp_path, monkeypatch):
+    cache = oa.dataCache(directory=tmp_path, ttl=60)
+    url = 'https://openaltimetry.org/data/api/icesat2/atl06?date=2019-04-20'
+    cache.put(url, oa.dataCollector.decode_atl06(atl06_response()))
+    assert cache.get(url) is not None
+    # expired responses are removed
+    now = oa.time.time()
+    monkeypatch.setattr(oa.time, 'time', lambda: now + 120)
+    assert cache.get(url) is None
+    assert cache.files() == []
+
+def test_cache_eviction(tmp_path):
+    cache = oa.dataCache(directory=tmp_path, max_bytes=None)
+    urls = ['https://openaltimetry.org/data/api/icesat2/atl06?trackId=%d' % t for t in range(3)]
+    for i, url in enumerate(urls):
+        cache.put(url, oa.dataCollector.decode_atl06(atl06_response(n=1000)))
+        filename, = cache.files(cache.key(url))
+        oa.os.utime(filename, (1000 + i, 1000 + i))
+    size = oa.os.path.getsize(filename)
+    # the least recently used responses are evicted first
+    cache.get(urls[0])
+    cache.max_bytes = 2*size + size//2
+    cache.evict()
+    assert cache.get(urls[1]) is None
+    assert (cache.get(urls[0]) is not None) and (cache.get(urls[2]) is not None)
+
+def test_cache_collector(server, tmp_path):
+    cache = oa.dataCache(directory=tmp_path)
+    for i in range(2):
+        collector = oa.dataCollector(beam='gt1l', oaurl=server.url(), cache=cache)
+        collector.requestData()
+        assert len(collector.atl03) == 60
+    # the second collector only uses the cache
+    assert len(server.requests) == 3
+    # failed products are not cached
+    cache.clear()
+    server.responses['atl08'] = (500, b'')
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url(), cache=cache)
+    collector.requestData()
+    assert len(cache.files()) == 2
+
+def test_cache_threads(tmp_path):
+    # collectors in a batch share one cache between their threads
+    cache = oa.dataCache(directory=tmp_path, max_bytes=10**9)
+    atl06 = oa.dataCollector.decode_atl06(atl06_response())
+    urls = ['https://openaltimetry.org/data/api/icesat2/atl06?trackId=%d' % (t % 4) for t in range(32)]
+    with oa.ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda url: cache.put(url, atl06), urls))
+    assert len(cache.files()) == 4
+    assert not [f for f in oa.os.listdir(tmp_path) if f.endswith('.tmp')]
+    for url in urls[:4]:
+        pd.testing.assert_frame_equal(cache.get(url), atl06)
+
+def test_batch_collectors(server):
+    # all six beams by default, or a single beam
+    batch = oa.batchCollector(oaurl=server.url())
+    assert [c.beam for c in batch.collectors] == oa.batchCollector.all_beams
+    batch = oa.batchCollector(beams='gt2l', oaurl=[server.url(track=338), server.url(track=1000)])
+    assert [(c.track, c.beam) for c in batch.collectors] == [(338, 'gt2l'), (1000, 'gt2l')]
+    # all collectors share one session
+    assert all(c.session is batch.session for c in batch.collectors)
+
+def test_batch_tracks_and_dates():
+    # tracks and dates are paired up, or a single one of either is repeated
+    limits = dict(latlims=[60.0, 61.0], lonlims=[-50.0, -49.0])
+    batch = oa.batchCollector(beams=['gt1l'], tracks=[338, 1000], dates=['2019-04-20', '2019-06-17'], **limits)
+    assert [(c.track, c.date) for c in batch.collectors] == [(338, '2019-04-20'), (1000, '2019-06-17')]
+    batch = oa.batchCollector(beams=['gt1l'], tracks=338, dates=['2019-04-20', '2019-07-19'], **limits)
+    assert [(c.track, c.date) for c in batch.collectors] == [(338, '2019-04-20'), (338, '2019-07-19')]
+    with pytest.raises(Exception, match='same number of tracks and dates'):
+        oa.batchCollector(beams=['gt1l'], tracks=[338, 1000, 1001], dates=['2019-04-20', '2019-06-17'], **limits)
+    with pytest.raises(Exception, match='Please specify'):
+        oa.batchCollector(tracks=338, dates='2019-04-20')
+
+def test_batch_request_data(server):
+    batch = oa.batchCollector(beams=['gt1l', 'gt2l'], oaurl=[server.url(track=338), server.url(track=1000)])
+    batch.requestData()
+    assert batch.request_errors == {}
+    # one long table per product
+    assert len(batch.atl03) == 4*60 and len(batch.atl06) == 4*10 and len(batch.atl08) == 4*10
+    assert list(batch.atl08.columns) == ['lat', 'lon', 'h', 'canopy', 'track', 'date', 'beam']
+    assert list(batch.atl03.beam.cat.categories) == oa.batchCollector.all_beams
+    assert batch.atl06.groupby(['track', 'beam'], observed=True).size().to_dict() == {
+        (338, 'gt1l'): 10, (338, 'gt2l'): 10, (1000, 'gt1l'): 10, (1000, 'gt2l'): 10}
+    assert len(server.requests) == 12
+
+def test_batch_request_errors(server):
+    # one beam fails, the others keep their data
+    def atl06(query):
+        return (500, b'') if query['beamName'] == 'gt2r' else (200, atl06_response())
+    server.responses['atl06'] = (200, atl06)
+    batch = oa.batchCollector(oaurl=server.url())
+    batch.requestData()
+    assert list(batch.request_errors) == [(338, '2019-04-20', 'gt2r', 'atl06')]
+    assert len(batch.atl06) == 5*10 and 'gt2r' not in set(batch.atl06.beam)
+    assert len(batch.atl03) == 6*60
+
+def test_batch_request_all_failed(server):
+    for product in ['atl03', 'atl06', 'atl08']:
+        server.responses[product] = (500, b'')
+    batch = oa.batchCollector(beams=['gt1l', 'gt1r'], oaurl=server.url())
+    batch.requestData()
+    assert len(batch.request_errors) == 6
+    # empty tables with the usual columns
+    for product, columns in oa.dataCollector.product_columns.items():
+        df = getattr(batch, product)
+        assert len(df) == 0
+        assert list(df.columns) == columns + ['track', 'date', 'beam']
+        assert isinstance(df.beam.dtype, pd.CategoricalDtype)
+
+def make_photons(counts):
+    # photons with the given number of each confidence class
+    classes = oa.dataCollector.confidence_classes
+    codes = np.repeat(np.arange(len(counts), dtype=np.int8), counts)
+    return pd.DataFrame({'lat': np.linspace(60, 61, len(codes)),
+                         'lon': np.zeros(len(codes)),
+                         'h': np.arange(len(codes), dtype=float),
+                         'conf': pd.Categorical.from_codes(codes, categories=classes)})
+
+def test_sample_photons_keeps_small_clouds():
+    atl03 = make_photons([3, 0, 5, 2, 10])
+    idx = oa.dataCollector.sample_photons(atl03, max_points=100)
+    assert idx.tolist() == list(range(len(atl03)))
+
+def test_sample_photons_shares_out_points():
+    # the small classes keep all their photons and pass the rest on to the large ones
+    atl03 = make_photons([10, 0, 1000, 1000, 5])
+    idx = oa.dataCollector.sample_photons(atl03, max_points=215)
+    counts = atl03.conf.values[idx].value_counts()
+    assert len(idx) == 215
+    assert len(np.unique(idx)) == len(idx)
+    assert np.all(np.diff(idx) > 0)
+    assert counts.to_dict() == {'Noise': 10, 'Buffer': 0, 'Low': 100, 'Medium': 100, 'High': 5}
+
+def test_sample_photons_is_reproducible():
+    atl03 = make_photons([500, 500, 500, 500, 500])
+    first = oa.dataCollector.sample_photons(atl03, max_points=100, seed=1)
+    second = oa.dataCollector.sample_photons(atl03, max_points=100, seed=1)
+    assert np.array_equal(first, second)
+    assert len(first) == 100
+
+def test_sample_photons_empty():
+    atl03 = oa.dataCollector.empty_product('atl03')
+    assert isinstance(atl03.conf.dtype, pd.CategoricalDtype)
+    assert len(oa.dataCollector.sample_photons(atl03, max_points=100)) == 0
+
+@pytest.mark.parametrize('mode,max_points,photons,label', [('scatter', 10, 60, 'ATL03'),
+                                                           ('sample', 10, 10, 'ATL03 (10 of 60 photons)'),
+                                                           ('auto', 100, 60, 'ATL03'),
+                                                           ('auto', 10, 10, 'ATL03 (10 of 60 photons)'),
+                                                           ('density', 10, 0, 'ATL03 (density)')])
+def test_plot_modes(server, mode, max_points, photons, label):
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    collector.requestData()
+    fig = collector.plotData(mode=mode, max_points=max_points, bins=(20, 10))
+    ax, = fig.axes
+    assert ax.get_legend_handles_labels()[1][0] == label
+    # the density plot draws an image instead of the photons
+    assert len(ax.collections[0].get_offsets()) == photons
+    assert len(ax.images) == (mode == 'density')
+    oa.plt.close(fig)
+
+def test_plot_invalid_mode(server):
+    collector = oa.dataCollector(beam='gt1l', oaurl=server.url())
+    collector.requestData()
+    with pytest.raises(Exception, match='mode has to be one of'):
+        collector.plotData(mode='hexbin')
+    oa.plt.close('all')
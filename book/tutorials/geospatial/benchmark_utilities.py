@@ -0,0 +1,522 @@
+#!/usr/bin/env python
+u"""
+benchmark_utilities.py
+Local stand-in for the NASA Common Metadata Repository (CMR) and NSIDC
+    https servers for offline throughput benchmarking of utilities.py
+
+Serves scroll-paged CMR granule searches, NSIDC-style directory indexes
+    and large synthetic granules with configurable latency, bandwidth
+    and error injection
+
+CALLING SEQUENCE:
+    python benchmark_utilities.py --granules 5000 --downloads 16
+    python benchmark_utilities.py --serve --port 8000
+
+COMMAND LINE OPTIONS:
+    --serve: only run the stand-in server
+    --host X: host address for the stand-in server
+    --port X: port for the stand-in server
+    --url X: benchmark an existing stand-in server
+    --granules X: number of synthetic granules
+    --file-size X: size of each synthetic granule in bytes
+    --latency X: latency in seconds added to each request
+    --bandwidth X: maximum bandwidth in bytes per second per response
+    --error-rate X: fraction of requests returning 503 errors
+    --downloads X: number of granules to download
+    --max-workers X: number of concurrent downloads
+
+PYTHON DEPENDENCIES:
+    lxml: processing XML and HTML in Python
+        https://pypi.python.org/pypi/lxml
+"""
+from __future__ import print_function
+
+import sys
+import json
+import time
+import random
+import fnmatch
+import hashlib
+import argparse
+import datetime
+import threading
+import posixpath
+import http.server
+import urllib.parse
+import email.utils
+import concurrent.futures
+import utilities
+
+# PURPOSE: synthetic ICESat-2 granules for the stand-in server
+class Granules:
+    """
+    Synthetic ICESat-2 ATL06 granules
+
+    Keyword arguments
+    -----------------
+    count: number of granules
+    product: ICESat-2 data product
+    release: ICESat-2 data release
+    """
+    def __init__(self, count=5000, product='ATL06', release='005'):
+        self.product = product
+        self.release = release
+        self.directory = '{0}.{1}'.format(product, release)
+        start = datetime.datetime(2018, 10, 14, 0, 10, 49)
+        self.names = []
+        self.times = []
+        for i in range(count):
+            # 14 granule regions per orbit and 1387 orbits per cycle
+            rgt = (i//14) % 1387 + 1
+            cycle = (i//(14*1387)) + 1
+            region = i % 14 + 1
+            t = start + datetime.timedelta(seconds=407*i)
+            self.times.append(t)
+            self.names.append('{0}_{1}_{2:04d}{3:02d}{4:02d}_{5}_01.h5'.format(
+                product, t.strftime('%Y%m%d%H%M%S'), rgt, cycle, region,
+                release))
+        self.index = {name:i for i,name in enumerate(self.names)}
+
+    def path(self, i):
+        """
+        Remote path to a granule
+        """
+        return posixpath.join('/ATLAS', self.directory,
+            self.times[i].strftime('%Y.%m.%d'), self.names[i])
+
+    def dates(self):
+        """
+        Sorted list of granule date directories
+        """
+        return sorted(set(t.strftime('%Y.%m.%d') for t in self.times))
+
+# PURPOSE: request handler for the stand-in server
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Request handler serving CMR searches, directory indexes and granules
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        options = self.server.options
+        # inject latency and errors
+        if options['latency']:
+            time.sleep(options['latency'])
+        if (random.random() < options['error_rate']):
+            return self.send_error_response(503)
+        url = urllib.parse.urlsplit(self.path)
+        if url.path.startswith('/search/granules.'):
+            self.send_cmr(url)
+        elif url.path.startswith('/ATLAS'):
+            self.send_atlas(url.path)
+        else:
+            self.send_error_response(404)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        # clear CMR scroll sessions
+        if (self.path == '/search/clear-scroll'):
+            length = int(self.headers.get('Content-Length', 0))
+            scroll_id = json.loads(self.rfile.read(length))['scroll_id']
+            with self.server.lock:
+                self.server.scrolls.pop(scroll_id, None)
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self.send_error_response(404)
+
+    def send_error_response(self, code):
+        self.send_response(code)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_body(self, body, content_type, headers={}, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key,value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if (self.command != 'HEAD'):
+            self.write_throttled(body)
+
+    def write_throttled(self, body, chunk=65536):
+        # limit the bandwidth of the response
+        bandwidth = self.server.options['bandwidth']
+        view = memoryview(body)
+        for i in range(0, len(view), chunk):
+            self.wfile.write(view[i:i+chunk])
+            if bandwidth:
+                time.sleep(len(view[i:i+chunk])/bandwidth)
+
+    def send_cmr(self, url):
+        # paged CMR granule search
+        granules = self.server.granules
+        query = urllib.parse.parse_qs(url.query)
+        page_size = int(query.get('page_size', ['10'])[0])
+        cmr_format = posixpath.splitext(url.path)[1][1:]
+        # granules matching the readable granule name patterns
+        selected = self.server.select(
+            tuple(query.get('readable_granule_name[]', [])))
+        # all granules were last revised at the modification time
+        if ('revision_date[]' in query):
+            revised = query['revision_date[]'][0].split(',')[0]
+            revised = datetime.datetime.strptime(revised,
+                '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=datetime.timezone.utc)
+            if (revised > self.server.lastmod):
+                selected = []
+        count = len(selected)
+        headers = {'CMR-Hits': str(count)}
+        if ('scroll' in query):
+            # get the position in the scroll session
+            scroll_id = self.headers.get('CMR-Scroll-Id')
+            with self.server.lock:
+                if scroll_id is None:
+                    scroll_id = hashlib.md5(str(time.time_ns()).encode()
+                        ).hexdigest()
+                    self.server.scrolls[scroll_id] = 0
+                start = self.server.scrolls.get(scroll_id, count)
+                self.server.scrolls[scroll_id] = start + page_size
+            headers['CMR-Scroll-Id'] = scroll_id
+        elif ('CMR-Search-After' in self.headers):
+            # continue after the last granule of the previous page
+            start, = json.loads(self.headers['CMR-Search-After'])
+        else:
+            page_num = int(query.get('page_num', ['1'])[0])
+            start = (page_num - 1)*page_size
+        indices = selected[start:start + page_size]
+        # position for search-after paging of the next page
+        if indices and ('scroll' not in query):
+            headers['CMR-Search-After'] = json.dumps([start + len(indices)])
+        host = 'http://{0}:{1:d}'.format(*self.server.server_address[:2])
+        if (cmr_format == 'umm_json'):
+            items = [self.umm_item(i, host) for i in indices]
+            search_results = dict(hits=count, items=items)
+        else:
+            entries = [self.json_entry(i, host) for i in indices]
+            search_results = dict(feed=dict(entry=entries))
+        body = json.dumps(search_results).encode('utf-8')
+        self.send_body(body, 'application/json', headers=headers)
+
+    def json_entry(self, i, host):
+        # granule in the CMR JSON format
+        granules = self.server.granules
+        t = granules.times[i]
+        return dict(producer_granule_id=granules.names[i],
+            granule_size=str(self.server.options['file_size']/1048576.0),
+            time_start=t.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            time_end=(t + datetime.timedelta(seconds=407)).strftime(
+                '%Y-%m-%dT%H:%M:%S.000Z'),
+            boxes=['-80.0 -180.0 80.0 180.0'],
+            links=[dict(type='application/x-hdfeos',
+                href=host + granules.path(i))])
+
+    def umm_item(self, i, host):
+        # granule in the UMM JSON format
+        granules = self.server.granules
+        t = granules.times[i]
+        name = granules.names[i]
+        return dict(meta={'concept-id':'G{0:d}-NSIDC_ECS'.format(i)},
+            umm=dict(GranuleUR=name,
+            DataGranule=dict(Identifiers=[dict(Identifier=name,
+                IdentifierType='ProducerGranuleId')],
+                ArchiveAndDistributionInformation=[dict(Name=name,
+                    Size=self.server.options['file_size'], SizeUnit='B',
+                    Checksum=dict(Value=self.server.checksum(name),
+                    Algorithm='MD5'))]),
+            TemporalExtent=dict(RangeDateTime=dict(
+                BeginningDateTime=t.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                EndingDateTime=(t + datetime.timedelta(seconds=407)
+                    ).strftime('%Y-%m-%dT%H:%M:%S.000Z'))),
+            RelatedUrls=[dict(URL=host + granules.path(i), Type='GET DATA',
+                MimeType='application/x-hdfeos')]))
+
+    def send_atlas(self, path):
+        # directory indexes and synthetic granules
+        granules = self.server.granules
+        parts = [p for p in path.split('/') if p]
+        if (len(parts) == 1):
+            return self.send_index([granules.directory + '/'])
+        elif (len(parts) == 2) and (parts[1] == granules.directory):
+            return self.send_index([d + '/' for d in granules.dates()])
+        elif (len(parts) == 3) and (parts[1] == granules.directory):
+            return self.send_index([n for n,t in zip(granules.names,
+                granules.times) if (t.strftime('%Y.%m.%d') == parts[2])])
+        elif (len(parts) == 4) and (parts[3] in granules.index):
+            return self.send_granule(parts[3])
+        self.send_error_response(404)
+
+    def send_index(self, names):
+        # NSIDC-style Apache directory index
+        lastmod = self.server.lastmod.strftime('%Y-%m-%d %H:%M')
+        rows = ['<tr><td class="indexcolname"><a href="{0}">{0}</a></td>'
+            '<td class="indexcollastmod">{1}</td>'
+            '<td class="indexcolsize">-</td></tr>'.format(n, lastmod)
+            for n in names]
+        body = ('<html><body><table>{0}</table></body></html>'.format(
+            ''.join(rows))).encode('utf-8')
+        self.send_body(body, 'text/html')
+
+    def send_granule(self, name):
+        # synthetic granule with support for range requests
+        content = self.server.content(name)
+        headers = {'Accept-Ranges': 'bytes',
+            'Last-Modified': email.utils.formatdate(
+                self.server.lastmod.timestamp(), usegmt=True)}
+        byte_range = self.headers.get('Range')
+        if byte_range and byte_range.startswith('bytes='):
+            first,last = byte_range[6:].split('-')
+            first = int(first)
+            # ranges starting past the end of the file are not satisfiable
+            if (first >= len(content)):
+                headers['Content-Range'] = 'bytes */{0:d}'.format(len(content))
+                return self.send_body(b'', 'application/x-hdfeos',
+                    headers=headers, status=416)
+            last = min(int(last) if last else len(content)-1, len(content)-1)
+            headers['Content-Range'] = 'bytes {0:d}-{1:d}/{2:d}'.format(
+                first, last, len(content))
+            return self.send_body(content[first:last+1],
+                'application/x-hdfeos', headers=headers, status=206)
+        self.send_body(content, 'application/x-hdfeos', headers=headers)
+
+# PURPOSE: threaded stand-in server for CMR and NSIDC
+class StandInServer(http.server.ThreadingHTTPServer):
+    """
+    Local stand-in for the CMR and NSIDC https servers
+
+    Keyword arguments
+    -----------------
+    host: host address for the server
+    port: port for the server (0 for any available port)
+    granules: number of synthetic granules
+    file_size: size of each synthetic granule in bytes
+    latency: latency in seconds added to each request
+    bandwidth: maximum bandwidth in bytes per second per response
+    error_rate: fraction of requests returning 503 errors
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, granules=5000,
+        file_size=16*1048576, latency=0.0, bandwidth=None, error_rate=0.0):
+        super().__init__((host, port), StandInHandler)
+        self.granules = Granules(count=granules)
+        self.options = dict(file_size=file_size, latency=latency,
+            bandwidth=bandwidth, error_rate=error_rate)
+        self.lastmod = datetime.datetime(2022, 1, 1, 12, 0,
+            tzinfo=datetime.timezone.utc)
+        self.scrolls = {}
+        self._selections = {}
+        self.lock = threading.Lock()
+        self._content = None
+        self._checksum = None
+        self._thread = None
+
+    def select(self, patterns):
+        """
+        Indices of the granules matching readable granule name patterns
+        """
+        if not patterns:
+            return range(len(self.granules.names))
+        # reuse the selection for each page of a query
+        with self.lock:
+            if patterns not in self._selections:
+                self._selections[patterns] = [i for i,name in
+                    enumerate(self.granules.names)
+                    if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+            return self._selections[patterns]
+
+    @property
+    def url(self):
+        return 'http://{0}:{1:d}'.format(*self.server_address[:2])
+
+    def content(self, name):
+        """
+        Content of a synthetic granule
+        """
+        if self._content is None:
+            block = hashlib.sha256(b'ICESat-2').digest()*2048
+            repeats = self.options['file_size']//len(block) + 1
+            self._content = (block*repeats)[:self.options['file_size']]
+            self._checksum = hashlib.md5(self._content).hexdigest()
+        return self._content
+
+    def checksum(self, name):
+        """
+        MD5 checksum of a synthetic granule
+        """
+        self.content(name)
+        return self._checksum
+
+    def start(self):
+        """
+        Start serving requests in a background thread
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests
+        """
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+# PURPOSE: benchmark utilities against a stand-in server
+def benchmark(url, downloads=16, max_workers=8, retries=3, fid=sys.stdout):
+    """
+    Benchmark CMR queries, directory listings and granule downloads
+    against a stand-in server
+
+    Arguments
+    ---------
+    url: url of the stand-in server
+
+    Keyword arguments
+    -----------------
+    downloads: number of granules to download
+    max_workers: number of concurrent downloads
+    retries: number of attempts for each granule download
+    fid: open file object to print the report
+
+    Returns
+    -------
+    results: dictionary of requests per second and MB/s for each stage
+    """
+    # point the utilities at the stand-in server
+    hosts = (utilities.CMR_HOST, utilities.NSIDC_HOST)
+    utilities.CMR_HOST = url
+    utilities.NSIDC_HOST = url
+    utilities.clear_listing_cache()
+    metrics = utilities.TransferMetrics()
+    utilities.add_transfer_hook(metrics)
+    results = {}
+    try:
+        # query CMR using a scroll session
+        start = time.perf_counter()
+        ids,urls = utilities.cmr(product='ATL06', release='005')
+        results['cmr'] = dict(wall=time.perf_counter() - start,
+            granules=len(ids))
+        # list the product and date directories
+        start = time.perf_counter()
+        HOST = [url,'ATLAS','ATL06.005']
+        dates,_,_ = utilities.nsidc_list(HOST, build=False)
+        for d in dates:
+            utilities.nsidc_list([*HOST,d.rstrip('/')], build=False)
+        results['list'] = dict(wall=time.perf_counter() - start)
+        # download granules concurrently
+        def download(granule_url):
+            for attempt in range(retries):
+                buffer,error = utilities.from_nsidc(granule_url, build=False)
+                if buffer:
+                    return len(buffer.getvalue())
+            raise RuntimeError(error)
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            sizes = list(executor.map(download, urls[:downloads]))
+        results['download'] = dict(wall=time.perf_counter() - start,
+            granules=len(sizes))
+    finally:
+        utilities.remove_transfer_hook(metrics)
+        # restore the remote hosts and remove the stand-in listings
+        utilities.CMR_HOST,utilities.NSIDC_HOST = hosts
+        utilities.clear_listing_cache()
+    # calculate requests per second and throughput for each stage
+    summary = metrics.summary()
+    for type,result in results.items():
+        s = summary.get(type, dict(count=0, bytes=0, errors=0))
+        result['requests'] = s['count']
+        result['errors'] = s['errors']
+        result['bytes'] = s['bytes']
+        result['requests_per_second'] = s['count']/result['wall']
+        result['MB_per_second'] = s['bytes']/1048576.0/result['wall']
+        print(('{0}: {1:d} requests ({2:d} errors) in {3:0.2f} s, '
+            '{4:0.1f} requests/s, {5:0.2f} MB/s').format(type,
+            result['requests'], result['errors'], result['wall'],
+            result['requests_per_second'], result['MB_per_second']),
+            file=fid)
+    return results
+
+# PURPOSE: create argument parser
+def arguments():
+    parser = argparse.ArgumentParser(
+        description="""Run a local stand-in for the CMR and NSIDC
+            servers and benchmark the ICESat-2 download utilities
+            """
+    )
+    parser.add_argument('--serve',
+        default=False, action='store_true',
+        help='Only run the stand-in server')
+    parser.add_argument('--host',
+        type=str, default='127.0.0.1',
+        help='Host address for the stand-in server')
+    parser.add_argument('--port',
+        type=int, default=0,
+        help='Port for the stand-in server')
+    parser.add_argument('--url',
+        type=str,
+        help='Benchmark an existing stand-in server')
+    parser.add_argument('--granules',
+        type=int, default=5000,
+        help='Number of synthetic granules')
+    parser.add_argument('--file-size',
+        type=int, default=16*1048576,
+        help='Size of each synthetic granule in bytes')
+    parser.add_argument('--latency',
+        type=float, default=0.0,
+        help='Latency in seconds added to each request')
+    parser.add_argument('--bandwidth',
+        type=float,
+        help='Maximum bandwidth in bytes per second per response')
+    parser.add_argument('--error-rate',
+        type=float, default=0.0,
+        help='Fraction of requests returning 503 errors')
+    parser.add_argument('--downloads',
+        type=int, default=16,
+        help='Number of granules to download')
+    parser.add_argument('--max-workers',
+        type=int, default=8,
+        help='Number of concurrent downloads')
+    return parser
+
+# This is the main part of the program that calls the individual functions
+def main():
+    # Read the system arguments listed after the program name
+    args = arguments().parse_args()
+    # benchmark an existing server
+    if args.url:
+        benchmark(args.url, downloads=args.downloads,
+            max_workers=args.max_workers)
+        return
+    server = StandInServer(host=args.host, port=args.port,
+        granules=args.granules, file_size=args.file_size,
+        latency=args.latency, bandwidth=args.bandwidth,
+        error_rate=args.error_rate)
+    # only run the stand-in server
+    if args.serve:
+        print('Serving on {0}'.format(server.url))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+    with server:
+        benchmark(server.url, downloads=args.downloads,
+            max_workers=args.max_workers)
+
+# run main program
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1161 @@
+#!/usr/bin/env python
+u"""
+test_utilities.py
+Tests for the data access, listing, caching and granule helpers
+    in utilities.py
+
+Remote access is tested against the local stand-in server from
+    benchmark_utilities.py and a local ftp server so no network
+    connection is needed
+
+CALLING SEQUENCE:
+    python -m pytest test_utilities.py
+
+PYTHON DEPENDENCIES:
+    pytest: Python testing framework
+        https://docs.pytest.org/
+    pyftpdlib: Python FTP server library (for the ftp tests)
+        https://github.com/giampaolo/pyftpdlib
+"""
+import io
+import os
+import json
+import hashlib
+import fnmatch
+import calendar
+import time
+import email.utils
+import datetime
+import ftplib
+import shutil
+import urllib.request
+import urllib.parse
+import socket
+import threading
+import posixpath
+import numpy as np
+import pytest
+import utilities
+import benchmark_utilities
+
+# PURPOSE: local stand-in for the CMR and NSIDC https servers
+@pytest.fixture
+def server():
+    with benchmark_utilities.StandInServer(granules=28,
+        file_size=3*1024 + 123) as srv:
+        yield srv
+
+# PURPOSE: local ftp server with anonymous access to a directory
+@pytest.fixture
+def ftp_server(tmp_path, monkeypatch, request):
+    authorizers = pytest.importorskip('pyftpdlib.authorizers')
+    handlers = pytest.importorskip('pyftpdlib.handlers')
+    servers = pytest.importorskip('pyftpdlib.servers')
+    remote = tmp_path.joinpath('remote', 'ATL06')
+    remote.mkdir(parents=True)
+    for i in range(3):
+        remote.joinpath('granule_{0:d}.h5'.format(i)).write_bytes(
+            bytes([i])*(1000 + i))
+    authorizer = authorizers.DummyAuthorizer()
+    authorizer.add_anonymous(str(tmp_path.joinpath('remote')), perm='elr')
+    handler = type('Handler', (handlers.FTPHandler,), {})
+    handler.authorizer = authorizer
+    # commands that the server does not support
+    unsupported = getattr(request, 'param', ())
+    handler.proto_cmds = {k:v for k,v in handler.proto_cmds.items()
+        if k not in unsupported}
+    srv = servers.FTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=srv.serve_forever,
+        kwargs=dict(timeout=0.1), daemon=True)
+    thread.start()
+    # connect to the local server instead of the default ftp port
+    monkeypatch.setattr(ftplib.FTP, 'port', srv.address[1])
+    yield remote
+    srv.close_all()
+
+# PURPOSE: remote url of a granule on the stand-in server
+def granule_url(srv, i=0):
+    return srv.url + srv.granules.path(i)
+
+def test_get_cache_home(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert utilities.get_cache_home('icesat2', 'rgt.npz') == \
+        str(tmp_path.joinpath('icesat2', 'rgt.npz'))
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    assert utilities.get_cache_home('icesat2') == \
+        os.path.expanduser(os.path.join('~', '.cache', 'icesat2'))
+
+def test_get_http_size(server):
+    assert utilities.get_http_size(granule_url(server)) == 3*1024 + 123
+    assert utilities.get_http_size(server.url + '/missing') is None
+
+def test_sync_files(server, tmp_path):
+    urls = [granule_url(server, i) for i in range(3)]
+    lastmod = server.lastmod.timestamp()
+    etags = str(tmp_path.joinpath('etags.json'))
+    synced,skipped = utilities.sync_files(urls, str(tmp_path),
+        remote_mtimes=[lastmod]*3, etags=etags)
+    assert len(synced) == 3 and not skipped
+    local = synced[0]
+    assert os.stat(local).st_mtime == lastmod
+    with open(local, 'rb') as f:
+        assert f.read() == server.content(posixpath.basename(urls[0]))
+    assert os.access(etags, os.F_OK)
+    # unchanged files are skipped
+    synced,skipped = utilities.sync_files(urls, str(tmp_path),
+        remote_mtimes=[lastmod]*3, etags=etags)
+    assert not synced and (len(skipped) == 3)
+    # truncated files with a newer modification time are downloaded again
+    with open(local, 'r+b') as f:
+        f.truncate(100)
+    synced,skipped = utilities.sync_files(urls, str(tmp_path),
+        remote_mtimes=[lastmod]*3)
+    assert synced == [local] and (len(skipped) == 2)
+    assert os.path.getsize(local) == 3*1024 + 123
+    # sizes from the listing are used without HEAD requests
+    synced,skipped = utilities.sync_files(urls, str(tmp_path),
+        remote_mtimes=[lastmod]*3, remote_sizes=[1, None, None])
+    assert synced == [local]
+
+def test_sync_files_error(server, tmp_path):
+    urls = [granule_url(server, 0), server.url + '/ATLAS/missing.h5']
+    etags = str(tmp_path.joinpath('etags.json'))
+    with pytest.raises(Exception):
+        utilities.sync_files(urls, str(tmp_path), etags=etags)
+    # the entity tags are kept and no partial files are left behind
+    assert os.access(etags, os.F_OK)
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.part')]
+
+def test_ftp_sync(ftp_server, tmp_path):
+    local_dir = tmp_path.joinpath('local')
+    synced,skipped = utilities.ftp_sync(['127.0.0.1','ATL06'],
+        str(local_dir))
+    assert len(synced) == 3 and not skipped
+    assert local_dir.joinpath('granule_2.h5').read_bytes() == b'\x02'*1002
+    synced,skipped = utilities.ftp_sync(['127.0.0.1','ATL06'],
+        str(local_dir))
+    assert not synced and (len(skipped) == 3)
+
+# PURPOSE: run a coroutine with a new session for the stand-in server
+def run_async(function, *args, **kwargs):
+    aiohttp = pytest.importorskip('aiohttp')
+    asyncio = pytest.importorskip('asyncio')
+    async def main():
+        async with utilities.async_session() as session:
+            return await function(*args, session=session,
+                auth=aiohttp.BasicAuth('user', 'password'), **kwargs)
+    return asyncio.run(main())
+
+def test_async_from_nsidc(server, tmp_path):
+    url = granule_url(server)
+    content = server.content(posixpath.basename(url))
+    # in-memory and local copies return the same type as from_nsidc
+    buffer,error = run_async(utilities.async_from_nsidc, url)
+    assert (error is None) and (buffer.read() == content)
+    local = tmp_path.joinpath('granule.h5')
+    buffer,error = run_async(utilities.async_from_nsidc, url,
+        local=str(local))
+    assert (error is None) and (buffer.read() == content)
+    assert buffer.filename == posixpath.basename(url)
+    assert local.read_bytes() == content
+    assert os.stat(local).st_mtime == server.lastmod.timestamp()
+    assert not os.access('{0}.part'.format(local), os.F_OK)
+    # failed downloads remove the partial file
+    buffer,error = run_async(utilities.async_from_nsidc,
+        server.url + '/ATLAS/missing.h5', local=str(local) + '.missing')
+    assert (buffer is False) and error
+    assert os.listdir(tmp_path) == ['granule.h5']
+
+def test_async_nsidc_list(server):
+    HOST = [server.url, 'ATLAS', server.granules.directory]
+    colnames,collastmod,colerror = run_async(utilities.async_nsidc_list,
+        HOST)
+    assert (colerror is None)
+    assert colnames == [d + '/' for d in server.granules.dates()]
+    colnames,collastmod,colerror = run_async(utilities.async_nsidc_list,
+        [server.url, 'missing'])
+    assert colerror
+
+def test_async_semaphore(server, monkeypatch):
+    asyncio = pytest.importorskip('asyncio')
+    monkeypatch.setattr(utilities, 'ASYNC_CONCURRENCY', 2)
+    active = []
+    peak = []
+    # count the requests that are running at the same time
+    request = utilities.async_request
+    async def counting_request(*args, **kwargs):
+        active.append(None)
+        peak.append(len(active))
+        await asyncio.sleep(0.05)
+        try:
+            return await request(*args, **kwargs)
+        finally:
+            active.pop()
+    monkeypatch.setattr(utilities, 'async_request', counting_request)
+    async def main():
+        assert utilities.async_semaphore() is utilities.async_semaphore()
+        return await asyncio.gather(*[run(i) for i in range(6)])
+    async def run(i):
+        # each call uses its own session but shares the semaphore
+        async with utilities.async_session() as session:
+            return await utilities.async_from_nsidc(granule_url(server, i),
+                auth=False, session=session)
+    results = asyncio.run(main())
+    assert all(error is None for buffer,error in results)
+    assert max(peak) == 2
+
+def test_async_cmr(server, monkeypatch):
+    asyncio = pytest.importorskip('asyncio')
+    pytest.importorskip('aiohttp')
+    monkeypatch.setattr(utilities, 'CMR_HOST', server.url)
+    ids,urls = asyncio.run(utilities.async_cmr(product='ATL06',
+        release='005'))
+    assert ids == server.granules.names
+    assert urls == [granule_url(server, i) for i in range(28)]
+
+def test_get_hash(tmp_path):
+    content = os.urandom(3*1024 + 7)
+    local = tmp_path.joinpath('granule.h5')
+    local.write_bytes(content)
+    expected = hashlib.md5(content).hexdigest()
+    # files, buffers and open files give the same hash with any chunk size
+    assert utilities.get_hash(str(local), chunk=1000) == expected
+    assert utilities.get_hash(io.BytesIO(content)) == expected
+    with open(local, 'rb') as f:
+        f.seek(100)
+        assert utilities.get_hash(f, chunk=1000) == expected
+        assert f.tell() == 100
+    assert utilities.get_hash(str(local), algorithm='sha256') == \
+        hashlib.sha256(content).hexdigest()
+    assert utilities.get_hash(str(tmp_path.joinpath('missing'))) == ''
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_verify_manifest(tmp_path, caplog, processes):
+    hashes = {}
+    for i in range(3):
+        content = bytes([i])*(100 + i)
+        tmp_path.joinpath('granule_{0:d}.h5'.format(i)).write_bytes(content)
+        hashes['granule_{0:d}.h5'.format(i)] = hashlib.md5(content).hexdigest()
+    # corrupted file, binary mode marker, blank and malformed lines
+    tmp_path.joinpath('granule_2.h5').write_bytes(b'corrupted')
+    manifest = tmp_path.joinpath('manifest.md5')
+    manifest.write_text('{0}  granule_0.h5\n'
+        '{1} *granule_1.h5\n\n'
+        '{2}  granule_2.h5\n'
+        'malformed\n'.format(hashes['granule_0.h5'].upper(),
+        hashes['granule_1.h5'], hashes['granule_2.h5']))
+    valid = utilities.verify_manifest(str(manifest), processes=processes)
+    assert valid == {'granule_0.h5':True, 'granule_1.h5':True,
+        'granule_2.h5':False}
+    assert 'Malformed manifest line 5' in caplog.text
+    # dictionary manifests need the directory of the files
+    valid = utilities.verify_manifest(hashes, directory=str(tmp_path))
+    assert valid['granule_0.h5'] and not valid['granule_2.h5']
+
+def test_cmr_cache_key():
+    key = utilities.cmr_cache_key('https://CMR.example.com/search?b=2&a=1')
+    assert key == utilities.cmr_cache_key('https://cmr.example.com/search?a=1&b=2')
+    assert key != utilities.cmr_cache_key('https://cmr.example.com/search?a=1&b=2',
+        request_type='application/x-netcdf')
+
+def test_cmr_cache(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(utilities, 'CMR_HOST', server.url)
+    kwargs = dict(product='ATL06', release='005', cache=str(tmp_path))
+    ids,urls = utilities.cmr(**kwargs)
+    assert ids == server.granules.names
+    cache_file, = [f for f in tmp_path.iterdir() if f.suffix == '.json']
+    # current cached responses are used without querying CMR
+    def cmr_scroll(*args, **kwargs):
+        raise AssertionError('CMR queried for a cached response')
+    monkeypatch.setattr(utilities, 'cmr_scroll', cmr_scroll)
+    assert utilities.cmr(**kwargs) == (ids, urls)
+    # expired responses without revisions only refresh the cached time
+    cached = json.loads(cache_file.read_text())
+    assert utilities.cmr(ttl=0, check_revisions=True, **kwargs) == (ids, urls)
+    assert json.loads(cache_file.read_text())['time'] > cached['time']
+    assert not [f for f in tmp_path.iterdir() if f.suffix == '.tmp']
+    # expired responses with revisions are queried again
+    server.lastmod = datetime.datetime.now(datetime.timezone.utc) + \
+        datetime.timedelta(hours=1)
+    with pytest.raises(AssertionError):
+        utilities.cmr(ttl=0, check_revisions=True, **kwargs)
+
+def test_cmr_revised_since(server, monkeypatch):
+    monkeypatch.setattr(utilities, 'CMR_HOST', server.url)
+    lastmod = server.lastmod.timestamp()
+    # queries split into batches are checked batch by batch
+    kwargs = dict(product='ATL06', release='005',
+        tracks=['{0:04d}'.format(t) for t in range(1, 1388, 3)])
+    assert len(utilities.cmr_query_urls(**kwargs)) > 1
+    assert utilities.cmr_revised_since(revision_date=lastmod - 60, **kwargs)
+    assert not utilities.cmr_revised_since(revision_date=lastmod + 60,
+        **kwargs)
+
+def test_cmr_sort_granules():
+    ids = ['ATL06_20190101000000_00010201_005_01.h5',
+        'ATL06_20181014001049_00201101_005_01.h5',
+        'ATL11_003803_0315_005_01.h5',
+        'ATL06_20181014001049_00201102_005_01.h5']
+    urls = ['https://example.com/{0}'.format(g) for g in ids]
+    sorted_ids,sorted_urls = utilities.cmr_sort_granules(ids, urls)
+    assert sorted_ids == [ids[2], ids[1], ids[3], ids[0]]
+    assert sorted_urls == ['https://example.com/{0}'.format(g)
+        for g in sorted_ids]
+
+@pytest.mark.parametrize('max_workers', [None, 4])
+def test_cmr_batches(monkeypatch, max_workers):
+    # queries for every third track are split into several batches
+    tracks = ['{0:04d}'.format(t) for t in range(1, 1388, 3)]
+    assert len(utilities.cmr_query_urls(product='ATL06', release='005',
+        tracks=tracks)) > 1
+    # return the batches out of order of time
+    cmr_query_urls = utilities.cmr_query_urls
+    monkeypatch.setattr(utilities, 'cmr_query_urls',
+        lambda *args, **kwargs: cmr_query_urls(*args, **kwargs)[::-1])
+    with benchmark_utilities.StandInServer(granules=14*400) as srv:
+        monkeypatch.setattr(utilities, 'CMR_HOST', srv.url)
+        ids,urls = utilities.cmr(product='ATL06', release='005',
+            tracks=tracks, max_workers=max_workers)
+        # granules of the stand-in server are in order of time
+        expected = [name for i,name in enumerate(srv.granules.names)
+            if (i//14) % 3 == 0]
+    assert ids == expected
+    assert [posixpath.basename(u) for u in urls] == expected
+
+def test_cmr_parallel(server, monkeypatch):
+    monkeypatch.setattr(utilities, 'CMR_HOST', server.url)
+    ids,urls = utilities.cmr_parallel(product='ATL06', release='005',
+        page_size=5, max_workers=4)
+    assert ids == server.granules.names
+    assert urls == [granule_url(server, i) for i in range(28)]
+
+@pytest.mark.parametrize('ftp_server,listed', [((), True),
+    (('OPTS',), True), (('MLSD',), False)], indirect=['ftp_server'])
+def test_ftp_list(ftp_server, listed):
+    output,mtimes,sizes = utilities.ftp_list(['127.0.0.1','ATL06'],
+        basename=True, sort=True, size=True)
+    assert output == ['granule_{0:d}.h5'.format(i) for i in range(3)]
+    # modification times from MLSD (without OPTS) or from MDTM
+    assert mtimes == [int(os.stat(ftp_server.joinpath(f)).st_mtime)
+        for f in output]
+    # sizes are only listed with MLSD
+    assert sizes == ([1000, 1001, 1002] if listed else [None, None, None])
+    output,mtimes = utilities.ftp_list(['127.0.0.1','ATL06'],
+        pattern=r'_1\.h5$')
+    assert output == ['ATL06/granule_1.h5']
+
+def test_ftp_pool(ftp_server):
+    with utilities.FTPPool('127.0.0.1', size=2) as pool:
+        with pool.connection() as first:
+            with pool.connection() as second:
+                assert first is not second
+        # idle connections are reused
+        with pool.connection() as ftp:
+            assert ftp in (first, second)
+        # connections closed by the server are replaced
+        for ftp in (first, second):
+            ftp.sock.shutdown(socket.SHUT_RDWR)
+        with pool.connection() as ftp:
+            assert ftp.voidcmd('NOOP').startswith('200')
+        assert pool._count == 1
+
+def test_from_ftp_parallel(ftp_server, tmp_path):
+    HOSTS = [['127.0.0.1','ATL06','granule_{0:d}.h5'.format(i)]
+        for i in range(3)]
+    local = [str(tmp_path.joinpath(H[-1])) for H in HOSTS]
+    buffers = utilities.from_ftp_parallel(HOSTS, local=local, max_workers=2)
+    assert [b.read() for b in buffers] == \
+        [bytes([i])*(1000 + i) for i in range(3)]
+    assert tmp_path.joinpath('granule_1.h5').read_bytes() == b'\x01'*1001
+
+def test_ftp_sync_sizes(ftp_server, tmp_path):
+    local_dir = tmp_path.joinpath('local')
+    utilities.ftp_sync(['127.0.0.1','ATL06'], str(local_dir))
+    # truncated files with a newer modification time are downloaded again
+    local = local_dir.joinpath('granule_0.h5')
+    local.write_bytes(b'\x00'*10)
+    synced,skipped = utilities.ftp_sync(['127.0.0.1','ATL06'],
+        str(local_dir))
+    assert synced == [str(local)] and (len(skipped) == 2)
+    assert local.read_bytes() == b'\x00'*1000
+
+def test_parse_index_nsidc(server):
+    url = server.url + '/ATLAS/ATL06.005/'
+    with urllib.request.urlopen(url) as response:
+        colnames,collastmod = utilities.parse_index(response)
+    assert colnames == [d + '/' for d in server.granules.dates()]
+    expected = server.lastmod.timestamp()
+    assert all(t == expected for t in collastmod)
+
+def test_parse_index_apache():
+    html = b"""<html><body><table>
+        <tr><th><a href="?C=N;O=D">Name</a></th><th>Last modified</th></tr>
+        <tr><td><a href="/ATLAS/">Parent Directory</a></td>
+            <td align="right"> </td></tr>
+        <tr><td><a href="ATL06_20181014001049_00201101_005_01.h5">
+            ATL06_20181014001049_00201101_005_01.h5</a></td>
+            <td align="right">2021-07-21 10:15</td><td>4.5M</td></tr>
+        </table></body></html>"""
+    colnames,collastmod = utilities.parse_index(io.BytesIO(html),
+        columns='apache')
+    assert colnames[-1] == 'ATL06_20181014001049_00201101_005_01.h5'
+    assert collastmod[-1] == calendar.timegm((2021,7,21,10,15,0))
+
+def test_nsidc_list(server, monkeypatch):
+    utilities.clear_listing_cache()
+    HOST = [server.url, 'ATLAS', server.granules.directory]
+    colnames,collastmod,colerror = utilities.nsidc_list(HOST, build=False,
+        pattern=r'2018\.10\.14', sort=True, ttl=60)
+    assert (colerror is None) and (colnames == ['2018.10.14/'])
+    # cached listings are reduced without listing the directory again
+    def urlopen(*args, **kwargs):
+        raise AssertionError('listed a cached directory')
+    monkeypatch.setattr(urllib.request, 'urlopen', urlopen)
+    colnames,collastmod,colerror = utilities.nsidc_list(HOST, build=False,
+        sort=True, ttl=60)
+    assert colnames == [d + '/' for d in server.granules.dates()]
+    utilities.clear_listing_cache()
+    with pytest.raises(AssertionError):
+        utilities.nsidc_list(HOST, build=False, ttl=60)
+
+def test_listing_cache(monkeypatch):
+    utilities.clear_listing_cache()
+    monkeypatch.setattr(utilities, 'LISTING_CACHE_SIZE', 2)
+    for i in range(3):
+        utilities.cache_listing('url{0:d}'.format(i), ['a'], [0])
+    # the least recently used listing is removed
+    assert utilities.cached_listing('url0', ttl=60) is None
+    assert utilities.cached_listing('url2', ttl=60) == (['a'], [0])
+    # listings are not cached without a time to live
+    assert utilities.cached_listing('url2') is None
+    utilities.clear_listing_cache()
+
+def test_listing_parser_deprecated(server):
+    with pytest.warns(DeprecationWarning):
+        utilities.nsidc_list([server.url, 'ATLAS'], build=False,
+            parser=object())
+
+def test_nsidc_crawl(server):
+    HOST = [server.url, 'ATLAS', server.granules.directory]
+    # every file under the date directories
+    found = dict(utilities.nsidc_crawl(HOST, patterns=[None, None],
+        build=False, max_workers=4))
+    assert sorted(found) == sorted(granule_url(server, i) for i in range(28))
+    assert set(found.values()) == {server.lastmod.timestamp()}
+    # reduce the listing at each level
+    found = [url for url,mtime in utilities.nsidc_crawl(HOST,
+        patterns=[r'2018\.10\.14', r'_00010[0-9]{3}_'], build=False)]
+    expected = [granule_url(server, i) for i in range(28)
+        if server.granules.path(i).split('/')[3] == '2018.10.14'
+        and ((i//14) == 0)]
+    assert sorted(found) == sorted(expected)
+    # without patterns only the top directory is listed
+    assert not list(utilities.nsidc_crawl(HOST, build=False))
+
+def test_nsidc_crawl_stop(server):
+    HOST = [server.url, 'ATLAS', server.granules.directory]
+    crawl = utilities.nsidc_crawl(HOST, patterns=[None, None], build=False,
+        max_workers=1)
+    url,mtime = next(crawl)
+    assert url.startswith(server.url)
+    # stopping the crawl cancels the queued listings
+    crawl.close()
+
+def test_http_range_file(server):
+    url = server.url + server.granules.path(0)
+    content = server.content(server.granules.names[0])
+    fileobj = utilities.HTTPRangeFile(url, block_size=1024, cache_blocks=2)
+    assert fileobj.size == len(content)
+    # reads spanning block boundaries
+    fileobj.seek(1000)
+    assert fileobj.read(100) == content[1000:1100]
+    fileobj.seek(-50, 2)
+    assert fileobj.read() == content[-50:]
+    fileobj.seek(0)
+    assert fileobj.read() == content
+    # repeated reads are served from the cache
+    requests = fileobj.requests
+    fileobj.seek(-10, 2)
+    assert fileobj.read() == content[-10:]
+    assert fileobj.requests == requests
+    fileobj.close()
+
+def test_http_range_file_empty():
+    with benchmark_utilities.StandInServer(granules=1, file_size=0) as srv:
+        fileobj = utilities.HTTPRangeFile(srv.url + srv.granules.path(0))
+        assert fileobj.size == 0
+        assert fileobj.read() == b''
+
+def test_http_range_file_readahead():
+    with pytest.raises(ValueError):
+        utilities.HTTPRangeFile('http://127.0.0.1/', cache_blocks=1,
+            readahead=1)
+
+def test_http_range_file_readahead_requests(server):
+    url = granule_url(server)
+    content = server.content(server.granules.names[0])
+    fileobj = utilities.HTTPRangeFile(url, block_size=256, cache_blocks=4,
+        readahead=2)
+    # sequential reads with readahead use fewer requests than blocks
+    assert fileobj.read() == content
+    assert fileobj.requests < len(content)//256
+    assert fileobj.bytes_transferred >= len(content)
+
+def test_from_nsidc_remote(server):
+    remote,error = utilities.from_nsidc_remote(granule_url(server),
+        build=False, block_size=1024)
+    assert (error is None) and (remote.size == 3*1024 + 123)
+    assert remote.read(10) == server.content(server.granules.names[0])[:10]
+    remote,error = utilities.from_nsidc_remote(server.url + '/missing',
+        build=False)
+    assert (remote is False) and error
+
+@pytest.fixture
+def metrics(monkeypatch):
+    # restore the default urllib opener after each test
+    monkeypatch.setattr(urllib.request, '_opener', None)
+    metrics = utilities.TransferMetrics()
+    utilities.add_transfer_hook(metrics)
+    yield metrics
+    utilities.remove_transfer_hook(metrics)
+
+def test_transfer_metrics(server, metrics):
+    utilities.build_opener(None, None, password_manager=False)
+    # resolve the host name of the stand-in server
+    url = granule_url(server).replace('127.0.0.1', 'localhost')
+    buffer,error = utilities.from_nsidc(url, build=False)
+    assert (error is None)
+    buffer,error = utilities.from_nsidc(server.url + '/missing', build=False)
+    assert (buffer is False) and error
+    success,failure = metrics.events
+    assert success['status'] == 200 and success['bytes'] == 3*1024 + 123
+    assert (success['dns'] >= 0.0) and (success['connect'] >= 0.0)
+    assert success['ttfb'] <= success['elapsed']
+    assert success['throughput'] > 0.0 and success['error'] is None
+    assert failure['status'] == 404 and failure['error']
+    summary = metrics.summary()['download']
+    assert summary['count'] == 2 and summary['errors'] == 1
+    assert summary['connections'] == 2 and summary['mean_connect'] is not None
+    assert metrics.report().startswith('download: 2 requests (1 errors')
+    prometheus = metrics.prometheus()
+    assert 'icesat2_transfer_connections_total{type="download"} 2' in prometheus
+    assert '# TYPE icesat2_transfer_dns_seconds_total counter' in prometheus
+
+def test_transfer_metrics_default_opener(server, metrics):
+    # connections are not timed without the build_opener handlers
+    buffer,error = utilities.from_nsidc(granule_url(server), build=False)
+    event, = metrics.events
+    assert (event['dns'] is None) and (event['connect'] is None)
+    assert metrics.summary()['download']['mean_connect'] is None
+
+def test_transfer_metrics_async(server, metrics):
+    buffer,error = run_async(utilities.async_from_nsidc, granule_url(server))
+    assert (error is None)
+    event, = metrics.events
+    assert (event['type'] == 'download') and (event['connect'] >= 0.0)
+    assert event['bytes'] == 3*1024 + 123
+
+def test_transfer_hooks(server, metrics, caplog):
+    fid = io.StringIO()
+    sink = utilities.JSONLinesSink(fid=fid)
+    def failing(event):
+        raise ValueError('failing hook')
+    utilities.add_transfer_hook(sink)
+    utilities.add_transfer_hook(failing)
+    try:
+        utilities.from_nsidc(granule_url(server), build=False)
+    finally:
+        utilities.remove_transfer_hook(sink)
+        utilities.remove_transfer_hook(failing)
+    # hook errors are logged without failing the transfer
+    assert 'failing hook' in caplog.text
+    event = json.loads(fid.getvalue())
+    assert event == metrics.events[0]
+    utilities.from_nsidc(granule_url(server), build=False)
+    assert len(fid.getvalue().splitlines()) == 1
+    assert len(metrics.events) == 2
+
+def test_adaptive_concurrency():
+    controller = utilities.AdaptiveConcurrency(initial=8, minimum=2,
+        maximum=10, interval=0.0)
+    # additive increase while throughput is not decreasing
+    controller.success(1024)
+    assert controller.limit == 9
+    issued = [time.perf_counter() for i in range(4)]
+    # only the first of the concurrent failures decreases the concurrency
+    controller.throttle(issued=issued[0])
+    assert controller.limit == 4
+    for i in issued[1:]:
+        controller.throttle(issued=i)
+    assert controller.limit == 4
+    # transfers issued after the decrease are a new congestion event
+    controller.throttle(issued=time.perf_counter())
+    assert controller.limit == 2
+    controller.throttle()
+    assert controller.limit == 2
+    # new transfers pause after a Retry-After
+    controller.throttle(retry_after=60.0, issued=issued[0])
+    assert not controller.ready()
+
+def test_get_retry_after():
+    assert utilities.get_retry_after({'Retry-After': '120'}) == 120.0
+    assert utilities.get_retry_after({'Retry-After': '-1'}) == 0.0
+    assert utilities.get_retry_after({}, default=2.0) == 2.0
+    assert utilities.get_retry_after(None) is None
+    assert utilities.get_retry_after({'Retry-After': 'soon'}, default=3) == 3
+    retry_time = email.utils.formatdate(time.time() + 600, usegmt=True)
+    retry_after = utilities.get_retry_after({'Retry-After': retry_time})
+    assert 590.0 < retry_after <= 600.0
+
+def test_from_nsidc_adaptive(tmp_path):
+    with benchmark_utilities.StandInServer(granules=12, file_size=2048,
+        error_rate=0.3) as srv:
+        urls = [granule_url(srv, i) for i in range(12)]
+        local = [str(tmp_path.joinpath(posixpath.basename(url)))
+            for url in urls]
+        response_errors = utilities.from_nsidc_adaptive(urls, local,
+            build=False, initial=4, retries=20, backoff=0.0)
+        assert response_errors == [None]*12
+        for url,local_file in zip(urls, local):
+            name = posixpath.basename(url)
+            with open(local_file, 'rb') as f:
+                assert f.read() == srv.content(name)
+        # missing files are reported without retrying
+        response_errors = utilities.from_nsidc_adaptive(
+            [srv.url + '/missing'], [str(tmp_path.joinpath('missing'))],
+            build=False, retries=20, backoff=0.0)
+        assert response_errors[0].startswith('Download error')
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.part')]
+
+def test_granule_cache(tmp_path):
+    cache = utilities.GranuleCache(directory=tmp_path, max_bytes=2000)
+    content = b'granule'*100
+    checksum = hashlib.md5(content).hexdigest()
+    path = cache.put('ATL06_a.h5', io.BytesIO(content))
+    assert os.path.basename(path) == '{0}_ATL06_a.h5'.format(checksum)
+    # granules are found by checksum or size
+    buffer = cache.get('ATL06_a.h5', checksum=checksum)
+    assert buffer.read() == content and buffer.filename == 'ATL06_a.h5'
+    assert (buffer.checksum == checksum) and (buffer.algorithm == 'MD5')
+    assert cache.get('ATL06_a.h5', size=len(content)).read() == content
+    assert cache.get('ATL06_a.h5', size=len(content) + 1) is None
+    assert cache.get('ATL06_a.h5', checksum='0'*32) is None
+    # checksums of other algorithms do not match
+    sha = hashlib.sha256(content).hexdigest()
+    assert cache.get('ATL06_a.h5', checksum=checksum, algorithm='SHA256') is None
+    cache.put('ATL06_a.h5', io.BytesIO(content), algorithm='sha256')
+    buffer = cache.get('ATL06_a.h5', checksum=sha, algorithm='SHA256')
+    assert (buffer.checksum == sha) and (buffer.algorithm == 'SHA256')
+    # granules larger than the cache are skipped
+    assert cache.put('ATL06_b.h5', io.BytesIO(b'0'*3000)) is None
+    assert cache.size() == 2*len(content)
+    # least recently used granules are evicted
+    cache.get('ATL06_a.h5', checksum=checksum)
+    source = tmp_path.joinpath('ATL06_c.h5')
+    source.write_bytes(b'1'*1000)
+    cache.put('ATL06_c.h5', str(source))
+    assert cache.size() == len(content) + 1000
+    assert cache.get('ATL06_a.h5', checksum=sha, algorithm='SHA256') is None
+    assert cache.get('ATL06_a.h5', checksum=checksum).read() == content
+    cache.clear()
+    assert cache.size() == 0
+    assert not os.access(path, os.F_OK)
+
+def test_granule_cache_migration(tmp_path):
+    # index from a version without checksum algorithms
+    with utilities.sqlite3.connect(str(tmp_path.joinpath('index.db'))) as db:
+        db.execute("""CREATE TABLE granules (producer_id TEXT NOT NULL,
+            checksum TEXT NOT NULL, path TEXT NOT NULL,
+            size INTEGER NOT NULL, atime REAL NOT NULL,
+            PRIMARY KEY (producer_id, checksum))""")
+        db.execute('INSERT INTO granules VALUES (?,?,?,?,?)',
+            ('ATL06_a.h5', 'abc', str(tmp_path.joinpath('a')), 1, 0.0))
+    tmp_path.joinpath('a').write_bytes(b'a')
+    cache = utilities.GranuleCache(directory=tmp_path)
+    buffer = cache.get('ATL06_a.h5', checksum='abc', algorithm='md5')
+    assert buffer.read() == b'a' and buffer.algorithm == 'MD5'
+
+def test_from_nsidc_cache(tmp_path, metrics):
+    cache = utilities.GranuleCache(directory=tmp_path.joinpath('cache'))
+    with benchmark_utilities.StandInServer(granules=2,
+        file_size=1024) as srv:
+        url = granule_url(srv)
+        name = posixpath.basename(url)
+        buffer,error = utilities.from_nsidc(url, build=False, cache=cache)
+        assert (error is None) and (buffer.read() == srv.content(name))
+        # cached granules matched by size are not downloaded again
+        local = tmp_path.joinpath(name)
+        buffer,error = utilities.from_nsidc(url, build=False, cache=cache,
+            local=str(local))
+        assert buffer.read() == srv.content(name)
+        assert local.read_bytes() == srv.content(name)
+        buffer = utilities.from_http(url, cache=cache)
+        assert buffer.read() == srv.content(name)
+        checksum = srv.checksum(name)
+    assert [e['type'] for e in metrics.events] == ['download']
+    # cached granules matched by checksum do not need the server
+    buffer,error = utilities.from_nsidc(url, build=False, cache=cache,
+        checksum=checksum)
+    assert (error is None) and (buffer.filename == name)
+
+def test_copy(tmp_path):
+    source = tmp_path.joinpath('source.h5')
+    source.write_bytes(b'granule'*1000)
+    os.utime(source, (0, 86400))
+    destination = tmp_path.joinpath('copy', 'copy.h5')
+    destination.parent.mkdir()
+    method = utilities.copy(str(source), str(destination))
+    assert method in ('reflink','copy_file_range','sendfile','buffered')
+    assert destination.read_bytes() == source.read_bytes()
+    assert os.stat(destination).st_mtime == 86400
+    moved = tmp_path.joinpath('moved.h5')
+    assert utilities.copy(str(destination), str(moved), move=True) == 'rename'
+    assert not destination.exists() and moved.read_bytes() == b'granule'*1000
+
+@pytest.mark.parametrize('move', [False, True])
+def test_copy_same_file(tmp_path, move):
+    source = tmp_path.joinpath('source.h5')
+    source.write_bytes(b'granule')
+    link = tmp_path.joinpath('link.h5')
+    os.link(source, link)
+    # copying a file onto itself leaves the file unchanged
+    for destination in (source, link):
+        with pytest.raises(shutil.SameFileError):
+            utilities.copy(str(source), str(destination), move=move)
+        assert source.read_bytes() == b'granule'
+    with pytest.raises(shutil.SameFileError):
+        utilities.copy_contents(str(source), str(source))
+    assert source.read_bytes() == b'granule'
+
+def test_copy_files(tmp_path):
+    files = []
+    for i in range(6):
+        source = tmp_path.joinpath('source', 'granule_{0:d}.h5'.format(i))
+        source.parent.mkdir(exist_ok=True)
+        source.write_bytes(bytes([i])*(100 + i))
+        files.append((str(source),
+            str(tmp_path.joinpath('output', source.name))))
+    # missing sources and copies onto the source are errors
+    missing = str(tmp_path.joinpath('source', 'missing.h5'))
+    files.append((missing, str(tmp_path.joinpath('output', 'missing.h5'))))
+    files.append((files[0][0], files[0][0]))
+    summary = utilities.copy_files(files, per_device=2)
+    assert summary['files'] == 6
+    assert summary['bytes'] == sum(100 + i for i in range(6))
+    assert sum(summary['methods'].values()) == 6
+    assert sorted(e[0] for e in summary['errors']) == sorted([missing,
+        files[0][0]])
+    assert open(files[0][0], 'rb').read() == bytes([0])*100
+    for source,destination in files[:6]:
+        assert open(destination, 'rb').read() == open(source, 'rb').read()
+    # moving files removes the sources
+    summary = utilities.copy_files([(d, d + '.moved') for s,d in files[:6]],
+        move=True)
+    assert summary['methods'] == {'rename': 6}
+    assert len(os.listdir(tmp_path.joinpath('output'))) == 6
+
+@pytest.mark.parametrize('cmr_format', ['umm_json', 'json'])
+def test_cmr_records(server, monkeypatch, cmr_format):
+    monkeypatch.setattr(utilities, 'CMR_HOST', server.url)
+    records = utilities.cmr_records(product='ATL06', release='005',
+        cmr_format=cmr_format, page_size=10)
+    ids = [id.decode('utf-8') for id in records['producer_granule_id']]
+    assert ids == server.granules.names
+    assert [posixpath.basename(u.decode('utf-8'))
+        for u in records['granule_url']] == ids
+    assert np.allclose(records['size'], (3*1024 + 123)/1048576.0)
+    assert np.all(np.diff(records['start_time']).astype(int) == 407000)
+    assert np.all(records['end_time'] - records['start_time'] ==
+        np.timedelta64(407, 's'))
+    if (cmr_format == 'umm_json'):
+        assert records['checksum'][0].decode('utf-8') == \
+            server.checksum(ids[0])
+    else:
+        assert records['bbox'][0].tolist() == [-180.0, -80.0, 180.0, 80.0]
+
+def test_cmr_records_batches(monkeypatch):
+    # queries for every third track are split into several batches
+    tracks = ['{0:04d}'.format(t) for t in range(1, 1388, 3)]
+    cmr_query_urls = utilities.cmr_query_urls
+    monkeypatch.setattr(utilities, 'cmr_query_urls',
+        lambda *args, **kwargs: cmr_query_urls(*args, **kwargs)[::-1])
+    with benchmark_utilities.StandInServer(granules=14*400) as srv:
+        monkeypatch.setattr(utilities, 'CMR_HOST', srv.url)
+        records = utilities.cmr_records(product='ATL06', release='005',
+            tracks=tracks)
+        # granules of the stand-in server are in order of time
+        expected = [name for i,name in enumerate(srv.granules.names)
+            if (i//14) % 3 == 0]
+    assert [id.decode('utf-8') for id in
+        records['producer_granule_id']] == expected
+
+@pytest.mark.parametrize('cmr_format', ['umm_json', 'json'])
+def test_cmr_filter_records_json(server, monkeypatch, cmr_format):
+    url = utilities.cmr_query_url(product='ATL06', release='005',
+        page_size=5, scroll=False, cmr_format=cmr_format)
+    url = url.replace(utilities.CMR_HOST, server.url)
+    content = urllib.request.urlopen(url).read()
+    columns = utilities.cmr_filter_records(io.BytesIO(content),
+        cmr_format=cmr_format)
+    # parsing the full page without ijson gives the same fields
+    monkeypatch.setattr(utilities, 'ijson', None)
+    fallback = utilities.cmr_filter_records(io.BytesIO(content),
+        cmr_format=cmr_format)
+    for key in columns.keys():
+        np.testing.assert_array_equal(fallback[key], columns[key])
+    assert columns['producer_granule_id'] == server.granules.names[:5]
+
+@pytest.mark.parametrize('values', [['03'], ['01','02','03','04','05','06',
+    '07','08','09'], ['10','11','12','13','14','15','16','17','18','19','25'],
+    [str(c).zfill(2) for c in range(1,100)]])
+def test_compress_patterns(values):
+    universe = [str(c).zfill(2) for c in range(1,100)]
+    patterns = utilities.compress_patterns(values, universe)
+    # patterns match exactly the requested subset of valid values
+    matched = [u for u in universe
+        if any(fnmatch.fnmatchcase(u, p) for p in patterns)]
+    assert matched == sorted(values)
+    assert len(patterns) <= len(values)
+
+def test_compress_patterns_tracks():
+    universe = [str(t).zfill(4) for t in range(1,1388)]
+    tracks = [str(t).zfill(4) for t in range(100,200)] + ['0338']
+    assert utilities.compress_patterns(tracks, universe) == ['01??', '0338']
+    # all tracks are a single wildcard and wildcards are not compressed
+    assert utilities.compress_patterns(universe, universe) == ['????']
+    assert utilities.compress_patterns(['01?3','0338'], universe) == \
+        ['01?3', '0338']
+
+def test_readable_granules():
+    assert utilities.readable_granules('ATL06', cycles=['03'],
+        tracks=['0338'], granules=['03']) == ['ATL06_??????????????_03380303_*']
+    assert utilities.readable_granules('ATL07', cycles=['03'],
+        tracks=['0338'], granules=['01']) == \
+        ['ATL07-??_??????????????_03380301_*']
+    # products without cycles only have one pattern for each track
+    assert utilities.readable_granules('ATL11', cycles=['03','04'],
+        tracks=['0338'], granules=['03']) == ['ATL11_033803_*']
+    # compressed patterns match the same granules
+    tracks = [str(t).zfill(4) for t in range(100,200)]
+    assert utilities.readable_granules('ATL06', compress=True,
+        cycles=['03','04'], tracks=tracks, granules=['03']) == \
+        ['ATL06_??????????????_01??0303_*', 'ATL06_??????????????_01??0403_*']
+    # combinations only query the given cycles and granule regions
+    patterns = utilities.readable_granules('ATL06', compress=True,
+        combinations=[(338,3,3),(339,3,3),(338,4,4)])
+    assert patterns == ['ATL06_??????????????_03380303_*',
+        'ATL06_??????????????_03390303_*', 'ATL06_??????????????_03380404_*']
+
+def test_cmr_query_urls():
+    tracks = ['{0:04d}'.format(t) for t in range(1, 1388, 3)]
+    patterns = utilities.readable_granules('ATL06', compress=True,
+        tracks=tracks)
+    cmr_batches = utilities.cmr_query_urls(product='ATL06', release='005',
+        tracks=tracks, max_length=2000)
+    assert len(cmr_batches) > 1
+    assert all(len(url) <= 2000 for url in cmr_batches)
+    # each batch is a full query and the batches cover all patterns
+    queried = []
+    for url in cmr_batches:
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+        assert query['short_name'] == ['ATL06']
+        assert query['sort_key[]'] == ['start_date', 'producer_granule_id']
+        queried.extend(query['readable_granule_name[]'])
+    assert queried == patterns
+    # single urls without a maximum length
+    cmr_query, = utilities.cmr_query_urls(product='ATL06', release='005',
+        tracks=tracks, max_length=None)
+    assert cmr_query == utilities.cmr_query_url(product='ATL06',
+        release='005', tracks=tracks)
+
+# granule from the DataIntegration tutorial
+ATL06_GRANULE = 'ATL06_20190420093051_03380303_005_01.h5'
+
+def test_parse_granules():
+    granules = utilities.parse_granules([ATL06_GRANULE,
+        'ATL07-01_20190420093051_03380301_005_01.h5',
+        'ATL11_033803_0315_005_01.h5'])
+    assert granules['valid'].all()
+    assert granules['product'].tolist() == [b'ATL06', b'ATL07', b'ATL11']
+    assert granules['hemisphere'].tolist() == [0, 1, 0]
+    assert granules['time'][0] == np.datetime64('2019-04-20T09:30:51')
+    assert np.isnat(granules['time'][2])
+    assert granules['rgt'].tolist() == [338]*3
+    assert granules['cycle'].tolist() == [3]*3
+    assert granules['region'].tolist() == [3, 1, 3]
+    assert granules['release'].tolist() == [5]*3
+    assert granules['revision'].tolist() == [1]*3
+
+@pytest.mark.parametrize('name', ['ATL11_033803_0315_005_01.h5',
+    'ATL11_033803_0315_005_01', 'ATL06_20190420093051_03380303_005_01'])
+def test_parse_granules_short(name):
+    # names shorter than the longest naming convention
+    granule, = utilities.parse_granules([name])
+    assert granule['valid'] and (granule['rgt'] == 338)
+
+@pytest.mark.parametrize('name', ['ATL06-20190420093051_03380303_005_01.h5',
+    'ATL06_20190420093051-03380303_005_01.h5',
+    'ATL06_20190420093051_03380303-005_01.h5',
+    'ATL11_033803-0315_005_01.h5', 'ATL11_0338030315_005_01.h5',
+    'ATL06_2019042009305_03380303_005_01.h5', 'ATL', '', 'README.md'])
+def test_parse_granules_invalid(name):
+    granule, = utilities.parse_granules([name])
+    assert not granule['valid']
+    assert (granule['rgt'] == 0) and (granule['hemisphere'] == 0)
+    assert np.isnat(granule['time'])
+
+def test_parse_granules_dataframe():
+    pd = pytest.importorskip('pandas')
+    df = utilities.parse_granules([ATL06_GRANULE, 'README.md'],
+        dataframe=True)
+    assert df['valid'].tolist() == [True, False]
+    assert df['product'].tolist() == ['ATL06', 'READM']
+
+def test_benchmark():
+    hosts = (utilities.CMR_HOST, utilities.NSIDC_HOST)
+    fid = io.StringIO()
+    with benchmark_utilities.StandInServer(granules=28,
+        file_size=1024) as srv:
+        results = benchmark_utilities.benchmark(srv.url, downloads=4,
+            max_workers=2, fid=fid)
+    assert results['cmr']['granules'] == 28
+    assert results['download']['granules'] == 4
+    assert results['download']['bytes'] == 4*1024
+    assert results['list']['requests'] == 1 + len(srv.granules.dates())
+    assert fid.getvalue().count('requests/s') == 3
+    # the remote hosts are restored after the benchmark
+    assert (utilities.CMR_HOST, utilities.NSIDC_HOST) == hosts
+
+def test_benchmark_error():
+    hosts = (utilities.CMR_HOST, utilities.NSIDC_HOST)
+    with benchmark_utilities.StandInServer(granules=28,
+        file_size=1024) as srv:
+        url = srv.url
+    # hosts are restored if the stand-in server is unavailable
+    with pytest.raises(Exception):
+        benchmark_utilities.benchmark(url, fid=io.StringIO())
+    assert (utilities.CMR_HOST, utilities.NSIDC_HOST) == hosts
+
+# PURPOSE: synthetic reference ground track table
+@pytest.fixture
+def table():
+    # RGT 10 crosses the equator northward along the prime meridian
+    lat10 = np.arange(-10.0, 10.5, 2.0)
+    lon10 = np.zeros_like(lat10)
+    # RGT 20 crosses the antimeridian northward at mid-latitudes
+    lon20 = np.array([170.0, 175.0, 180.0, -175.0, -170.0])
+    lat20 = np.array([50.0, 51.0, 52.0, 53.0, 54.0])
+    # RGT 338 crosses 65 degrees north over Greenland
+    lat338 = np.arange(60.0, 70.5, 1.0)
+    lon338 = np.linspace(-49.0, -51.0, len(lat338))
+    rgt = np.r_[np.full(len(lat10), 10), np.full(len(lat20), 20),
+        np.full(len(lat338), 338)]
+    lon = np.r_[lon10, lon20, lon338]
+    lat = np.r_[lat10, lat20, lat338]
+    region = utilities.rgt_granule_regions(lat, np.ones(len(lat), dtype=bool))
+    return dict(rgt=rgt.astype(np.int16), lon=lon, lat=lat, region=region)
+
+def test_segments_in_bbox():
+    # crossing, outside, inside and parallel outside the box
+    x0 = np.array([-2.0, 5.0, 0.2, -2.0])
+    y0 = np.array([0.0, 5.0, 0.2, 3.0])
+    x1 = np.array([2.0, 6.0, 0.4, 2.0])
+    y1 = np.array([0.0, 6.0, 0.4, 3.0])
+    valid,t0,t1 = utilities._segments_in_bbox(x0, y0, x1, y1,
+        (-1.0, -1.0, 1.0, 1.0))
+    assert valid.tolist() == [True, False, True, False]
+    # clipped parameters of the crossing segment
+    assert np.isclose(t0[0], 0.25) and np.isclose(t1[0], 0.75)
+
+def test_rgt_granule_regions():
+    lat = [1.0, 30.0, 65.0, 85.0, 65.0, 30.0, 1.0, -1.0, -30.0, -60.0,
+        -85.0, -60.0, -30.0, -1.0]
+    ascending = [True]*4 + [False]*7 + [True]*3
+    assert utilities.rgt_granule_regions(lat, ascending).tolist() == \
+        list(range(1, 15))
+
+def test_rgt_intersects(table):
+    # both granule regions on either side of the equator
+    pairs = utilities.rgt_intersects(bbox=[-1.0, -1.0, 1.0, 1.0],
+        table=table)
+    assert pairs == [(10, 1), (10, 14)]
+    # both sides of the antimeridian
+    for bbox in ([178.0, 51.0, 179.9, 53.0], [-179.0, 51.0, -177.0, 53.0]):
+        assert utilities.rgt_intersects(bbox=bbox, table=table) == [(20, 2)]
+    # polygon within the bounding box of the track but away from it
+    polygon = [(-5.0, 1.0), (-1.0, 1.0), (-1.0, 5.0), (-5.0, 5.0)]
+    assert utilities.rgt_intersects(polygon=polygon, table=table,
+        buffer=0.0) == []
+    assert utilities.rgt_intersects(bbox=[60.0, 60.0, 61.0, 61.0],
+        table=table) == []
+
+def test_rgt_table(tmp_path):
+    # build a table from a KML file of track points
+    coordinates = ' '.join('{0:0.1f},{1:0.1f},0'.format(-50.0, lat)
+        for lat in range(60, 71))
+    kml_file = tmp_path.joinpath('IS2_RGT_0338_cycle3.kml')
+    kml_file.write_text('<kml xmlns="http://www.opengis.net/kml/2.2">'
+        '<Placemark><LineString><coordinates>{0}</coordinates>'
+        '</LineString></Placemark></kml>'.format(coordinates))
+    cache = str(tmp_path.joinpath('rgt.npz'))
+    table = utilities.rgt_table(kml_files=[str(tmp_path)], cache=cache)
+    assert set(table['rgt'].tolist()) == {338}
+    assert set(table['region'].tolist()) == {3}
+    # the cached table is loaded without the KML files
+    cached = utilities.rgt_table(cache=cache)
+    assert np.array_equal(cached['lat'], table['lat'])
+    with pytest.raises(FileNotFoundError):
+        utilities.rgt_table(cache=str(tmp_path.joinpath('missing.npz')))
+
+def test_granule_combinations(table):
+    # granule of RGT 338 in cycle 3 crossing 65 degrees north
+    combinations = utilities.granule_combinations(bbox=[-51, 64, -49, 66],
+        start='2019-04-20', end='2019-04-20', table=table)
+    assert combinations == [(338, 3, 3)]
+    patterns = utilities.readable_granules('ATL06', combinations=combinations)
+    assert any(fnmatch.fnmatchcase(ATL06_GRANULE, p) for p in patterns)
+    # the same track is found for each cycle in a longer time range
+    combinations = utilities.granule_combinations(bbox=[-51, 64, -49, 66],
+        start='2019-01-01', end='2019-12-31', table=table)
+    assert combinations == [(338, 2, 3), (338, 3, 3), (338, 4, 3),
+        (338, 5, 3)]
+    # no granules on days without the track
+    assert utilities.granule_combinations(bbox=[-51, 64, -49, 66],
+        start='2019-04-21', end='2019-04-22', table=table) == []
+    with pytest.raises(ValueError):
+        utilities.granule_combinations(bbox=[-1.0, -1.0, 1.0, 1.0],
+            start='2020-13-45', table=table)
+
+def test_granule_combinations_end_date(table):
+    # day of the cycle 5 orbit of RGT 10
+    orbit_start = utilities.ATLAS_RGT_EPOCH + \
+        4*utilities.CYCLE_LENGTH + 9*utilities.ORBIT_PERIOD
+    day = datetime.datetime.fromtimestamp(orbit_start,
+        datetime.timezone.utc).date()
+    # dates without a time include the whole end day
+    for end in (day.isoformat(), day):
+        combinations = utilities.granule_combinations(
+            bbox=[-1.0, -1.0, 1.0, 1.0], start=day.isoformat(), end=end,
+            table=table)
+        assert combinations == [(10, 5, 1), (10, 5, 14)]
+
+def test_granule_combinations_no_table(monkeypatch, tmp_path, caplog):
+    # combinations are not used without a reference ground track table
+    monkeypatch.setattr(utilities, 'rgt_cache_file',
+        lambda: str(tmp_path.joinpath('rgt.npz')))
+    assert utilities.granule_combinations(bbox=[-51, 64, -49, 66],
+        start='2019-04-20', end='2019-04-20') is None
+    assert 'not filtering granules by area' in caplog.text
+    assert utilities.readable_granules('ATL06', tracks=['0338'],
+        combinations=None) == utilities.readable_granules('ATL06',
+        tracks=['0338'])
+
+def test_catalog_add_cmr(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(utilities, 'CMR_HOST', server.url)
+    catalog = utilities.GranuleCatalog(database=tmp_path.joinpath('c.db'))
+    ids,urls = utilities.cmr(product='ATL06', release='005',
+        catalog=catalog)
+    granules = catalog.query()
+    assert [g['producer_granule_id'] for g in granules] == ids
+    assert [g['url'] for g in granules] == urls
+    # orbital parameters from the granule names
+    assert catalog.query(tracks=[2], regions=[1])[0]['producer_granule_id'] \
+        == ids[14]
+    assert len(catalog.query(product='ATL06', cycles=[1])) == 28
+    assert catalog.query(local=True) == []
+    # updates do not duplicate granules
+    catalog.add_cmr(ids[:2], urls[:2])
+    assert len(catalog.query()) == 28
+
+def test_catalog_add_records(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(utilities, 'CMR_HOST', server.url)
+    catalog = utilities.GranuleCatalog(database=tmp_path.joinpath('c.db'))
+    records = utilities.cmr_records(product='ATL06', release='005',
+        cmr_format='json', catalog=catalog)
+    ids = [id.decode('utf-8') for id in records['producer_granule_id']]
+    # query by time and bounding box
+    start = records['start_time'][5].astype('M8[ms]').astype(np.int64)/1e3
+    end = records['start_time'][7].astype('M8[ms]').astype(np.int64)/1e3
+    granules = catalog.query(start=start, end=end)
+    assert [g['producer_granule_id'] for g in granules] == ids[4:8]
+    assert granules[0]['size'] == 3*1024 + 123
+    assert len(catalog.query(bbox=[-10.0, -10.0, 10.0, 10.0])) == 28
+    assert catalog.query(bbox=[-10.0, 81.0, 10.0, 85.0]) == []
+
+def test_catalog_scan(tmp_path):
+    h5py = pytest.importorskip('h5py')
+    # directory of only ATL11 granules
+    directory = tmp_path.joinpath('ATL11')
+    directory.mkdir()
+    for name,lat in (('ATL11_033803_0315_005_01.h5', 65.0),
+        ('ATL11_033903_0315_005_01.h5', 70.0)):
+        with h5py.File(directory.joinpath(name), 'w') as fileID:
+            fileID.attrs['time_coverage_start'] = '2019-04-01T00:00:00Z'
+            fileID.attrs['time_coverage_end'] = '2022-04-01T00:00:00Z'
+            fileID.attrs['geospatial_lon_min'] = -51.0
+            fileID.attrs['geospatial_lon_max'] = -49.0
+            fileID.attrs['geospatial_lat_min'] = lat - 1.0
+            fileID.attrs['geospatial_lat_max'] = lat + 1.0
+    directory.joinpath('README.md').write_text('not a granule')
+    catalog = utilities.GranuleCatalog(database=tmp_path.joinpath('c.db'))
+    catalog.scan(str(tmp_path), hash=True)
+    granules = catalog.query(bbox=[-51.0, 64.0, -49.0, 66.0])
+    assert [g['producer_granule_id'] for g in granules] == \
+        ['ATL11_033803_0315_005_01.h5']
+    granule, = granules
+    assert (granule['rgt'] == 338) and (granule['cycle'] == 3)
+    assert (granule['region'] == 3) and (granule['release'] == 5)
+    assert granule['local'] == str(directory.joinpath(granule[
+        'producer_granule_id']))
+    assert granule['checksum'] == utilities.get_hash(granule['local'])
+    assert len(catalog.query(tracks=[338, 339], local=True)) == 2
+    assert catalog.query(start=calendar.timegm((2023,1,1,0,0,0))) == []
+
+def test_orbit_calendar():
+    # cycle and track of a granule name
+    granule, = utilities.parse_granules([ATL06_GRANULE])
+    cycle,rgt = utilities.orbit_calendar([granule['time']])
+    assert (cycle[0], rgt[0]) == (granule['cycle'], granule['rgt']) == (3, 338)
+    cycle,rgt = utilities.orbit_calendar(['2019-04-20T09:30:51'])
+    assert (cycle[0], rgt[0]) == (3, 338)
+    # cycles start on 2018-12-28 and 2019-03-29
+    cycle,rgt = utilities.orbit_calendar(['2018-12-28T06:00:00',
+        '2018-12-28T07:00:00', '2019-03-29T06:00:00', '2019-03-29T07:00:00'])
+    assert cycle.tolist() == [1, 2, 2, 3]
+    assert rgt.tolist() == [1387, 1, 1387, 1]
+    # dates, datetimes and timestamps are converted to the same times
+    aware = datetime.datetime(2019, 1, 1, 1, tzinfo=datetime.timezone(
+        datetime.timedelta(hours=1)))
+    cycle,rgt = utilities.orbit_calendar(['2019-01-01',
+        datetime.datetime(2019, 1, 1), aware, np.datetime64('2019-01-01')])
+    assert cycle.tolist() == [2]*4 and len(set(rgt.tolist())) == 1
+    timestamp = utilities.orbit_calendar([calendar.timegm((2019,1,1,0,0,0))])
+    assert (timestamp[0][0], timestamp[1][0]) == (cycle[0], rgt[0])
+
+def test_cycle_range():
+    assert utilities.cycle_range('2019-03-30', '2019-03-30') == [3]
+    assert utilities.cycle_range('2019-03-28', '2019-03-30') == [2, 3]
+    assert utilities.cycle_range('2019-01-01', '2019-12-31') == \
+        [2, 3, 4, 5, 6]
+    # times before the first data start with cycle 1
+    assert utilities.cycle_range('2018-01-01', '2018-12-01') == [1]
+    assert utilities.cycle_range(end='2018-10-20') == [1]
+    # cycles started by a time
+    assert utilities.number_of_cycles(
+        calendar.timegm((2019,3,30,0,0,0))) == 3
+
+def test_validators():
+    assert utilities.cycles(None) == ['??']
+    assert utilities.cycles([3, '4']) == ['03', '04']
+    assert utilities.tracks(338) == ['0338']
+    assert utilities.tracks(range(1,4)) == ['0001', '0002', '0003']
+    assert utilities.granules('3') == ['03']
+    # values outside of the valid ranges
+    for function,value in ((utilities.cycles, 99), (utilities.tracks, 1388),
+        (utilities.granules, 15)):
+        with pytest.warns(UserWarning):
+            function([value])
+        with pytest.raises(AssertionError):
+            function([0])
+        with pytest.raises(TypeError):
+            function(3.0)
@@ -8,6 +8,16 @@ Download and management utilities for syncing time and auxiliary files
 PYTHON DEPENDENCIES:
     lxml: processing XML and HTML in Python
         https://pypi.python.org/pypi/lxml
+    aiohttp: asynchronous HTTP client/server (optional)
+        https://docs.aiohttp.org/
+    numpy: Scientific Computing Tools For Python (optional)
+        https://numpy.org
+    ijson: iterative JSON parser (optional)
+        https://pypi.org/project/ijson/
+    pandas: Python Data Analysis Library (optional)
+        https://pandas.pydata.org
+    h5py: Python interface for Hierarchal Data Format 5 (HDF5) (optional)
+        https://www.h5py.org/
 """
 from __future__ import print_function
 
@@ -23,20 +33,72 @@ import shutil
 import base64
 import socket
 import getpass
+import asyncio
 import inspect
 import hashlib
+import functools
+import sqlite3
 import logging
 import builtins
+import threading
 import datetime
 import warnings
+import weakref
+import contextlib
+import contextvars
+import itertools
+import collections
 import posixpath
 import lxml.etree
 import calendar,time
+import email.utils
+import http.client
 import http.cookiejar
 import urllib.request
+import urllib.parse
+import concurrent.futures
+# attempt imports
+try:
+    import aiohttp
+except (ImportError, ModuleNotFoundError) as exc:
+    warnings.filterwarnings("module")
+    warnings.warn("aiohttp not available", ImportWarning)
+try:
+    import numpy as np
+except (ImportError, ModuleNotFoundError) as exc:
+    warnings.filterwarnings("module")
+    warnings.warn("numpy not available", ImportWarning)
+try:
+    import pandas as pd
+except (ImportError, ModuleNotFoundError) as exc:
+    warnings.filterwarnings("module")
+    warnings.warn("pandas not available", ImportWarning)
+try:
+    import h5py
+except (ImportError, ModuleNotFoundError) as exc:
+    warnings.filterwarnings("module")
+    warnings.warn("h5py not available", ImportWarning)
+try:
+    import ijson
+except (ImportError, ModuleNotFoundError) as exc:
+    ijson = None
+try:
+    import fcntl
+except (ImportError, ModuleNotFoundError) as exc:
+    fcntl = None
+
+# ioctl request number for copy-on-write file clones on linux
+_FICLONE = 0x40049409
+
+# NASA Common Metadata Repository (CMR) and NSIDC https hosts
+# can be overridden to point at local stand-in servers for testing
+CMR_HOST = os.environ.get('ICESAT2_CMR_HOST',
+    'https://cmr.earthdata.nasa.gov')
+NSIDC_HOST = os.environ.get('ICESAT2_NSIDC_HOST',
+    'https://n5eil01u.ecs.nsidc.org')
 
 # PURPOSE: get the hash value of a file
-def get_hash(local, algorithm='MD5'):
+def get_hash(local, algorithm='MD5', chunk=1048576):
     """
     Get the hash value from a local file or BytesIO object
 
@@ -49,25 +111,100 @@ def get_hash(local, algorithm='MD5'):
     algorithm: hashing algorithm for checksum validation
         MD5: Message Digest
         sha1: Secure Hash Algorithm
+        or any other algorithm available in hashlib (e.g. sha256, blake2b)
+    chunk: chunk size for reading files
     """
+    # create the hash object for the algorithm
+    hash_obj = hashlib.new(algorithm.lower())
     # check if open file object or if local file exists
-    if isinstance(local, io.IOBase):
-        if (algorithm == 'MD5'):
-            return hashlib.md5(local.getvalue()).hexdigest()
-        elif (algorithm == 'sha1'):
-            return hashlib.sha1(local.getvalue()).hexdigest()
+    if isinstance(local, io.BytesIO):
+        # hash the buffer contents without copying
+        with local.getbuffer() as view:
+            hash_obj.update(view)
+        return hash_obj.hexdigest()
+    elif isinstance(local, io.IOBase):
+        # hash the file object contents from the start of the file
+        position = local.tell()
+        local.seek(0)
+        hash_obj = _update_hash(hash_obj, local, chunk)
+        local.seek(position)
+        return hash_obj.hexdigest()
     elif os.access(os.path.expanduser(local),os.F_OK):
         # generate checksum hash for local file
         # open the local_file in binary read mode
         with open(os.path.expanduser(local), 'rb') as local_buffer:
-            # generate checksum hash for a given type
-            if (algorithm == 'MD5'):
-                return hashlib.md5(local_buffer.read()).hexdigest()
-            elif (algorithm == 'sha1'):
-                return hashlib.sha1(local_buffer.read()).hexdigest()
+            hash_obj = _update_hash(hash_obj, local_buffer, chunk)
+        return hash_obj.hexdigest()
     else:
         return ''
 
+# PURPOSE: update a hash object with chunks from a file object
+def _update_hash(hash_obj, fileobj, chunk):
+    # reuse a single buffer for reading chunks from the file
+    buffer = bytearray(chunk)
+    view = memoryview(buffer)
+    while True:
+        nbytes = fileobj.readinto(buffer)
+        if not nbytes:
+            break
+        hash_obj.update(view[:nbytes])
+    return hash_obj
+
+# PURPOSE: verify the hash values of files against a manifest
+def verify_manifest(manifest, directory=None, algorithm='MD5',
+    processes=False, max_workers=None, chunk=1048576):
+    """
+    Verify the hash values of files in a directory against a manifest
+
+    Arguments
+    ---------
+    manifest: dictionary of file names and hash values or path to a
+        manifest file with lines of "hash  filename"
+
+    Keyword Arguments
+    -----------------
+    directory: directory containing the files (default is the
+        directory of the manifest file)
+    algorithm: hashing algorithm for checksum validation
+    processes: use a pool of processes instead of threads
+    max_workers: maximum number of parallel workers
+    chunk: chunk size for reading files
+
+    Returns
+    -------
+    valid: dictionary of file names and if the hash values match
+    """
+    # read the manifest file
+    if isinstance(manifest, str):
+        manifest = os.path.abspath(os.path.expanduser(manifest))
+        if directory is None:
+            directory = os.path.dirname(manifest)
+        with open(manifest, 'r') as f:
+            lines = [l.split(None, 1) for l in f.read().splitlines()]
+        # skip blank lines and warn about lines without a hash and name
+        for i,line in enumerate(lines):
+            if (len(line) == 1):
+                logging.warning('Malformed manifest line {0:d}: {1}'.format(
+                    i+1, line[0]))
+        manifest = {line[1].strip().lstrip('*'):line[0].lower()
+            for line in lines if (len(line) == 2)}
+    directory = os.path.abspath(os.path.expanduser(directory or os.getcwd()))
+    # full paths of files in the manifest
+    names = sorted(manifest.keys())
+    paths = [os.path.join(directory, name) for name in names]
+    # calculate hash values using a pool of parallel workers
+    if processes:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+    with executor:
+        hashes = executor.map(get_hash, paths,
+            itertools.repeat(algorithm), itertools.repeat(chunk))
+        valid = {name:(h == manifest[name].lower())
+            for name,h in zip(names, hashes)}
+    # return the validity of each file
+    return valid
+
 # PURPOSE: recursively split a url path
 def url_split(s):
     """
@@ -84,6 +221,19 @@ def url_split(s):
         return tail,
     return url_split(head) + (tail,)
 
+# PURPOSE: get the directory for cached files
+def get_cache_home(*args):
+    """
+    Get the directory for cached files from the XDG_CACHE_HOME
+    environment variable (default ~/.cache)
+
+    Arguments
+    ---------
+    *args: subdirectories or files within the cache directory
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join('~','.cache'))
+    return os.path.join(os.path.expanduser(cache_home), *args)
+
 # PURPOSE: returns the Unix timestamp value for a formatted date string
 def get_unix_time(time_string, format='%Y-%m-%d %H:%M:%S'):
     """
@@ -104,6 +254,89 @@ def get_unix_time(time_string, format='%Y-%m-%d %H:%M:%S'):
     else:
         return calendar.timegm(parsed_time)
 
+# PURPOSE: returns the Unix timestamp value for a remote http file
+def get_http_mtime(response):
+    """
+    Get the Unix timestamp value for the Last-Modified header of a
+    http response
+
+    Arguments
+    ---------
+    response: http response object
+    """
+    # get the last modified date from the response headers
+    headers = {k.lower():v for k,v in dict(response.info()).items()}
+    if 'last-modified' not in headers:
+        return None
+    return get_unix_time(headers['last-modified'],
+        format='%a, %d %b %Y %H:%M:%S GMT')
+
+# PURPOSE: returns the size of a remote http file
+def get_http_size(url, timeout=None, context=None):
+    """
+    Get the size of a remote http file from the Content-Length header
+    of a HEAD request
+
+    Arguments
+    ---------
+    url: remote file url
+
+    Keyword arguments
+    -----------------
+    timeout: timeout in seconds for blocking operations
+    context: SSL context for url opener object
+
+    Returns
+    -------
+    size: size of the remote file in bytes (None if unavailable)
+    """
+    request = urllib.request.Request(url, method='HEAD')
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout,
+            context=context)
+    except (urllib.request.HTTPError, urllib.request.URLError,
+        socket.timeout):
+        return None
+    headers = {k.lower():v for k,v in dict(response.info()).items()}
+    if 'content-length' not in headers:
+        return None
+    return int(headers['content-length'])
+
+# PURPOSE: check if a local file is current with a remote file
+def is_current(local, remote_mtime=None, remote_size=None):
+    """
+    Check if a local file is current with a remote file by comparing
+    file sizes and last modification times
+
+    Arguments
+    ---------
+    local: path to local file
+
+    Keyword arguments
+    -----------------
+    remote_mtime: last modification time of the remote file
+    remote_size: size of the remote file in bytes
+
+    Returns
+    -------
+    True if the local file exists and is unchanged
+    """
+    local = os.path.abspath(os.path.expanduser(local))
+    # check if local file exists
+    if not os.access(local, os.F_OK):
+        return False
+    # cannot compare if there is no remote information
+    if (remote_mtime is None) and (remote_size is None):
+        return False
+    local_stat = os.stat(local)
+    # compare file sizes
+    if (remote_size is not None) and (local_stat.st_size != remote_size):
+        return False
+    # compare last modification times (remote listings are truncated)
+    if (remote_mtime is not None) and (int(local_stat.st_mtime) < remote_mtime):
+        return False
+    return True
+
 #-- PURPOSE: rounds a number to an even number less than or equal to original
 def even(value):
     """
@@ -126,10 +359,327 @@ def ceil(value):
     """
     return -int(-value//1)
 
+# hooks for receiving transfer events
+_transfer_hooks = []
+# transfer timer for the current thread or asynchronous task
+_active_timer = contextvars.ContextVar('_active_timer', default=None)
+
+# PURPOSE: add a hook for receiving transfer events
+def add_transfer_hook(hook):
+    """
+    Add a callback for receiving timing events for each CMR query,
+    directory listing and download
+
+    Arguments
+    ---------
+    hook: callable accepting a dictionary with the event
+        type: cmr, list, download or range
+        url: remote url
+        start: Unix time at the start of the transfer
+        dns: seconds resolving host names for new connections
+        connect: seconds opening new connections after name resolution
+        ttfb: seconds until the response headers were received
+            (including name resolution, connection and redirects)
+        elapsed: seconds for the full transfer
+        bytes: number of bytes transferred
+        throughput: bytes transferred per second
+        status: response status code
+        redirected: if the response was redirected
+        retries: number of retries for the transfer
+        error: notification for transfer error
+    """
+    if hook not in _transfer_hooks:
+        _transfer_hooks.append(hook)
+
+# PURPOSE: remove a hook for receiving transfer events
+def remove_transfer_hook(hook):
+    """
+    Remove a callback for receiving transfer events
+
+    Arguments
+    ---------
+    hook: callable previously added with add_transfer_hook
+    """
+    if hook in _transfer_hooks:
+        _transfer_hooks.remove(hook)
+
+# PURPOSE: time a transfer and send the event to any hooks
+class TransferTimer:
+    """
+    Time a transfer and send the event to any transfer hooks
+
+    Arguments
+    ---------
+    type: type of transfer (cmr, list, download or range)
+    url: remote url
+
+    Notes
+    -----
+    Name resolution and connection times are only recorded for
+    connections opened by the build_opener handlers or the
+    async_session client session, and are None for reused connections
+    """
+    def __init__(self, type, url):
+        self.event = dict(type=type, url=url, start=time.time(), dns=None,
+            connect=None, ttfb=None, elapsed=None, bytes=0, throughput=None,
+            status=None, redirected=False, retries=0, error=None)
+        self._counter = time.perf_counter()
+        # set as the active timer for any new connections
+        self._previous = _active_timer.get()
+        _active_timer.set(self)
+
+    def add_time(self, key, seconds):
+        """
+        Add to the time spent resolving host names or connecting
+        """
+        self.event[key] = (self.event[key] or 0.0) + seconds
+
+    def response(self, response):
+        """
+        Record the time until the response headers were received
+        """
+        self.event['ttfb'] = time.perf_counter() - self._counter
+        # urllib responses or aiohttp client responses
+        if hasattr(response, 'getcode'):
+            status,url = (response.getcode(), response.geturl())
+        else:
+            status,url = (response.status, str(response.url))
+        self.event['status'] = status
+        self.event['redirected'] = (url != self.event['url'])
+        return response
+
+    def wrap(self, fileobj):
+        """
+        Wrap a file object to count the number of bytes read
+        """
+        return _CountingReader(fileobj, self.event)
+
+    def finish(self, nbytes=None, error=None, retries=None):
+        """
+        Finish timing the transfer and send the event to any hooks
+        """
+        self.event['elapsed'] = time.perf_counter() - self._counter
+        # restore the previously active timer
+        if _active_timer.get() is self:
+            _active_timer.set(self._previous)
+        if nbytes is not None:
+            self.event['bytes'] = nbytes
+        if retries is not None:
+            self.event['retries'] = retries
+        if error is not None:
+            self.event['error'] = str(error)
+            # urllib errors have codes and aiohttp errors have statuses
+            if isinstance(error, urllib.request.HTTPError):
+                self.event['status'] = error.code
+            elif isinstance(getattr(error, 'status', None), int):
+                self.event['status'] = error.status
+        if self.event['elapsed'] > 0:
+            self.event['throughput'] = self.event['bytes']/self.event['elapsed']
+        for hook in list(_transfer_hooks):
+            try:
+                hook(self.event)
+            except Exception as e:
+                logging.warning('Transfer hook error: {0}'.format(e))
+        return self.event
+
+# PURPOSE: open a connection timing name resolution and connection
+def _timed_create_connection(address, *args, **kwargs):
+    # use the standard connection if not timing a transfer
+    timer = _active_timer.get()
+    if timer is None:
+        return socket.create_connection(address, *args, **kwargs)
+    host,port = address
+    # resolve the host name
+    start = time.perf_counter()
+    addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    timer.add_time('dns', time.perf_counter() - start)
+    # connect to the first available address
+    start = time.perf_counter()
+    error = OSError('getaddrinfo returns an empty list')
+    for family,socktype,proto,canonname,sockaddr in addresses:
+        try:
+            sock = socket.create_connection(sockaddr[:2], *args, **kwargs)
+        except OSError as e:
+            error = e
+        else:
+            timer.add_time('connect', time.perf_counter() - start)
+            return sock
+    raise error
+
+# PURPOSE: http connections timing name resolution and connection
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _timed_create_connection
+
+class _TimedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _timed_create_connection
+
+# PURPOSE: urllib handlers opening timed connections
+class TimedHTTPHandler(urllib.request.HTTPHandler):
+    """
+    urllib handler recording name resolution and connection times
+    of http requests for the active transfer timer
+    """
+    def do_open(self, http_class, req, **kwargs):
+        return super().do_open(_TimedHTTPConnection, req, **kwargs)
+
+class TimedHTTPSHandler(urllib.request.HTTPSHandler):
+    """
+    urllib handler recording name resolution and connection times
+    of https requests for the active transfer timer
+    """
+    def do_open(self, http_class, req, **kwargs):
+        return super().do_open(_TimedHTTPSConnection, req, **kwargs)
+
+# PURPOSE: aiohttp trace callbacks for timing name resolution and connection
+async def _trace_dns_start(session, context, params):
+    context.dns_start = time.perf_counter()
+
+async def _trace_dns_end(session, context, params):
+    context.dns = time.perf_counter() - context.dns_start
+    timer = _active_timer.get()
+    if timer is not None:
+        timer.add_time('dns', context.dns)
+
+async def _trace_connect_start(session, context, params):
+    context.dns = 0.0
+    context.connect_start = time.perf_counter()
+
+async def _trace_connect_end(session, context, params):
+    # connection time without name resolution
+    timer = _active_timer.get()
+    if timer is not None:
+        elapsed = time.perf_counter() - context.connect_start
+        timer.add_time('connect', elapsed - context.dns)
+
+# PURPOSE: file object wrapper counting the number of bytes read
+class _CountingReader:
+    def __init__(self, fileobj, event):
+        self._fileobj = fileobj
+        self._event = event
+
+    def read(self, *args):
+        data = self._fileobj.read(*args)
+        self._event['bytes'] += len(data)
+        return data
+
+# PURPOSE: write transfer events as JSON lines
+class JSONLinesSink:
+    """
+    Transfer hook writing each event as a line of JSON
+
+    Arguments
+    ---------
+    fid: open file object for writing events
+    """
+    def __init__(self, fid=sys.stdout):
+        self.fid = fid
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.fid.write(json.dumps(event) + '\n')
+            self.fid.flush()
+
+# PURPOSE: aggregate transfer events into summary metrics
+class TransferMetrics:
+    """
+    Transfer hook aggregating events into summary metrics by type
+    """
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        """
+        Summarize the transfer events by type
+
+        Returns
+        -------
+        summary: dictionary of metrics for each type of transfer
+        """
+        summary = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            s = summary.setdefault(event['type'], dict(count=0, errors=0,
+                bytes=0, retries=0, redirected=0, elapsed=0.0, dns=0.0,
+                connect=0.0, connections=0, ttfb=0.0, responses=0))
+            s['count'] += 1
+            s['errors'] += int(event['error'] is not None)
+            s['bytes'] += event['bytes']
+            s['retries'] += event['retries']
+            s['redirected'] += int(event['redirected'])
+            s['elapsed'] += event['elapsed'] or 0.0
+            if event.get('connect') is not None:
+                s['dns'] += event['dns'] or 0.0
+                s['connect'] += event['connect']
+                s['connections'] += 1
+            if event['ttfb'] is not None:
+                s['ttfb'] += event['ttfb']
+                s['responses'] += 1
+        # calculate mean times and aggregate throughput
+        for s in summary.values():
+            s['mean_elapsed'] = s['elapsed']/s['count']
+            s['mean_dns'] = s['dns']/s['connections'] if s['connections'] else None
+            s['mean_connect'] = (s['connect']/s['connections']
+                if s['connections'] else None)
+            s['mean_ttfb'] = s['ttfb']/s['responses'] if s['responses'] else None
+            s['throughput'] = s['bytes']/s['elapsed'] if s['elapsed'] else None
+        return summary
+
+    def report(self):
+        """
+        Create a text report of the transfer events by type
+        """
+        lines = []
+        for type,s in sorted(self.summary().items()):
+            throughput = (s['throughput'] or 0.0)/1048576.0
+            mean_ttfb = s['mean_ttfb'] or 0.0
+            mean_dns = s['mean_dns'] or 0.0
+            mean_connect = s['mean_connect'] or 0.0
+            lines.append(('{0}: {1:d} requests ({2:d} errors, {3:d} retries) '
+                '{4:0.1f} MB in {5:0.2f} s, mean dns {6:0.3f} s, '
+                'mean connect {7:0.3f} s, mean time to first byte '
+                '{8:0.3f} s, {9:0.2f} MB/s').format(type, s['count'],
+                s['errors'], s['retries'], s['bytes']/1048576.0,
+                s['elapsed'], mean_dns, mean_connect, mean_ttfb, throughput))
+        return '\n'.join(lines)
+
+    def prometheus(self, prefix='icesat2_transfer'):
+        """
+        Format the summary metrics in the Prometheus text format
+        """
+        metrics = [('requests_total','count','counter'),
+            ('errors_total','errors','counter'),
+            ('retries_total','retries','counter'),
+            ('bytes_total','bytes','counter'),
+            ('seconds_total','elapsed','counter'),
+            ('dns_seconds_total','dns','counter'),
+            ('connect_seconds_total','connect','counter'),
+            ('connections_total','connections','counter'),
+            ('ttfb_seconds_total','ttfb','counter')]
+        summary = self.summary()
+        lines = []
+        for name,key,metric_type in metrics:
+            lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, metric_type))
+            for type,s in sorted(summary.items()):
+                lines.append('{0}_{1}{{type="{2}"}} {3}'.format(prefix,
+                    name, type, s[key]))
+        return '\n'.join(lines) + '\n'
+
 # PURPOSE: make a copy of a file with all system information
 def copy(source, destination, verbose=False, move=False):
     """
     Copy or move a file with all system information
+    (raising shutil.SameFileError if the destination is the source)
 
     Arguments
     ---------
@@ -140,14 +690,663 @@ def copy(source, destination, verbose=False, move=False):
     -----------------
     verbose: print file transfer information
     move: remove the source file
+
+    Returns
+    -------
+    method: method used to transfer the file
     """
     source = os.path.abspath(os.path.expanduser(source))
     destination = os.path.abspath(os.path.expanduser(destination))
     logging.info('{0} -->\n\t{1}'.format(source,destination))
-    shutil.copyfile(source, destination)
+    # do not truncate or remove files copied or moved onto themselves
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        raise shutil.SameFileError('{0} and {1} are the same file'.format(
+            source, destination))
+    # rename the file if moving within the same filesystem
+    if move and same_device(source, destination):
+        os.replace(source, destination)
+        return 'rename'
+    method = copy_contents(source, destination)
     shutil.copystat(source, destination)
     if move:
         os.remove(source)
+    return method
+
+# PURPOSE: check if a source and destination are on the same filesystem
+def same_device(source, destination):
+    """
+    Check if a destination file would be on the same device as a source
+
+    Arguments
+    ---------
+    source: source file
+    destination: destination file
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    try:
+        return (os.stat(source).st_dev == os.stat(directory).st_dev)
+    except OSError:
+        return False
+
+# PURPOSE: copy the contents of a file using kernel acceleration
+def copy_contents(source, destination, chunk=2**30):
+    """
+    Copy the contents of a file using the fastest available method:
+    copy-on-write reflinks, copy_file_range, sendfile or buffered copies
+
+    Arguments
+    ---------
+    source: source file
+    destination: destination file
+
+    Keyword arguments
+    -----------------
+    chunk: maximum number of bytes per system call
+
+    Returns
+    -------
+    method: method used to copy the file
+    """
+    # do not truncate files copied onto themselves
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        raise shutil.SameFileError('{0} and {1} are the same file'.format(
+            source, destination))
+    with open(source, 'rb') as fsrc, open(destination, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        # attempt to clone the file with a copy-on-write reflink
+        if (fcntl is not None) and sys.platform.startswith('linux'):
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            except OSError:
+                pass
+            else:
+                return 'reflink'
+        # attempt to copy within the kernel
+        for method in ('copy_file_range','sendfile'):
+            if not hasattr(os, method):
+                continue
+            offset = 0
+            try:
+                while (offset < size):
+                    if (method == 'copy_file_range'):
+                        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(),
+                            min(chunk, size - offset), offset, offset)
+                    else:
+                        n = os.sendfile(fdst.fileno(), fsrc.fileno(),
+                            offset, min(chunk, size - offset))
+                    if (n == 0):
+                        break
+                    offset += n
+            except OSError:
+                # reset any partial output and try the next method
+                fdst.seek(0)
+                fdst.truncate()
+                continue
+            if (offset == size):
+                return method
+            fdst.seek(0)
+            fdst.truncate()
+        # fall back to a buffered copy
+        fsrc.seek(0)
+        fdst.seek(0)
+        shutil.copyfileobj(fsrc, fdst, length=16*1024*1024)
+    return 'buffered'
+
+# PURPOSE: copy or move files in parallel across devices
+def copy_files(files, move=False, max_workers=None, per_device=2,
+    verbose=False, fid=sys.stdout):
+    """
+    Copy or move files in parallel with transfers grouped by device
+
+    Arguments
+    ---------
+    files: list of (source, destination) pairs
+
+    Keyword arguments
+    -----------------
+    move: remove the source files
+    max_workers: maximum number of concurrent transfers
+    per_device: maximum number of concurrent transfers per device pair
+    verbose: print file transfer information
+    fid: open file object to print if verbose
+
+    Returns
+    -------
+    summary: dictionary with transfer counts, bytes, timing and errors
+        (including any sources that are the same file as their
+        destination, which are left unchanged)
+    """
+    # create logger
+    loglevel = logging.INFO if verbose else logging.CRITICAL
+    logging.basicConfig(stream=fid, level=loglevel)
+    # summary of the transfers
+    summary = dict(files=0, bytes=0, methods=collections.Counter(),
+        errors=[])
+    # group the transfers by source and destination devices
+    semaphores = {}
+    jobs = []
+    for source,destination in files:
+        source = os.path.abspath(os.path.expanduser(source))
+        destination = os.path.abspath(os.path.expanduser(destination))
+        try:
+            # create output directory if non-existent
+            directory = os.path.dirname(destination)
+            if not os.access(directory, os.F_OK):
+                os.makedirs(directory, exist_ok=True)
+            key = (os.stat(source).st_dev, os.stat(directory).st_dev)
+        except OSError as exc:
+            # record missing sources without stopping the other transfers
+            logging.error('{0}: {1}'.format(source, exc))
+            summary['errors'].append((source, exc))
+            continue
+        semaphores.setdefault(key, threading.Semaphore(per_device))
+        jobs.append((source, destination, key))
+    if max_workers is None:
+        max_workers = per_device*max(len(semaphores), 1)
+    # transfer a single file while holding the device semaphore
+    def transfer(source, destination, key):
+        with semaphores[key]:
+            size = os.stat(source).st_size
+            method = copy(source, destination, move=move)
+        return (size, method)
+    # run the transfers and tabulate the results
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = {executor.submit(transfer, *job):job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            source,destination,key = futures[future]
+            try:
+                size,method = future.result()
+            except Exception as exc:
+                logging.error('{0}: {1}'.format(source, exc))
+                summary['errors'].append((source, exc))
+                continue
+            summary['files'] += 1
+            summary['bytes'] += size
+            summary['methods'][method] += 1
+    summary['elapsed'] = time.perf_counter() - start
+    summary['throughput'] = summary['bytes']/max(summary['elapsed'], 1e-9)
+    # report the transfer throughput
+    logging.info('{0:d} files, {1:d} bytes in {2:0.2f} s ({3:0.1f} MB/s)'.format(
+        summary['files'], summary['bytes'], summary['elapsed'],
+        summary['throughput']/1e6))
+    return summary
+
+# PURPOSE: content-addressed local cache of granules
+class GranuleCache:
+    """
+    Content-addressed local cache of granules with a size limit and
+    least recently used eviction that is safe for concurrent processes
+
+    Keyword arguments
+    -----------------
+    directory: directory for the cache (default ~/.cache/icesat2/granules)
+    max_bytes: maximum total size of cached granules in bytes
+    algorithm: hashing algorithm for granule checksums
+    """
+    def __init__(self, directory=None, max_bytes=50*1024**3,
+        algorithm='MD5'):
+        if directory is None:
+            directory = get_cache_home('icesat2', 'granules')
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self.algorithm = algorithm
+        if not os.access(self.directory, os.F_OK):
+            os.makedirs(self.directory)
+        # create the index of cached granules
+        with self._lock(), self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS granules (
+                producer_id TEXT NOT NULL, checksum TEXT NOT NULL,
+                path TEXT NOT NULL, size INTEGER NOT NULL,
+                atime REAL NOT NULL, algorithm TEXT NOT NULL DEFAULT 'MD5',
+                PRIMARY KEY (producer_id, checksum))""")
+            db.execute("""CREATE INDEX IF NOT EXISTS granules_atime
+                ON granules (atime)""")
+            # add the checksum algorithm to indices from older versions
+            columns = [row[1] for row in
+                db.execute('PRAGMA table_info(granules)')]
+            if 'algorithm' not in columns:
+                db.execute("""ALTER TABLE granules ADD COLUMN
+                    algorithm TEXT NOT NULL DEFAULT 'MD5'""")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # connect to the index of cached granules
+        # committing any changes and closing the connection when done
+        database = os.path.join(self.directory, 'index.db')
+        with contextlib.closing(sqlite3.connect(database, timeout=60)) as db:
+            with db:
+                yield db
+
+    @contextlib.contextmanager
+    def _lock(self, shared=False):
+        # lock the cache for concurrent processes
+        with open(os.path.join(self.directory, '.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def path(self, producer_id, checksum):
+        """
+        Path to a cached granule for a producer ID and checksum
+        """
+        return os.path.join(self.directory, checksum[:2],
+            '{0}_{1}'.format(checksum, producer_id))
+
+    def get(self, producer_id, checksum=None, algorithm=None, size=None):
+        """
+        Get a cached granule as a BytesIO object
+
+        Arguments
+        ---------
+        producer_id: granule producer ID (file name)
+
+        Keyword arguments
+        -----------------
+        checksum: hash value of the granule
+        algorithm: hashing algorithm of the checksum (default for cache)
+        size: size of the granule in bytes
+
+        Returns
+        -------
+        buffer: BytesIO representation of file (None if not cached)
+        """
+        with self._lock(shared=True), self._connect() as db:
+            query = ('SELECT checksum, path, algorithm FROM granules '
+                'WHERE producer_id=?')
+            args = [producer_id]
+            if checksum:
+                query += ' AND checksum=? AND UPPER(algorithm)=?'
+                args.extend([checksum, (algorithm or self.algorithm).upper()])
+            if size is not None:
+                query += ' AND size=?'
+                args.append(size)
+            row = db.execute(query + ' ORDER BY atime DESC', args).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(row[1], 'rb') as f:
+                    buffer = io.BytesIO(f.read())
+            except OSError:
+                return None
+            # update the access time of the granule
+            db.execute('UPDATE granules SET atime=? WHERE producer_id=? '
+                'AND checksum=?', (time.time(), producer_id, row[0]))
+        # save file basename, checksum and hashing algorithm
+        # with bytesIO object
+        buffer.filename = producer_id
+        buffer.checksum = row[0]
+        buffer.algorithm = row[2]
+        return buffer
+
+    def put(self, producer_id, buffer, checksum=None, algorithm=None):
+        """
+        Add a granule to the cache and evict least recently used granules
+
+        Arguments
+        ---------
+        producer_id: granule producer ID (file name)
+        buffer: BytesIO object or path to file
+
+        Keyword arguments
+        -----------------
+        checksum: hash value of the granule
+        algorithm: hashing algorithm of the checksum (default for cache)
+
+        Returns
+        -------
+        path: path to the cached granule (None if larger than the cache)
+        """
+        algorithm = (algorithm or self.algorithm).upper()
+        # do not cache granules that would be evicted immediately
+        if isinstance(buffer, io.IOBase):
+            position = buffer.tell()
+            size = buffer.seek(0, os.SEEK_END)
+            buffer.seek(position)
+        else:
+            size = os.path.getsize(os.path.expanduser(buffer))
+        if (size > self.max_bytes):
+            logging.warning('{0} ({1:d} bytes) is larger than the cache '
+                'limit and will not be cached'.format(producer_id, size))
+            return None
+        if checksum is None:
+            checksum = get_hash(buffer, algorithm=algorithm)
+        path = self.path(producer_id, checksum)
+        if not os.access(os.path.dirname(path), os.F_OK):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file and move into place
+        temp = '{0}.{1:d}.part'.format(path, os.getpid())
+        if isinstance(buffer, io.IOBase):
+            position = buffer.tell()
+            buffer.seek(0)
+            with open(temp, 'wb') as f:
+                shutil.copyfileobj(buffer, f)
+            buffer.seek(position)
+        else:
+            shutil.copyfile(os.path.expanduser(buffer), temp)
+        with self._lock(), self._connect() as db:
+            os.replace(temp, path)
+            db.execute('INSERT OR REPLACE INTO granules (producer_id, '
+                'checksum, path, size, atime, algorithm) VALUES '
+                '(?,?,?,?,?,?)', (producer_id, checksum, path,
+                os.stat(path).st_size, time.time(), algorithm))
+        self.evict()
+        return path
+
+    def evict(self, max_bytes=None):
+        """
+        Remove least recently used granules until within the size limit
+
+        Keyword arguments
+        -----------------
+        max_bytes: maximum total size of cached granules in bytes
+        """
+        max_bytes = self.max_bytes if (max_bytes is None) else max_bytes
+        with self._lock(), self._connect() as db:
+            total, = db.execute('SELECT COALESCE(SUM(size),0) FROM granules'
+                ).fetchone()
+            rows = db.execute('SELECT producer_id, checksum, path, size '
+                'FROM granules ORDER BY atime ASC')
+            evicted = []
+            for producer_id,checksum,path,size in rows:
+                if (total <= max_bytes):
+                    break
+                evicted.append((producer_id, checksum, path))
+                total -= size
+            for producer_id,checksum,path in evicted:
+                logging.info('Evicting {0}'.format(path))
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                db.execute('DELETE FROM granules WHERE producer_id=? '
+                    'AND checksum=?', (producer_id, checksum))
+
+    def size(self):
+        """
+        Total size of cached granules in bytes
+        """
+        with self._lock(shared=True), self._connect() as db:
+            total, = db.execute('SELECT COALESCE(SUM(size),0) FROM granules'
+                ).fetchone()
+        return total
+
+    def clear(self):
+        """
+        Remove all granules from the cache
+        """
+        self.evict(max_bytes=0)
+
+# PURPOSE: local catalog of granule metadata
+class GranuleCatalog:
+    """
+    Local SQLite catalog of granule metadata populated from CMR queries
+    and local HDF5 files with indices for spatial and temporal queries
+
+    Keyword arguments
+    -----------------
+    database: path to the catalog (default ~/.cache/icesat2/catalog.db)
+    """
+    # columns of the granule table
+    columns = ('producer_granule_id','product','url','checksum','size',
+        'start_time','end_time','lon_min','lat_min','lon_max','lat_max',
+        'rgt','cycle','region','release','local')
+
+    def __init__(self, database=None):
+        if database is None:
+            database = get_cache_home('icesat2', 'catalog.db')
+        self.database = os.path.abspath(os.path.expanduser(database))
+        if not os.access(os.path.dirname(self.database), os.F_OK):
+            os.makedirs(os.path.dirname(self.database))
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS granules (
+                id INTEGER PRIMARY KEY, producer_granule_id TEXT UNIQUE,
+                product TEXT, url TEXT, checksum TEXT, size REAL,
+                start_time REAL, end_time REAL, lon_min REAL, lat_min REAL,
+                lon_max REAL, lat_max REAL, rgt INTEGER, cycle INTEGER,
+                region INTEGER, release INTEGER, local TEXT)""")
+            db.execute("""CREATE INDEX IF NOT EXISTS granules_orbit
+                ON granules (product, cycle, rgt, region)""")
+            db.execute("""CREATE INDEX IF NOT EXISTS granules_time
+                ON granules (start_time, end_time)""")
+            # use an R*Tree spatial index if available
+            try:
+                db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS
+                    granules_rtree USING rtree(id, lon_min, lon_max,
+                    lat_min, lat_max)""")
+            except sqlite3.OperationalError:
+                db.execute("""CREATE INDEX IF NOT EXISTS granules_bbox
+                    ON granules (lat_min, lat_max, lon_min, lon_max)""")
+            self.rtree = bool(db.execute("""SELECT name FROM sqlite_master
+                WHERE name='granules_rtree'""").fetchone())
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # connect to the catalog
+        # committing any changes and closing the connection when done
+        with contextlib.closing(sqlite3.connect(self.database,
+            timeout=60)) as db:
+            with db:
+                yield db
+
+    def upsert(self, rows):
+        """
+        Insert or update granules in the catalog
+
+        Arguments
+        ---------
+        rows: list of dictionaries of granule metadata
+        """
+        with self._connect() as db:
+            for row in rows:
+                keys = [k for k in self.columns if row.get(k) is not None]
+                db.execute("""INSERT INTO granules ({0}) VALUES ({1})
+                    ON CONFLICT(producer_granule_id) DO UPDATE SET {2}
+                    """.format(','.join(keys), ','.join('?'*len(keys)),
+                    ','.join('{0}=excluded.{0}'.format(k) for k in keys)),
+                    [row[k] for k in keys])
+                # update the spatial index
+                if self.rtree and (row.get('lon_min') is not None):
+                    id, = db.execute("""SELECT id FROM granules WHERE
+                        producer_granule_id=?""",
+                        (row['producer_granule_id'],)).fetchone()
+                    db.execute("""INSERT OR REPLACE INTO granules_rtree
+                        VALUES (?,?,?,?,?)""", (id, row['lon_min'],
+                        row['lon_max'], row['lat_min'], row['lat_max']))
+
+    def _orbit(self, producer_granule_ids):
+        # parse the orbital parameters from the granule names
+        parsed = parse_granules(producer_granule_ids)
+        rows = []
+        for p in parsed:
+            row = dict(product=p['product'].decode('utf-8'))
+            if p['valid']:
+                row.update(rgt=int(p['rgt']), cycle=int(p['cycle']),
+                    region=int(p['region']), release=int(p['release']))
+            if not np.isnat(p['time']):
+                row['start_time'] = float(p['time'].astype(np.int64))
+            rows.append(row)
+        return rows
+
+    def add_cmr(self, producer_granule_ids, granule_urls):
+        """
+        Add granules from a CMR query to the catalog
+
+        Arguments
+        ---------
+        producer_granule_ids: list of ICESat-2 granules
+        granule_urls: list of ICESat-2 granule urls from NSIDC
+        """
+        rows = self._orbit(producer_granule_ids)
+        for row,id,url in zip(rows, producer_granule_ids, granule_urls):
+            row.update(producer_granule_id=id, url=url)
+        self.upsert(rows)
+
+    def add_records(self, records):
+        """
+        Add granules from CMR granule records to the catalog
+
+        Arguments
+        ---------
+        records: structured array of granules from cmr_records
+        """
+        ids = [id.decode('utf-8') for id in records['producer_granule_id']]
+        rows = self._orbit(ids)
+        # times as Unix timestamps
+        start_time = records['start_time'].astype('M8[ms]').astype(np.int64)
+        end_time = records['end_time'].astype('M8[ms]').astype(np.int64)
+        for i,row in enumerate(rows):
+            row.update(producer_granule_id=ids[i],
+                url=records['granule_url'][i].decode('utf-8'),
+                checksum=records['checksum'][i].decode('utf-8') or None,
+                size=float(records['size'][i])*1048576.0)
+            if not np.isnat(records['start_time'][i]):
+                row['start_time'] = start_time[i]/1000.0
+            if not np.isnat(records['end_time'][i]):
+                row['end_time'] = end_time[i]/1000.0
+            if np.all(np.isfinite(records['bbox'][i])):
+                row.update(zip(('lon_min','lat_min','lon_max','lat_max'),
+                    records['bbox'][i].tolist()))
+        self.upsert(rows)
+
+    def scan(self, directory, pattern=r'^ATL\d{2}.*\.h5$', hash=False):
+        """
+        Add local HDF5 granules to the catalog from their global attributes
+
+        Arguments
+        ---------
+        directory: local directory to scan recursively
+
+        Keyword arguments
+        -----------------
+        pattern: regular expression pattern for granule files
+        hash: calculate the MD5 checksum of each file
+        """
+        rx = re.compile(pattern)
+        files = [os.path.join(root, f) for root,dirs,filenames in
+            os.walk(os.path.expanduser(directory))
+            for f in filenames if rx.search(f)]
+        rows = self._orbit([os.path.basename(f) for f in files])
+        attributes = dict(time_coverage_start='start_time',
+            time_coverage_end='end_time', geospatial_lon_min='lon_min',
+            geospatial_lat_min='lat_min', geospatial_lon_max='lon_max',
+            geospatial_lat_max='lat_max')
+        for row,f in zip(rows, files):
+            row.update(producer_granule_id=os.path.basename(f),
+                local=os.path.abspath(f), size=os.stat(f).st_size)
+            if hash:
+                row['checksum'] = get_hash(f)
+            # read the global attributes of the granule
+            try:
+                with h5py.File(f, 'r') as fileID:
+                    for key,column in attributes.items():
+                        value = fileID.attrs.get(key)
+                        if value is None:
+                            continue
+                        elif isinstance(value, bytes):
+                            value = value.decode('utf-8')
+                        if column.endswith('_time'):
+                            value = np.datetime64(str(value).rstrip('Z'),
+                                'ms').astype(np.int64)/1000.0
+                        row[column] = float(value)
+            except (OSError, ValueError) as exc:
+                logging.warning('{0}: {1}'.format(f, exc))
+        self.upsert(rows)
+
+    def query(self, bbox=None, start=None, end=None, product=None,
+        cycles=None, tracks=None, regions=None, local=None):
+        """
+        Query the catalog for granules
+
+        Keyword arguments
+        -----------------
+        bbox: bounding box as [lon_min, lat_min, lon_max, lat_max]
+        start: start of the time range as a Unix timestamp
+        end: end of the time range as a Unix timestamp
+        product: ICESat-2 data product
+        cycles: list of 91-day orbital cycles
+        tracks: list of Reference Ground Tracks (RGTs)
+        regions: list of granule regions
+        local: only return granules with (True) or without (False)
+            local files
+
+        Returns
+        -------
+        list of dictionaries of granule metadata
+        """
+        conditions,args = ([],[])
+        tables = 'granules'
+        if bbox is not None:
+            xmin,ymin,xmax,ymax = bbox
+            if self.rtree:
+                tables = 'granules JOIN granules_rtree USING (id)'
+                prefix = 'granules_rtree.'
+            else:
+                prefix = 'granules.'
+            conditions.append(('{0}lon_max>=? AND {0}lon_min<=? AND '
+                '{0}lat_max>=? AND {0}lat_min<=?').format(prefix))
+            args.extend([xmin, xmax, ymin, ymax])
+        if start is not None:
+            conditions.append('COALESCE(end_time,start_time)>=?')
+            args.append(start)
+        if end is not None:
+            conditions.append('start_time<=?')
+            args.append(end)
+        if product is not None:
+            conditions.append('product=?')
+            args.append(product)
+        for column,values in (('cycle',cycles),('rgt',tracks),
+            ('region',regions)):
+            if values is not None:
+                values = [int(v) for v in np.atleast_1d(values)]
+                conditions.append('{0} IN ({1})'.format(column,
+                    ','.join('?'*len(values))))
+                args.extend(values)
+        if local is not None:
+            conditions.append('local IS {0} NULL'.format(
+                'NOT' if local else ''))
+        query = 'SELECT {0} FROM {1}'.format(','.join('granules.' + c
+            for c in self.columns), tables)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        with self._connect() as db:
+            cursor = db.execute(query + ' ORDER BY start_time', args)
+            return [dict(zip(self.columns, row)) for row in cursor]
+
+# PURPOSE: get a granule from a local cache
+def _from_cache(cache, HOST, checksum=None, size=None, local=None, hash='',
+    mode=0o775):
+    # granules need to be matched by MD5 checksum or size
+    # as the same producer ID can be reprocessed with different contents
+    if (checksum is None) and (size is None):
+        return None
+    # check if the granule is available in the local cache
+    remote_buffer = cache.get(HOST[-1], checksum=checksum, algorithm='MD5',
+        size=size)
+    if remote_buffer is None:
+        return None
+    logging.info('{0} (cached)'.format(posixpath.join(*HOST)))
+    # MD5 hash of the cached granule for comparing with the local file
+    if (remote_buffer.algorithm.upper() == 'MD5'):
+        remote_hash = remote_buffer.checksum
+    else:
+        remote_hash = hashlib.md5(remote_buffer.getvalue()).hexdigest()
+    # copy the cached granule to the local file if different
+    if local and (hash != remote_hash):
+        local = os.path.abspath(os.path.expanduser(local))
+        # create directory if non-existent
+        if not os.access(os.path.dirname(local), os.F_OK):
+            os.makedirs(os.path.dirname(local), mode)
+        with open(local, 'wb') as f:
+            shutil.copyfileobj(remote_buffer, f)
+        # change the permissions mode
+        os.chmod(local, mode)
+        remote_buffer.seek(0)
+    return remote_buffer
 
 # PURPOSE: check ftp connection
 def check_ftp_connection(HOST,username=None,password=None):
@@ -175,9 +1374,130 @@ def check_ftp_connection(HOST,username=None,password=None):
     else:
         return True
 
+# PURPOSE: pool of authenticated connections to a ftp host
+class FTPPool:
+    """
+    Pool of authenticated connections to a ftp host for reuse
+    across listings and downloads
+
+    Arguments
+    ---------
+    HOST: remote ftp host
+
+    Keyword arguments
+    -----------------
+    username: ftp username
+    password: ftp password
+    timeout: timeout in seconds for blocking operations
+    size: maximum number of open connections
+    """
+    def __init__(self, HOST, username=None, password=None, timeout=None,
+        size=4):
+        # verify inputs for remote ftp host
+        if not isinstance(HOST, str):
+            HOST = HOST[0]
+        self.host = url_split(HOST)[0]
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.size = size
+        # idle connections and count of all opened connections
+        self._idle = []
+        self._count = 0
+        self._condition = threading.Condition()
+
+    def connect(self):
+        """
+        Open a new authenticated connection to the ftp host
+        """
+        try:
+            ftp = ftplib.FTP(self.host, timeout=self.timeout)
+        except (socket.gaierror,IOError):
+            raise RuntimeError('Unable to connect to {0}'.format(self.host))
+        ftp.login(self.username, self.password)
+        return ftp
+
+    def acquire(self):
+        """
+        Get an idle connection from the pool or open a new connection
+        """
+        while True:
+            with self._condition:
+                # wait for an idle connection or room for a new connection
+                while not self._idle and (self._count >= self.size):
+                    self._condition.wait()
+                if not self._idle:
+                    # open a new connection below the maximum
+                    self._count += 1
+                    break
+                ftp = self._idle.pop()
+            # reuse the idle connection if still alive
+            # (checked without holding the lock for slow servers)
+            try:
+                ftp.voidcmd('NOOP')
+            except (ftplib.all_errors):
+                ftp.close()
+                with self._condition:
+                    self._count -= 1
+                    self._condition.notify()
+            else:
+                return ftp
+        try:
+            return self.connect()
+        except Exception:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, ftp):
+        """
+        Return a connection to the pool
+        """
+        with self._condition:
+            self._idle.append(ftp)
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Context manager for borrowing a connection from the pool
+        """
+        ftp = self.acquire()
+        try:
+            yield ftp
+        except BaseException:
+            # do not reuse connections in an unknown state
+            ftp.close()
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+            raise
+        else:
+            self.release(ftp)
+
+    def close(self):
+        """
+        Close all idle connections in the pool
+        """
+        with self._condition:
+            while self._idle:
+                ftp = self._idle.pop()
+                self._count -= 1
+                try:
+                    ftp.quit()
+                except (ftplib.all_errors):
+                    ftp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 # PURPOSE: list a directory on a ftp host
 def ftp_list(HOST,username=None,password=None,timeout=None,
-    basename=False,pattern=None,sort=False):
+    basename=False,pattern=None,sort=False,pool=None,size=False):
     """
     List a directory on a ftp host
 
@@ -193,60 +1513,101 @@ def ftp_list(HOST,username=None,password=None,timeout=None,
     basename: return the file or directory basename instead of the full path
     pattern: regular expression pattern for reducing list
     sort: sort output list
+    pool: pool of ftp connections to reuse
+    size: also return the sizes of items in the directory
 
     Returns
     -------
     output: list of items in a directory
     mtimes: list of last modification times for items in the directory
+    sizes: list of sizes in bytes for items in the directory
+        (if size is True, None for directories or if not listed)
     """
     # verify inputs for remote ftp host
     if isinstance(HOST, str):
         HOST = url_split(HOST)
-    # try to connect to ftp host
-    try:
-        ftp = ftplib.FTP(HOST[0],timeout=timeout)
-    except (socket.gaierror,IOError):
-        raise RuntimeError('Unable to connect to {0}'.format(HOST[0]))
+    # use a single connection if not using a pool
+    if pool is None:
+        pool = FTPPool(HOST[0], username=username, password=password,
+            timeout=timeout, size=1)
+        close_pool = True
     else:
-        ftp.login(username,password)
-        # list remote path
-        output = ftp.nlst(posixpath.join(*HOST[1:]))
-        # get last modified date of ftp files and convert into unix time
-        mtimes = [None]*len(output)
-        # iterate over each file in the list and get the modification time
-        for i,f in enumerate(output):
-            try:
-                # try sending modification time command
-                mdtm = ftp.sendcmd('MDTM {0}'.format(f))
-            except ftplib.error_perm:
-                # directories will return with an error
-                pass
-            else:
-                # convert the modification time into unix time
-                mtimes[i] = get_unix_time(mdtm[4:], format="%Y%m%d%H%M%S")
-        # reduce to basenames
-        if basename:
-            output = [posixpath.basename(i) for i in output]
-        # reduce using regular expression pattern
-        if pattern:
-            i = [i for i,f in enumerate(output) if re.search(pattern,f)]
-            # reduce list of listed items and last modified times
-            output = [output[indice] for indice in i]
-            mtimes = [mtimes[indice] for indice in i]
-        # sort the list
-        if sort:
-            i = [i for i,j in sorted(enumerate(output), key=lambda i: i[1])]
-            # sort list of listed items and last modified times
-            output = [output[indice] for indice in i]
-            mtimes = [mtimes[indice] for indice in i]
-        # close the ftp connection
-        ftp.close()
-        # return the list of items and last modified times
-        return (output,mtimes)
+        close_pool = False
+    with pool.connection() as ftp:
+        remote_path = posixpath.join(*HOST[1:])
+        try:
+            # list names, types, sizes and modification times in a single
+            # command using the default facts of the server (requesting
+            # facts sends an OPTS command that some servers reject)
+            output = []
+            mtimes = []
+            sizes = []
+            for name,facts in ftp.mlsd(remote_path):
+                facts = {k.lower():v for k,v in facts.items()}
+                # skip the current and parent directories
+                if facts.get('type','').lower() in ('cdir','pdir'):
+                    continue
+                output.append(posixpath.join(remote_path, name))
+                # directories will not have modification times or sizes
+                is_file = (facts.get('type','file').lower() == 'file')
+                if is_file and ('modify' in facts):
+                    mtimes.append(get_unix_time(facts['modify'][:14],
+                        format="%Y%m%d%H%M%S"))
+                else:
+                    mtimes.append(None)
+                if is_file and ('size' in facts):
+                    sizes.append(int(facts['size']))
+                else:
+                    sizes.append(None)
+        except ftplib.error_perm:
+            # list remote path if the server does not support MLSD
+            # (servers return either full paths or names in the directory)
+            output = [f if posixpath.dirname(f) else
+                posixpath.join(remote_path, f) for f in ftp.nlst(remote_path)]
+            # get last modified date of ftp files and convert into unix time
+            mtimes = [None]*len(output)
+            sizes = [None]*len(output)
+            # iterate over each file in the list and get the modification time
+            for i,f in enumerate(output):
+                try:
+                    # try sending modification time command
+                    mdtm = ftp.sendcmd('MDTM {0}'.format(f))
+                except ftplib.error_perm:
+                    # directories will return with an error
+                    pass
+                else:
+                    # convert the modification time into unix time
+                    mtimes[i] = get_unix_time(mdtm[4:], format="%Y%m%d%H%M%S")
+    # close the ftp connection
+    if close_pool:
+        pool.close()
+    # reduce to basenames
+    if basename:
+        output = [posixpath.basename(i) for i in output]
+    # reduce using regular expression pattern
+    if pattern:
+        i = [i for i,f in enumerate(output) if re.search(pattern,f)]
+        # reduce list of listed items and last modified times
+        output = [output[indice] for indice in i]
+        mtimes = [mtimes[indice] for indice in i]
+        sizes = [sizes[indice] for indice in i]
+    # sort the list
+    if sort:
+        i = [i for i,j in sorted(enumerate(output), key=lambda i: i[1])]
+        # sort list of listed items and last modified times
+        output = [output[indice] for indice in i]
+        mtimes = [mtimes[indice] for indice in i]
+        sizes = [sizes[indice] for indice in i]
+    # return the list of items, last modified times and sizes
+    if size:
+        return (output,mtimes,sizes)
+    # return the list of items and last modified times
+    return (output,mtimes)
 
 # PURPOSE: download a file from a ftp host
 def from_ftp(HOST,username=None,password=None,timeout=None,local=None,
-    hash='',chunk=8192,verbose=False,fid=sys.stdout,mode=0o775):
+    hash='',chunk=8192,verbose=False,fid=sys.stdout,mode=0o775,pool=None,
+    cache=None,checksum=None):
     """
     Download a file from a ftp host
 
@@ -265,6 +1626,10 @@ def from_ftp(HOST,username=None,password=None,timeout=None,local=None,
     verbose: print file transfer information
     fid: open file object to print if verbose
     mode: permissions mode of output local file
+    pool: pool of ftp connections to reuse
+    cache: local granule cache
+    checksum: MD5 hash of the remote file for finding it in the cache
+        (the remote file size is used if not given)
 
     Returns
     -------
@@ -276,51 +1641,127 @@ def from_ftp(HOST,username=None,password=None,timeout=None,local=None,
     # verify inputs for remote ftp host
     if isinstance(HOST, str):
         HOST = url_split(HOST)
-    # try downloading from ftp
-    try:
-        # try to connect to ftp host
-        ftp = ftplib.FTP(HOST[0],timeout=timeout)
-    except (socket.gaierror,IOError):
-        raise RuntimeError('Unable to connect to {0}'.format(HOST[0]))
+    # use a single connection if not using a pool
+    if pool is None:
+        pool = FTPPool(HOST[0], username=username, password=password,
+            timeout=timeout, size=1)
+        close_pool = True
     else:
-        ftp.login(username,password)
+        close_pool = False
+    # check the local granule cache
+    if cache is not None:
+        size = None
+        if checksum is None:
+            with pool.connection() as ftp:
+                try:
+                    ftp.voidcmd('TYPE I')
+                    size = ftp.size(posixpath.join(*HOST[1:]))
+                except ftplib.error_perm:
+                    pass
+        remote_buffer = _from_cache(cache, HOST, checksum=checksum,
+            size=size, local=local, hash=hash, mode=mode)
+        if remote_buffer is not None:
+            if close_pool:
+                pool.close()
+            return remote_buffer
+    # try downloading from ftp
+    timer = TransferTimer('download', posixpath.join('ftp://',*HOST))
+    with pool.connection() as ftp:
         # remote path
         ftp_remote_path = posixpath.join(*HOST[1:])
         # copy remote file contents to bytesIO object
         remote_buffer = io.BytesIO()
-        ftp.retrbinary('RETR {0}'.format(ftp_remote_path),
-            remote_buffer.write, blocksize=chunk)
-        remote_buffer.seek(0)
-        # save file basename with bytesIO object
-        remote_buffer.filename = HOST[-1]
-        # generate checksum hash for remote file
-        remote_hash = hashlib.md5(remote_buffer.getvalue()).hexdigest()
+        try:
+            ftp.retrbinary('RETR {0}'.format(ftp_remote_path),
+                remote_buffer.write, blocksize=chunk)
+        except ftplib.all_errors as e:
+            timer.finish(error=e)
+            raise
+        timer.finish(nbytes=remote_buffer.tell())
         # get last modified date of remote file and convert into unix time
         mdtm = ftp.sendcmd('MDTM {0}'.format(ftp_remote_path))
         remote_mtime = get_unix_time(mdtm[4:], format="%Y%m%d%H%M%S")
-        # compare checksums
-        if local and (hash != remote_hash):
-            # convert to absolute path
-            local = os.path.abspath(local)
-            # create directory if non-existent
-            if not os.access(os.path.dirname(local), os.F_OK):
-                os.makedirs(os.path.dirname(local), mode)
-            # print file information
-            args = (posixpath.join(*HOST),local)
-            logging.info('{0} -->\n\t{1}'.format(*args))
-            # store bytes to file using chunked transfer encoding
-            remote_buffer.seek(0)
-            with open(os.path.expanduser(local), 'wb') as f:
-                shutil.copyfileobj(remote_buffer, f, chunk)
-            # change the permissions mode
-            os.chmod(local,mode)
-            # keep remote modification time of file and local access time
-            os.utime(local, (os.stat(local).st_atime, remote_mtime))
-        # close the ftp connection
-        ftp.close()
-        # return the bytesIO object
+    # close the ftp connection
+    if close_pool:
+        pool.close()
+    remote_buffer.seek(0)
+    # save file basename with bytesIO object
+    remote_buffer.filename = HOST[-1]
+    # generate checksum hash for remote file
+    remote_hash = hashlib.md5(remote_buffer.getvalue()).hexdigest()
+    # compare checksums
+    if local and (hash != remote_hash):
+        # convert to absolute path
+        local = os.path.abspath(local)
+        # create directory if non-existent
+        if not os.access(os.path.dirname(local), os.F_OK):
+            os.makedirs(os.path.dirname(local), mode)
+        # print file information
+        args = (posixpath.join(*HOST),local)
+        logging.info('{0} -->\n\t{1}'.format(*args))
+        # store bytes to file using chunked transfer encoding
         remote_buffer.seek(0)
-        return remote_buffer
+        with open(os.path.expanduser(local), 'wb') as f:
+            shutil.copyfileobj(remote_buffer, f, chunk)
+        # change the permissions mode
+        os.chmod(local,mode)
+        # keep remote modification time of file and local access time
+        os.utime(local, (os.stat(local).st_atime, remote_mtime))
+    # add the file to the local granule cache
+    if cache is not None:
+        cache.put(HOST[-1], remote_buffer, checksum=remote_hash,
+            algorithm='MD5')
+    # return the bytesIO object
+    remote_buffer.seek(0)
+    return remote_buffer
+
+# PURPOSE: download files from a ftp host in parallel
+def from_ftp_parallel(HOSTS, local=None, username=None, password=None,
+    timeout=None, pool=None, max_workers=4, **kwargs):
+    """
+    Download files from a ftp host in parallel using a pool
+    of reusable connections
+
+    Arguments
+    ---------
+    HOSTS: list of remote ftp host paths
+
+    Keyword arguments
+    -----------------
+    local: list of paths to local files
+    username: ftp username
+    password: ftp password
+    timeout: timeout in seconds for blocking operations
+    pool: pool of ftp connections to reuse
+    max_workers: maximum number of parallel downloads
+    **kwargs: keyword arguments for from_ftp
+
+    Returns
+    -------
+    remote_buffers: list of BytesIO representations of files
+    """
+    # verify inputs for remote ftp hosts
+    HOSTS = [url_split(HOST) if isinstance(HOST, str) else HOST
+        for HOST in HOSTS]
+    if local is None:
+        local = [None]*len(HOSTS)
+    # create a pool of connections for the ftp host
+    if pool is None:
+        pool = FTPPool(HOSTS[0][0], username=username, password=password,
+            timeout=timeout, size=max_workers)
+        close_pool = True
+    else:
+        close_pool = False
+    # download files using the connection pool
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(from_ftp, HOST, local=l, pool=pool,
+            **kwargs) for HOST,l in zip(HOSTS,local)]
+        remote_buffers = [f.result() for f in futures]
+    # close the ftp connections
+    if close_pool:
+        pool.close()
+    # return the list of bytesIO objects
+    return remote_buffers
 
 # PURPOSE: check internet connection
 def check_connection(HOST):
@@ -339,10 +1780,167 @@ def check_connection(HOST):
     else:
         return True
 
+# PURPOSE: parse an Apache directory index in a single streaming pass
+def parse_index(fileobj, columns='nsidc', format='%Y-%m-%d %H:%M'):
+    """
+    Parse an Apache directory index in a single streaming pass
+    returning the column names and last modification times
+
+    Arguments
+    ---------
+    fileobj: file object with the html directory index
+
+    Keyword arguments
+    -----------------
+    columns: layout of the directory index table
+        nsidc: columns identified by class (indexcolname, indexcollastmod)
+        apache: name in the first unattributed column and modification
+            time in the first right-aligned column
+    format: format for input time string
+
+    Returns
+    -------
+    colnames: list of column names in a directory
+    collastmod: list of last modification times for items in the directory
+    """
+    colnames = []
+    collastmod = []
+    # iterate over each table row as it is parsed
+    for event,row in lxml.etree.iterparse(fileobj, events=('end',),
+        tag='tr', html=True):
+        colname,lastmod = (None,None)
+        for td in row.iterchildren('td'):
+            if (columns == 'nsidc'):
+                column = td.get('class')
+                if (column == 'indexcolname'):
+                    anchor = next(td.iter('a'), None)
+                    colname = None if anchor is None else anchor.get('href')
+                elif (column == 'indexcollastmod'):
+                    lastmod = td.text
+            elif (colname is None) and not td.attrib:
+                anchor = next(td.iter('a'), None)
+                colname = None if anchor is None else anchor.get('href')
+            elif (lastmod is None) and (td.get('align') == 'right'):
+                lastmod = td.text
+        # add rows with a linked item
+        if colname is not None:
+            colnames.append(colname)
+            # get the Unix timestamp value for a modification time
+            collastmod.append(get_unix_time(lastmod, format=format))
+        # free memory from parsed rows
+        row.clear(keep_tail=True)
+        while row.getprevious() is not None:
+            del row.getparent()[0]
+    return (colnames, collastmod)
+
+# PURPOSE: warn about the deprecated HTML parser argument
+def _deprecated_parser(parser):
+    if parser is not None:
+        warnings.warn('The parser argument is unused with the streaming '
+            'directory index parser and will be removed',
+            DeprecationWarning, stacklevel=3)
+
+# PURPOSE: reduce and sort a directory listing
+def reduce_listing(colnames, collastmod, pattern='', sort=False):
+    """
+    Reduce a directory listing using a regular expression pattern
+    and sort the listing by name
+
+    Arguments
+    ---------
+    colnames: list of column names in a directory
+    collastmod: list of last modification times for items in the directory
+
+    Keyword arguments
+    -----------------
+    pattern: regular expression pattern for reducing list
+    sort: sort output list
+
+    Returns
+    -------
+    colnames: list of column names in a directory
+    collastmod: list of last modification times for items in the directory
+    """
+    listing = list(zip(colnames, collastmod))
+    # reduce using regular expression pattern
+    if pattern:
+        regex = re.compile(pattern)
+        listing = [item for item in listing if regex.search(item[0])]
+    # sort the list by column name
+    if sort:
+        listing.sort(key=lambda item: item[0])
+    # return the list of column names and last modified times
+    colnames = [item[0] for item in listing]
+    collastmod = [item[1] for item in listing]
+    return (colnames, collastmod)
+
+# cache of directory listings with the time of listing
+_listing_cache = collections.OrderedDict()
+_listing_lock = threading.Lock()
+# maximum number of directory listings to cache
+LISTING_CACHE_SIZE = 4096
+
+# PURPOSE: get a directory listing from the cache
+def cached_listing(url, ttl=None):
+    """
+    Get a directory listing from the cache if not expired
+
+    Arguments
+    ---------
+    url: remote directory url
+
+    Keyword arguments
+    -----------------
+    ttl: time in seconds before cached listings expire
+
+    Returns
+    -------
+    colnames: list of column names in a directory
+    collastmod: list of last modification times for items in the directory
+    """
+    if not ttl:
+        return None
+    with _listing_lock:
+        listing = _listing_cache.get(url)
+        if listing is None:
+            return None
+        # remove expired listings
+        if (time.time() - listing[0]) > ttl:
+            del _listing_cache[url]
+            return None
+        _listing_cache.move_to_end(url)
+        return listing[1:]
+
+# PURPOSE: add a directory listing to the cache
+def cache_listing(url, colnames, collastmod):
+    """
+    Add a directory listing to the cache
+
+    Arguments
+    ---------
+    url: remote directory url
+    colnames: list of column names in a directory
+    collastmod: list of last modification times for items in the directory
+    """
+    with _listing_lock:
+        _listing_cache[url] = (time.time(), colnames, collastmod)
+        _listing_cache.move_to_end(url)
+        # remove the least recently used listings
+        while (len(_listing_cache) > LISTING_CACHE_SIZE):
+            _listing_cache.popitem(last=False)
+
+# PURPOSE: clear the cache of directory listings
+def clear_listing_cache():
+    """
+    Clear the cache of directory listings
+    """
+    with _listing_lock:
+        _listing_cache.clear()
+
 # PURPOSE: list a directory on an Apache http Server
 def http_list(HOST,timeout=None,context=ssl.SSLContext(),
-    parser=lxml.etree.HTMLParser(),format='%Y-%m-%d %H:%M',
-    pattern='',sort=False):
+    parser=None,format='%Y-%m-%d %H:%M',
+    pattern='',sort=False,ttl=None):
     """
     List a directory on an Apache http Server
 
@@ -354,10 +1952,12 @@ def http_list(HOST,timeout=None,context=ssl.SSLContext(),
     -----------------
     timeout: timeout in seconds for blocking operations
     context: SSL context for url opener object
-    parser: HTML parser for lxml
+    parser: deprecated and unused (directory indexes are parsed
+        with a streaming parser)
     format: format for input time string
     pattern: regular expression pattern for reducing list
     sort: sort output list
+    ttl: time in seconds to cache directory listings
 
     Returns
     -------
@@ -365,42 +1965,46 @@ def http_list(HOST,timeout=None,context=ssl.SSLContext(),
     collastmod: list of last modification times for items in the directory
     colerror: notification for list error
     """
+    # warn if using the deprecated parser argument
+    _deprecated_parser(parser)
     # verify inputs for remote http host
     if isinstance(HOST, str):
         HOST = url_split(HOST)
+    # check for a cached listing
+    listing = cached_listing(posixpath.join(*HOST), ttl=ttl)
+    if listing is not None:
+        colnames,collastmod = reduce_listing(*listing,
+            pattern=pattern, sort=sort)
+        return (colnames,collastmod,None)
     # try listing from http
+    timer = TransferTimer('list', posixpath.join(*HOST))
     try:
         # Create and submit request.
         request=urllib.request.Request(posixpath.join(*HOST))
         response=urllib.request.urlopen(request,timeout=timeout,context=context)
+        timer.response(response)
+        # read and parse request for files (column names and modified times)
+        colnames,collastmod = parse_index(timer.wrap(response),
+            columns='apache', format=format)
     except (urllib.request.HTTPError, urllib.request.URLError) as e:
+        timer.finish(error=e)
         colerror = 'List error from {0}'.format(posixpath.join(*HOST))
         return (False,False,colerror)
     else:
-        # read and parse request for files (column names and modified times)
-        tree = lxml.etree.parse(response,parser)
-        colnames = tree.xpath('//tr/td[not(@*)]//a/@href')
-        # get the Unix timestamp value for a modification time
-        collastmod = [get_unix_time(i,format=format)
-            for i in tree.xpath('//tr/td[@align="right"][1]/text()')]
-        # reduce using regular expression pattern
-        if pattern:
-            i = [i for i,f in enumerate(colnames) if re.search(pattern,f)]
-            # reduce list of column names and last modified times
-            colnames = [colnames[indice] for indice in i]
-            collastmod = [collastmod[indice] for indice in i]
-        # sort the list
-        if sort:
-            i = [i for i,j in sorted(enumerate(colnames), key=lambda i: i[1])]
-            # sort list of column names and last modified times
-            colnames = [colnames[indice] for indice in i]
-            collastmod = [collastmod[indice] for indice in i]
+        timer.finish()
+        # add the listing to the cache
+        if ttl:
+            cache_listing(posixpath.join(*HOST), colnames, collastmod)
+        # reduce using regular expression pattern and sort the list
+        colnames,collastmod = reduce_listing(colnames, collastmod,
+            pattern=pattern, sort=sort)
         # return the list of column names and last modified times
         return (colnames,collastmod,None)
 
 # PURPOSE: download a file from a http host
 def from_http(HOST,timeout=None,context=ssl.SSLContext(),local=None,hash='',
-    chunk=16384,verbose=False,fid=sys.stdout,mode=0o775):
+    chunk=16384,verbose=False,fid=sys.stdout,mode=0o775,cache=None,
+    checksum=None):
     """
     Download a file from a http host
 
@@ -418,6 +2022,9 @@ def from_http(HOST,timeout=None,context=ssl.SSLContext(),local=None,hash='',
     verbose: print file transfer information
     fid: open file object to print if verbose
     mode: permissions mode of output local file
+    cache: local granule cache
+    checksum: MD5 hash of the remote file for finding it in the cache
+        (the remote file size is used if not given)
 
     Returns
     -------
@@ -429,17 +2036,29 @@ def from_http(HOST,timeout=None,context=ssl.SSLContext(),local=None,hash='',
     # verify inputs for remote http host
     if isinstance(HOST, str):
         HOST = url_split(HOST)
+    # check the local granule cache
+    if cache is not None:
+        size = None if checksum else get_http_size(posixpath.join(*HOST),
+            timeout=timeout, context=context)
+        remote_buffer = _from_cache(cache, HOST, checksum=checksum,
+            size=size, local=local, hash=hash, mode=mode)
+        if remote_buffer is not None:
+            return remote_buffer
     # try downloading from http
+    timer = TransferTimer('download', posixpath.join(*HOST))
     try:
         # Create and submit request.
         request = urllib.request.Request(posixpath.join(*HOST))
         response = urllib.request.urlopen(request,timeout=timeout,context=context)
-    except (urllib.request.HTTPError, urllib.request.URLError):
-        raise Exception('Download error from {0}'.format(posixpath.join(*HOST)))
-    else:
+        timer.response(response)
         # copy remote file contents to bytesIO object
         remote_buffer = io.BytesIO()
-        shutil.copyfileobj(response, remote_buffer, chunk)
+        shutil.copyfileobj(timer.wrap(response), remote_buffer, chunk)
+    except (urllib.request.HTTPError, urllib.request.URLError) as e:
+        timer.finish(error=e)
+        raise Exception('Download error from {0}'.format(posixpath.join(*HOST)))
+    else:
+        timer.finish()
         remote_buffer.seek(0)
         # save file basename with bytesIO object
         remote_buffer.filename = HOST[-1]
@@ -461,6 +2080,14 @@ def from_http(HOST,timeout=None,context=ssl.SSLContext(),local=None,hash='',
                 shutil.copyfileobj(remote_buffer, f, chunk)
             # change the permissions mode
             os.chmod(local,mode)
+            # keep remote modification time of file and local access time
+            remote_mtime = get_http_mtime(response)
+            if remote_mtime is not None:
+                os.utime(local, (os.stat(local).st_atime, remote_mtime))
+        # add the file to the local granule cache
+        if cache is not None:
+            cache.put(HOST[-1], remote_buffer, checksum=remote_hash,
+                algorithm='MD5')
         # return the bytesIO object
         remote_buffer.seek(0)
         return remote_buffer
@@ -549,7 +2176,9 @@ def build_opener(username, password, context=ssl.SSLContext(),
     # SSL context handler
     if get_ca_certs:
         context.get_ca_certs()
-    handler.append(urllib.request.HTTPSHandler(context=context))
+    handler.append(TimedHTTPSHandler(context=context))
+    # time name resolution and connection of http requests
+    handler.append(TimedHTTPHandler())
     # redirect handler
     if redirect:
         handler.append(urllib.request.HTTPRedirectHandler())
@@ -573,7 +2202,7 @@ def check_credentials():
     Check that entered NASA Earthdata credentials are valid
     """
     try:
-        remote_path = posixpath.join('https://n5eil01u.ecs.nsidc.org','ATLAS')
+        remote_path = posixpath.join(NSIDC_HOST,'ATLAS')
         request = urllib.request.Request(url=remote_path)
         response = urllib.request.urlopen(request, timeout=20)
     except urllib.request.HTTPError:
@@ -585,7 +2214,7 @@ def check_credentials():
 
 # PURPOSE: list a directory on NSIDC https server
 def nsidc_list(HOST,username=None,password=None,build=True,timeout=None,
-    parser=lxml.etree.HTMLParser(),pattern='',sort=False):
+    parser=None,pattern='',sort=False,ttl=None):
     """
     List a directory on NSIDC
 
@@ -599,9 +2228,11 @@ def nsidc_list(HOST,username=None,password=None,build=True,timeout=None,
     password: NASA Earthdata password
     build: Build opener and check NASA Earthdata credentials
     timeout: timeout in seconds for blocking operations
-    parser: HTML parser for lxml
+    parser: deprecated and unused (directory indexes are parsed
+        with a streaming parser)
     pattern: regular expression pattern for reducing list
     sort: sort output list
+    ttl: time in seconds to cache directory listings
 
     Returns
     -------
@@ -609,6 +2240,8 @@ def nsidc_list(HOST,username=None,password=None,build=True,timeout=None,
     collastmod: list of last modification times for items in the directory
     colerror: notification for list error
     """
+    # warn if using the deprecated parser argument
+    _deprecated_parser(parser)
     # use netrc credentials
     if build and not (username or password):
         urs = 'urs.earthdata.nasa.gov'
@@ -622,38 +2255,126 @@ def nsidc_list(HOST,username=None,password=None,build=True,timeout=None,
     # verify inputs for remote https host
     if isinstance(HOST, str):
         HOST = url_split(HOST)
+    # check for a cached listing
+    listing = cached_listing(posixpath.join(*HOST), ttl=ttl)
+    if listing is not None:
+        colnames,collastmod = reduce_listing(*listing,
+            pattern=pattern, sort=sort)
+        return (colnames,collastmod,None)
     # try listing from https
+    timer = TransferTimer('list', posixpath.join(*HOST))
     try:
         # Create and submit request.
         request = urllib.request.Request(posixpath.join(*HOST))
-        tree = lxml.etree.parse(urllib.request.urlopen(request,timeout=timeout),parser)
+        response = urllib.request.urlopen(request,timeout=timeout)
+        timer.response(response)
+        # read and parse request for files (column names and modified times)
+        colnames,collastmod = parse_index(timer.wrap(response),
+            columns='nsidc')
     except (urllib.request.HTTPError, urllib.request.URLError) as e:
+        timer.finish(error=e)
         colerror = 'List error from {0}'.format(posixpath.join(*HOST))
         return (False,False,colerror)
     else:
-        # read and parse request for files (column names and modified times)
-        colnames = tree.xpath('//td[@class="indexcolname"]//a/@href')
-        # get the Unix timestamp value for a modification time
-        collastmod = [get_unix_time(i,format='%Y-%m-%d %H:%M')
-            for i in tree.xpath('//td[@class="indexcollastmod"]/text()')]
-        # reduce using regular expression pattern
-        if pattern:
-            i = [i for i,f in enumerate(colnames) if re.search(pattern,f)]
-            # reduce list of column names and last modified times
-            colnames = [colnames[indice] for indice in i]
-            collastmod = [collastmod[indice] for indice in i]
-        # sort the list
-        if sort:
-            i = [i for i,j in sorted(enumerate(colnames), key=lambda i: i[1])]
-            # sort list of column names and last modified times
-            colnames = [colnames[indice] for indice in i]
-            collastmod = [collastmod[indice] for indice in i]
+        timer.finish()
+        # add the listing to the cache
+        if ttl:
+            cache_listing(posixpath.join(*HOST), colnames, collastmod)
+        # reduce using regular expression pattern and sort the list
+        colnames,collastmod = reduce_listing(colnames, collastmod,
+            pattern=pattern, sort=sort)
         # return the list of column names and last modified times
         return (colnames,collastmod,None)
 
+# PURPOSE: recursively crawl directories on NSIDC https server
+def nsidc_crawl(HOST, patterns=None, username=None, password=None,
+    build=True, timeout=None, max_workers=8, ttl=None):
+    """
+    Recursively crawl directories on NSIDC listing directories in
+    parallel and yielding matching files as they are found
+
+    Arguments
+    ---------
+    HOST: remote https host path split as list
+
+    Keyword arguments
+    -----------------
+    patterns: list of regular expression patterns for reducing the
+        listing at each directory level (the number of patterns sets
+        the depth of the crawl)
+    username: NASA Earthdata username
+    password: NASA Earthdata password
+    build: Build opener and check NASA Earthdata credentials
+    timeout: timeout in seconds for blocking operations
+    max_workers: maximum number of parallel directory listings
+    ttl: time in seconds to cache directory listings
+
+    Returns
+    -------
+    generator of remote file urls and last modification times
+
+    Example
+    -------
+    for url,mtime in nsidc_crawl(HOST, patterns=[r'2019\.\d+\.\d+/',
+        r'ATL06_(.*?)\.h5$']):
+        print(url, mtime)
+    """
+    # use netrc credentials
+    if build and not (username or password):
+        urs = 'urs.earthdata.nasa.gov'
+        username,login,password = netrc.netrc().authenticators(urs)
+    # build urllib.request opener and check credentials once
+    if build:
+        build_opener(username, password)
+        check_credentials()
+    # verify inputs for remote https host
+    if isinstance(HOST, str):
+        HOST = url_split(HOST)
+    # compile the regular expression pattern for each level
+    regex = [re.compile(p) if p else None for p in (patterns or [])]
+    depth = max(len(regex), 1)
+    # list directories in parallel
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+    try:
+        # submit a directory listing at a given level
+        def submit(directory, level):
+            future = executor.submit(nsidc_list, directory, build=False,
+                timeout=timeout, ttl=ttl, sort=True)
+            pending[future] = (directory, level)
+        pending = {}
+        submit(HOST, 0)
+        while pending:
+            done,_ = concurrent.futures.wait(pending,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                directory,level = pending.pop(future)
+                colnames,collastmod,colerror = future.result()
+                if colerror:
+                    logging.warning(colerror)
+                    continue
+                for colname,lastmod in zip(colnames,collastmod):
+                    # skip parent directories and table sorting links
+                    if colname.startswith(('/','?','..')):
+                        continue
+                    # reduce using the regular expression for the level
+                    if (level < len(regex)) and regex[level] and \
+                        not regex[level].search(colname):
+                        continue
+                    if colname.endswith('/'):
+                        # descend into subdirectories
+                        if (level + 1) < depth:
+                            submit([*directory, colname.rstrip('/')], level+1)
+                    else:
+                        # yield matching files
+                        yield (posixpath.join(*directory, colname), lastmod)
+    finally:
+        # do not wait for queued listings if the consumer stops early
+        executor.shutdown(wait=False, cancel_futures=True)
+
 # PURPOSE: download a file from a NSIDC https server
 def from_nsidc(HOST,username=None,password=None,build=True,timeout=None,
-    local=None,hash='',chunk=16384,verbose=False,fid=sys.stdout,mode=0o775):
+    local=None,hash='',chunk=16384,verbose=False,fid=sys.stdout,mode=0o775,
+    cache=None,checksum=None):
     """
     Download a file from a NSIDC https server
 
@@ -673,6 +2394,9 @@ def from_nsidc(HOST,username=None,password=None,build=True,timeout=None,
     verbose: print file transfer information
     fid: open file object to print if verbose
     mode: permissions mode of output local file
+    cache: local granule cache
+    checksum: MD5 hash of the remote file for finding it in the cache
+        (the remote file size is used if not given)
 
     Returns
     -------
@@ -682,6 +2406,13 @@ def from_nsidc(HOST,username=None,password=None,build=True,timeout=None,
     # create logger
     loglevel = logging.INFO if verbose else logging.CRITICAL
     logging.basicConfig(stream=fid, level=loglevel)
+    # check the local granule cache before building opener
+    if (cache is not None) and checksum:
+        remote_buffer = _from_cache(cache,
+            url_split(HOST) if isinstance(HOST, str) else HOST,
+            checksum=checksum, local=local, hash=hash, mode=mode)
+        if remote_buffer is not None:
+            return (remote_buffer,None)
     # use netrc credentials
     if build and not (username or password):
         urs = 'urs.earthdata.nasa.gov'
@@ -695,18 +2426,29 @@ def from_nsidc(HOST,username=None,password=None,build=True,timeout=None,
     # verify inputs for remote https host
     if isinstance(HOST, str):
         HOST = url_split(HOST)
+    # check the local granule cache using the size of the remote file
+    if (cache is not None) and not checksum:
+        size = get_http_size(posixpath.join(*HOST), timeout=timeout)
+        remote_buffer = _from_cache(cache, HOST, size=size, local=local,
+            hash=hash, mode=mode)
+        if remote_buffer is not None:
+            return (remote_buffer,None)
     # try downloading from https
+    timer = TransferTimer('download', posixpath.join(*HOST))
     try:
         # Create and submit request.
         request = urllib.request.Request(posixpath.join(*HOST))
         response = urllib.request.urlopen(request,timeout=timeout)
-    except:
+        timer.response(response)
+        # copy remote file contents to bytesIO object
+        remote_buffer = io.BytesIO()
+        shutil.copyfileobj(timer.wrap(response), remote_buffer, chunk)
+    except Exception as e:
+        timer.finish(error=e)
         response_error = 'Download error from {0}'.format(posixpath.join(*HOST))
         return (False,response_error)
     else:
-        # copy remote file contents to bytesIO object
-        remote_buffer = io.BytesIO()
-        shutil.copyfileobj(response, remote_buffer, chunk)
+        timer.finish()
         remote_buffer.seek(0)
         # save file basename with bytesIO object
         remote_buffer.filename = HOST[-1]
@@ -728,143 +2470,967 @@ def from_nsidc(HOST,username=None,password=None,build=True,timeout=None,
                 shutil.copyfileobj(remote_buffer, f, chunk)
             # change the permissions mode
             os.chmod(local,mode)
+            # keep remote modification time of file and local access time
+            remote_mtime = get_http_mtime(response)
+            if remote_mtime is not None:
+                os.utime(local, (os.stat(local).st_atime, remote_mtime))
+        # add the file to the local granule cache
+        if cache is not None:
+            cache.put(HOST[-1], remote_buffer, checksum=remote_hash,
+                algorithm='MD5')
         # return the bytesIO object
         remote_buffer.seek(0)
         return (remote_buffer,None)
 
-# PURPOSE: build formatted query string for ICESat-2 release
-def query_release(release):
+# PURPOSE: seekable file object for reading a remote file with range requests
+class HTTPRangeFile(io.RawIOBase):
     """
-    Build formatted query string for ICESat-2 release
+    Seekable file-like object for reading a remote file using http
+    range requests with a block cache for use with h5py and xarray
 
     Arguments
     ---------
-    release: ICESat-2 data release to query
+    url: remote file url
 
-    Returns
-    -------
-    query_params: formatted string for CMR queries
+    Keyword arguments
+    -----------------
+    block_size: size in bytes of each cached block
+    cache_blocks: maximum number of blocks to keep in the cache
+    readahead: number of additional blocks to request after a miss
+    timeout: timeout in seconds for blocking operations
+    context: SSL context for url opener object
     """
-    if release is None:
-        return ''
-    # maximum length of version in CMR queries
-    desired_pad_length = 3
-    if len(str(release)) > desired_pad_length:
-        raise RuntimeError('Release string too long: "{0}"'.format(release))
-    # Strip off any leading zeros
-    release = str(release).lstrip('0')
-    query_params = ''
-    while len(release) <= desired_pad_length:
-        padded_release = release.zfill(desired_pad_length)
-        query_params += '&version={0}'.format(padded_release)
-        desired_pad_length -= 1
-    return query_params
+    def __init__(self, url, block_size=1048576, cache_blocks=64,
+        readahead=1, timeout=None, context=None):
+        super().__init__()
+        # the cache needs room for a missed block and its readahead
+        if (cache_blocks <= readahead):
+            raise ValueError('cache_blocks ({0:d}) must be greater than '
+                'readahead ({1:d})'.format(cache_blocks, readahead))
+        self.url = url
+        self.name = posixpath.basename(url)
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.readahead = readahead
+        self.timeout = timeout
+        self.context = context
+        # url after following redirects
+        self._resolved = url
+        # least recently used cache of blocks
+        self._blocks = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._position = 0
+        # number of bytes and requests transferred from the remote file
+        self.bytes_transferred = 0
+        self.requests = 0
+        # get the size of the remote file with the first block
+        self.size = None
+        try:
+            self._fetch(0, 0)
+        except urllib.request.HTTPError as e:
+            # zero-length files can not satisfy any range request
+            content_range = e.headers.get('Content-Range', '')
+            if (e.code != 416) or not content_range.endswith('/0'):
+                raise
+            self.size = 0
 
-# PURPOSE: check if the submitted cycles are valid
-def cycles(cycle):
-    """
-    Check if the submitted cycles are valid
+    def _request(self, url, start, end):
+        # request a range of bytes from the remote file
+        headers = {'Range': 'bytes={0:d}-{1:d}'.format(start, end)}
+        request = urllib.request.Request(url, headers=headers)
+        return urllib.request.urlopen(request, timeout=self.timeout,
+            context=self.context)
 
-    Arguments
-    ---------
-    cycle: ICESat-2 orbital cycle
-    """
-    # string length of cycles in granules
-    cycle_length = 2
-    # number of GPS seconds between the GPS epoch and ATLAS SDP epoch
-    atlas_sdp_gps_epoch = 1198800018.0
-    # number of GPS seconds since the GPS epoch for first ATLAS data point
-    atlas_gps_start_time = atlas_sdp_gps_epoch + 24710205.39202261
-    epoch1 = datetime.datetime(1980, 1, 6, 0, 0, 0)
-    epoch2 = datetime.datetime(1970, 1, 1, 0, 0, 0)
-    # get the total number of seconds since the start of ATLAS and now
-    delta_time_epochs = (epoch2 - epoch1).total_seconds()
-    atlas_UNIX_start_time = atlas_gps_start_time - delta_time_epochs
-    present_time = datetime.datetime.now().timestamp()
-    # divide total time by cycle length to get the maximum number of orbital cycles
-    ncycles = ceil((present_time - atlas_UNIX_start_time) / (86400 * 91))
-    all_cycles = [str(c + 1).zfill(cycle_length) for c in range(ncycles)]
-    if cycle is None:
-        return ["??"]
-    else:
-        if isinstance(cycle, (str,int)):
-            assert int(cycle) > 0, "Cycle number must be positive"
-            cycle_list = [str(cycle).zfill(cycle_length)]
-        elif isinstance(cycle, list):
-            cycle_list = []
-            for c in cycle:
-                assert int(c) > 0, "Cycle number must be positive"
-                cycle_list.append(str(c).zfill(cycle_length))
+    def _fetch(self, first, last):
+        # request a contiguous set of blocks
+        start = first*self.block_size
+        end = (last + 1)*self.block_size - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+        timer = TransferTimer('range', self.url)
+        try:
+            response = self._request(self._resolved, start, end)
+        except urllib.request.HTTPError as e:
+            # redirected urls may expire so retry with the original url
+            if (self._resolved == self.url):
+                timer.finish(error=e)
+                raise
+            self._resolved = self.url
+            timer.event['retries'] += 1
+            response = self._request(self._resolved, start, end)
+        timer.response(response)
+        # verify that the server returned a partial response
+        if (response.getcode() != 206):
+            raise RuntimeError('Range requests not supported by {0}'.format(
+                self.url))
+        # keep the url after redirects for future requests
+        self._resolved = response.geturl()
+        # get the total size of the remote file
+        headers = {k.lower():v for k,v in dict(response.info()).items()}
+        self.size = int(headers['content-range'].split('/')[-1])
+        content = response.read()
+        self.bytes_transferred += len(content)
+        self.requests += 1
+        timer.finish(nbytes=len(content))
+        # split content into blocks and add to the cache
+        for i,b in enumerate(range(first, last + 1)):
+            block = content[i*self.block_size:(i+1)*self.block_size]
+            if block:
+                self._blocks[b] = block
+                self._blocks.move_to_end(b)
+        # remove the least recently used blocks
+        while (len(self._blocks) > self.cache_blocks):
+            self._blocks.popitem(last=False)
+
+    def _block(self, b):
+        # get a block from the cache or request missing blocks
+        if b not in self._blocks:
+            last_block = (self.size - 1)//self.block_size
+            last = min(b + self.readahead, last_block)
+            # only request blocks that are not already cached
+            while (last > b) and (last in self._blocks):
+                last -= 1
+            self._fetch(b, last)
+        self._blocks.move_to_end(b)
+        return self._blocks[b]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if (whence == io.SEEK_SET):
+            position = offset
+        elif (whence == io.SEEK_CUR):
+            position = self._position + offset
+        elif (whence == io.SEEK_END):
+            position = self.size + offset
         else:
-            raise TypeError("Please enter the cycle number as a list or string")
-        # check if user-entered cycle is outside of currently available range
-        if not set(all_cycles) & set(cycle_list):
-            warnings.filterwarnings("always")
-            warnings.warn("Listed cycle is not presently available")
-        return cycle_list
+            raise ValueError('Invalid whence ({0})'.format(whence))
+        if (position < 0):
+            raise ValueError('Negative seek position {0}'.format(position))
+        self._position = position
+        return self._position
 
-# PURPOSE: check if the submitted RGTs are valid
-def tracks(track):
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        # number of bytes to read from the current position
+        nbytes = max(min(len(view), self.size - self._position), 0)
+        offset = 0
+        with self._lock:
+            while (offset < nbytes):
+                position = self._position + offset
+                block = self._block(position//self.block_size)
+                start = position % self.block_size
+                count = min(len(block) - start, nbytes - offset)
+                view[offset:offset+count] = block[start:start+count]
+                offset += count
+        self._position += nbytes
+        return nbytes
+
+# PURPOSE: open a remote file on a NSIDC https server for reading
+def from_nsidc_remote(HOST,username=None,password=None,build=True,
+    timeout=None,block_size=1048576,cache_blocks=64,readahead=1):
     """
-    Check if the submitted RGTs are valid
+    Open a file on a NSIDC https server for reading with range requests
+    without downloading the full file
 
     Arguments
     ---------
-    track: ICESat-2 reference ground track (RGT)
+    HOST: remote https host path split as list
+
+    Keyword arguments
+    -----------------
+    username: NASA Earthdata username
+    password: NASA Earthdata password
+    build: Build opener and check NASA Earthdata credentials
+    timeout: timeout in seconds for blocking operations
+    block_size: size in bytes of each cached block
+    cache_blocks: maximum number of blocks to keep in the cache
+    readahead: number of additional blocks to request after a miss
+
+    Returns
+    -------
+    remote_file: seekable file-like object for the remote file
+    response_error: notification for response error
     """
-    # string length of RGTs in granules
-    track_length = 4
-    # total number of ICESat-2 satellite RGTs is 1387
-    all_tracks = [str(tr + 1).zfill(track_length) for tr in range(1387)]
-    if track is None:
-        return ["????"]
+    # use netrc credentials
+    if build and not (username or password):
+        urs = 'urs.earthdata.nasa.gov'
+        username,login,password = netrc.netrc().authenticators(urs)
+    # build urllib.request opener and check credentials
+    if build:
+        # build urllib.request opener with credentials
+        build_opener(username, password)
+        # check credentials
+        check_credentials()
+    # verify inputs for remote https host
+    if isinstance(HOST, str):
+        HOST = url_split(HOST)
+    # try opening the remote file
+    try:
+        remote_file = HTTPRangeFile(posixpath.join(*HOST),
+            block_size=block_size, cache_blocks=cache_blocks,
+            readahead=readahead, timeout=timeout)
+    except Exception as e:
+        response_error = 'Download error from {0}'.format(posixpath.join(*HOST))
+        return (False,response_error)
     else:
-        if isinstance(track, (str,int)):
-            assert int(track) > 0, "Reference Ground Track must be positive"
-            track_list = [str(track).zfill(track_length)]
-        elif isinstance(track, list):
-            track_list = []
-            for t in track:
-                assert int(t) > 0, "Reference Ground Track must be positive"
-                track_list.append(str(t).zfill(track_length))
-        else:
-            raise TypeError(
-                "Reference Ground Track as a list or string"
-            )
-        # check if user-entered RGT is outside of the valid range
-        if not set(all_tracks) & set(track_list):
-            warnings.filterwarnings("always")
-            warnings.warn("Listed Reference Ground Track is not available")
-        return track_list
+        return (remote_file,None)
 
-# PURPOSE: check if the submitted granule regions are valid
-def granules(granule):
+# PURPOSE: additive-increase/multiplicative-decrease concurrency control
+class AdaptiveConcurrency:
     """
-    Check if the submitted granule regions are valid
+    Additive-increase/multiplicative-decrease (AIMD) controller for the
+    number of concurrent transfers based on throughput and throttling
 
-    Arguments
-    ---------
-    granule: ICESat-2 granule region
+    Keyword arguments
+    -----------------
+    initial: initial number of concurrent transfers
+    minimum: minimum number of concurrent transfers
+    maximum: maximum number of concurrent transfers
+    increase: additive increase in transfers per adjustment interval
+    decrease: multiplicative decrease in transfers after throttling
+    interval: time in seconds between throughput measurements
+    tolerance: fractional change in throughput considered unchanged
+    """
+    def __init__(self, initial=4, minimum=1, maximum=32, increase=1,
+        decrease=0.5, interval=2.0, tolerance=0.1):
+        self.window = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.interval = interval
+        self.tolerance = tolerance
+        # throughput measurements
+        self.throughput = None
+        self._best = 0.0
+        self._bytes = 0
+        self._start = time.perf_counter()
+        # time to pause new transfers after throttling
+        self.resume = 0.0
+        # time of the last decrease in concurrency
+        self._decreased = None
+
+    @property
+    def limit(self):
+        """
+        Current number of allowed concurrent transfers
+        """
+        return max(self.minimum, int(self.window))
+
+    def ready(self):
+        """
+        Check if new transfers can be started
+        """
+        return (time.time() >= self.resume)
+
+    def success(self, nbytes):
+        """
+        Record a successful transfer and adjust the concurrency
+        """
+        self._bytes += nbytes
+        elapsed = time.perf_counter() - self._start
+        if (elapsed < self.interval):
+            return
+        # aggregate throughput over the measurement interval
+        self.throughput = self._bytes/elapsed
+        # additively increase while throughput is still improving
+        if (self.throughput >= (1.0 - self.tolerance)*self._best):
+            self.window = min(self.maximum, self.window + self.increase)
+        self._best = max(self._best, self.throughput)
+        # reset the measurement interval
+        self._bytes = 0
+        self._start = time.perf_counter()
+
+    def throttle(self, retry_after=None, issued=None):
+        """
+        Record a throttled or failed transfer and decrease the concurrency
+        at most once for each congestion event
+
+        Keyword arguments
+        -----------------
+        retry_after: seconds to pause new transfers
+        issued: performance counter time when the transfer was started
+            (transfers started before the last decrease do not
+            decrease the concurrency again)
+        """
+        if retry_after:
+            self.resume = max(self.resume, time.time() + retry_after)
+        # ignore transfers issued at the previous concurrency
+        if (issued is not None) and (self._decreased is not None) and \
+            (issued < self._decreased):
+            return
+        self.window = max(self.minimum, self.window*self.decrease)
+        self._decreased = time.perf_counter()
+        # forget the best throughput measured at the higher concurrency
+        self._best = 0.0
+
+# PURPOSE: get the number of seconds from a Retry-After header
+def get_retry_after(headers, default=None):
+    """
+    Get the number of seconds to wait from a Retry-After header
+
+    Arguments
+    ---------
+    headers: http response headers
+
+    Keyword arguments
+    -----------------
+    default: number of seconds if the header is not available
+    """
+    retry_after = headers.get('Retry-After') if headers else None
+    if retry_after is None:
+        return default
+    # header can be a number of seconds or a http date
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_time = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, retry_time.timestamp() - time.time())
+
+# PURPOSE: download files from NSIDC with adaptive concurrency
+def from_nsidc_adaptive(HOSTS, local, username=None, password=None,
+    build=True, timeout=None, initial=4, minimum=1, maximum=32,
+    retries=5, backoff=2.0, chunk=16384, verbose=False, fid=sys.stdout,
+    mode=0o775):
+    """
+    Download files from a NSIDC https server adjusting the number of
+    concurrent transfers with an additive-increase/multiplicative-decrease
+    policy based on throughput and throttling responses
+
+    Arguments
+    ---------
+    HOSTS: list of remote https host paths
+    local: list of paths to local files
+
+    Keyword arguments
+    -----------------
+    username: NASA Earthdata username
+    password: NASA Earthdata password
+    build: Build opener and check NASA Earthdata credentials
+    timeout: timeout in seconds for blocking operations
+    initial: initial number of concurrent transfers
+    minimum: minimum number of concurrent transfers
+    maximum: maximum number of concurrent transfers
+    retries: maximum number of retries for each file
+    backoff: seconds to wait after throttling without a Retry-After header
+    chunk: chunk size for transfer encoding
+    verbose: print file transfer information
+    fid: open file object to print if verbose
+    mode: permissions mode of output local files
+
+    Returns
+    -------
+    response_errors: list of notifications for response errors
+        (None for successful transfers)
+    """
+    # create logger
+    loglevel = logging.INFO if verbose else logging.CRITICAL
+    logging.basicConfig(stream=fid, level=loglevel)
+    # use netrc credentials
+    if build and not (username or password):
+        urs = 'urs.earthdata.nasa.gov'
+        username,login,password = netrc.netrc().authenticators(urs)
+    # build urllib.request opener and check credentials once
+    if build:
+        build_opener(username, password)
+        check_credentials()
+    # verify inputs for remote https hosts
+    urls = [HOST if isinstance(HOST, str) else posixpath.join(*HOST)
+        for HOST in HOSTS]
+    # responses indicating the server is throttling requests
+    throttled = (429, 500, 502, 503, 504)
+    # download a single file
+    def download(i, attempt):
+        timer = TransferTimer('download', urls[i])
+        temp = None
+        try:
+            request = urllib.request.Request(urls[i])
+            response = urllib.request.urlopen(request, timeout=timeout)
+            timer.response(response)
+            # convert to absolute path
+            local_file = os.path.abspath(os.path.expanduser(local[i]))
+            # create directory if non-existent
+            if not os.access(os.path.dirname(local_file), os.F_OK):
+                os.makedirs(os.path.dirname(local_file), mode)
+            # store bytes to a temporary file and move into place
+            temp = '{0}.part'.format(local_file)
+            with open(temp, 'wb') as f:
+                shutil.copyfileobj(timer.wrap(response), f, chunk)
+            os.replace(temp, local_file)
+        except Exception as e:
+            timer.finish(error=e, retries=attempt)
+            # remove the partial file of a failed transfer
+            if temp and os.access(temp, os.F_OK):
+                os.remove(temp)
+            raise
+        # change the permissions mode
+        os.chmod(local_file, mode)
+        # keep remote modification time of file and local access time
+        remote_mtime = get_http_mtime(response)
+        if remote_mtime is not None:
+            os.utime(local_file, (os.stat(local_file).st_atime, remote_mtime))
+        logging.info('{0} -->\n\t{1}'.format(urls[i], local_file))
+        return timer.finish(retries=attempt)['bytes']
+    # concurrency controller
+    controller = AdaptiveConcurrency(initial=initial, minimum=minimum,
+        maximum=maximum)
+    # queue of file indices with number of attempts
+    queue = collections.deque((i,0) for i in range(len(urls)))
+    response_errors = [None]*len(urls)
+    pending = {}
+    with concurrent.futures.ThreadPoolExecutor(maximum) as executor:
+        while queue or pending:
+            # start transfers up to the current concurrency limit
+            while queue and (len(pending) < controller.limit) and \
+                controller.ready():
+                i,attempt = queue.popleft()
+                pending[executor.submit(download, i, attempt)] = \
+                    (i,attempt,time.perf_counter())
+            # wait for throttling to end if there are no transfers
+            if not pending:
+                time.sleep(max(0.1, controller.resume - time.time()))
+                continue
+            done,_ = concurrent.futures.wait(pending, timeout=1.0,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                i,attempt,issued = pending.pop(future)
+                try:
+                    nbytes = future.result()
+                except urllib.request.HTTPError as e:
+                    # decrease concurrency and retry throttled transfers
+                    if (e.code in throttled) and (attempt < retries):
+                        retry_after = get_retry_after(e.headers,
+                            default=backoff*2**attempt)
+                        controller.throttle(retry_after=retry_after,
+                            issued=issued)
+                        queue.append((i,attempt+1))
+                        logging.info('Throttled ({0}) {1}'.format(e.code,
+                            urls[i]))
+                    else:
+                        response_errors[i] = 'Download error from {0}'.format(
+                            urls[i])
+                except (urllib.request.URLError, socket.timeout,
+                    ConnectionError) as e:
+                    # treat connection failures as congestion
+                    if (attempt < retries):
+                        controller.throttle(retry_after=backoff*2**attempt,
+                            issued=issued)
+                        queue.append((i,attempt+1))
+                    else:
+                        response_errors[i] = 'Download error from {0}'.format(
+                            urls[i])
+                except Exception as e:
+                    response_errors[i] = 'Download error from {0}'.format(
+                        urls[i])
+                else:
+                    controller.success(nbytes)
+    # return the response errors
+    return response_errors
+
+# PURPOSE: download new or changed files from a http host
+def sync_files(remote_files, local_dir, remote_mtimes=None, timeout=None,
+    context=None, conditional=False, etags=None, chunk=16384,
+    remote_sizes=None, verbose=False, fid=sys.stdout, mode=0o775):
+    """
+    Download files from a http host that are new or have changed
+    since the last synchronization
+
+    Arguments
+    ---------
+    remote_files: list of remote file urls
+    local_dir: local directory for synchronized files
+
+    Keyword arguments
+    -----------------
+    remote_mtimes: list of last modification times for remote files
+    timeout: timeout in seconds for blocking operations
+    context: SSL context for url opener object
+    conditional: use conditional requests for files that can not be
+        compared using the remote modification times
+    etags: path to JSON file for storing entity tags of remote files
+    chunk: chunk size for transfer encoding
+    remote_sizes: list of sizes in bytes for remote files
+        (requested with HEAD requests for local files that would
+        otherwise be current with the remote modification times)
+    verbose: print file transfer information
+    fid: open file object to print if verbose
+    mode: permissions mode of output local files
+
+    Returns
+    -------
+    synced: list of downloaded local files
+    skipped: list of unchanged local files
+    """
+    # create logger
+    loglevel = logging.INFO if verbose else logging.CRITICAL
+    logging.basicConfig(stream=fid, level=loglevel)
+    # create local directory if non-existent
+    local_dir = os.path.abspath(os.path.expanduser(local_dir))
+    if not os.access(local_dir, os.F_OK):
+        os.makedirs(local_dir, mode)
+    # read entity tags from previous synchronizations
+    etag_dict = {}
+    if etags and os.access(os.path.expanduser(etags), os.F_OK):
+        with open(os.path.expanduser(etags), 'r') as f:
+            etag_dict = json.load(f)
+    # default to unknown remote modification times and sizes
+    if remote_mtimes is None:
+        remote_mtimes = [None]*len(remote_files)
+    if remote_sizes is None:
+        remote_sizes = [None]*len(remote_files)
+    # output lists of downloaded and unchanged files
+    synced = []
+    skipped = []
+    try:
+        for remote_file,remote_mtime,remote_size in zip(remote_files,
+            remote_mtimes,remote_sizes):
+            local = os.path.join(local_dir, posixpath.basename(remote_file))
+            # get the remote size for local files that are newer than the
+            # remote file to find truncated or partial local copies
+            if (remote_size is None) and \
+                is_current(local, remote_mtime=remote_mtime):
+                remote_size = get_http_size(remote_file, timeout=timeout,
+                    context=context)
+            # skip files that are current with the remote listing
+            if is_current(local, remote_mtime=remote_mtime,
+                remote_size=remote_size):
+                skipped.append(local)
+                continue
+            # build request with optional conditional headers
+            request = urllib.request.Request(remote_file)
+            if conditional and os.access(local, os.F_OK):
+                local_mtime = os.stat(local).st_mtime
+                request.add_header('If-Modified-Since',
+                    email.utils.formatdate(local_mtime, usegmt=True))
+                if remote_file in etag_dict:
+                    request.add_header('If-None-Match',
+                        etag_dict[remote_file])
+            timer = TransferTimer('download', remote_file)
+            try:
+                response = urllib.request.urlopen(request, timeout=timeout,
+                    context=context)
+            except urllib.request.HTTPError as e:
+                # remote file has not been modified
+                if (e.code == 304):
+                    timer.event['status'] = e.code
+                    timer.finish()
+                    skipped.append(local)
+                    continue
+                timer.finish(error=e)
+                raise Exception('Download error from {0}'.format(remote_file))
+            except urllib.request.URLError as e:
+                timer.finish(error=e)
+                raise Exception('Download error from {0}'.format(remote_file))
+            timer.response(response)
+            # print file information
+            logging.info('{0} -->\n\t{1}'.format(remote_file,local))
+            # store bytes to a temporary file using chunked transfer encoding
+            # and move into place to not leave partial files on interruption
+            temp = '{0}.part'.format(local)
+            try:
+                with open(temp, 'wb') as f:
+                    shutil.copyfileobj(timer.wrap(response), f, chunk)
+            except BaseException as e:
+                # remove the partial file if the transfer failed
+                timer.finish(error=e)
+                if os.access(temp, os.F_OK):
+                    os.remove(temp)
+                raise
+            timer.finish()
+            os.replace(temp, local)
+            # change the permissions mode
+            os.chmod(local, mode)
+            # keep remote modification time of file and local access time
+            http_mtime = get_http_mtime(response)
+            if http_mtime is not None:
+                remote_mtime = http_mtime
+            if remote_mtime is not None:
+                os.utime(local, (os.stat(local).st_atime, remote_mtime))
+            # save the entity tag of the remote file
+            headers = {k.lower():v for k,v in dict(response.info()).items()}
+            if 'etag' in headers:
+                etag_dict[remote_file] = headers['etag']
+            synced.append(local)
+    finally:
+        # write entity tags for future synchronizations
+        # (keeping the tags of files downloaded before any error)
+        if etags:
+            with open(os.path.expanduser(etags), 'w') as f:
+                json.dump(etag_dict, f, indent=0, sort_keys=True)
+    # return the lists of downloaded and unchanged files
+    return (synced, skipped)
+
+# PURPOSE: mirror a directory on an Apache http Server
+def http_sync(HOST, local_dir, timeout=None, context=ssl.SSLContext(),
+    pattern='', **kwargs):
+    """
+    Mirror a directory on an Apache http Server downloading only
+    new or changed files
+
+    Arguments
+    ---------
+    HOST: remote http host path split as list
+    local_dir: local directory for synchronized files
+
+    Keyword arguments
+    -----------------
+    timeout: timeout in seconds for blocking operations
+    context: SSL context for url opener object
+    pattern: regular expression pattern for reducing list
+    **kwargs: keyword arguments for sync_files
+
+    Returns
+    -------
+    synced: list of downloaded local files
+    skipped: list of unchanged local files
+    """
+    # verify inputs for remote http host
+    if isinstance(HOST, str):
+        HOST = url_split(HOST)
+    # list the remote directory
+    colnames,collastmod,colerror = http_list(HOST, timeout=timeout,
+        context=context, pattern=pattern, sort=True)
+    if colerror:
+        raise Exception(colerror)
+    # reduce to files within the directory
+    remote_files,remote_mtimes = ([],[])
+    for colname,remote_mtime in zip(colnames,collastmod):
+        if not colname.endswith('/'):
+            remote_files.append(posixpath.join(*HOST,colname))
+            remote_mtimes.append(remote_mtime)
+    # download new or changed files
+    return sync_files(remote_files, local_dir, remote_mtimes=remote_mtimes,
+        timeout=timeout, context=context, **kwargs)
+
+# PURPOSE: mirror a directory on NSIDC https server
+def nsidc_sync(HOST, local_dir, username=None, password=None, build=True,
+    timeout=None, pattern='', **kwargs):
+    """
+    Mirror a directory on NSIDC downloading only new or changed files
+
+    Arguments
+    ---------
+    HOST: remote https host path split as list
+    local_dir: local directory for synchronized files
+
+    Keyword arguments
+    -----------------
+    username: NASA Earthdata username
+    password: NASA Earthdata password
+    build: Build opener and check NASA Earthdata credentials
+    timeout: timeout in seconds for blocking operations
+    pattern: regular expression pattern for reducing list
+    **kwargs: keyword arguments for sync_files
+
+    Returns
+    -------
+    synced: list of downloaded local files
+    skipped: list of unchanged local files
+    """
+    # verify inputs for remote https host
+    if isinstance(HOST, str):
+        HOST = url_split(HOST)
+    # list the remote directory (building opener if requested)
+    colnames,collastmod,colerror = nsidc_list(HOST, username=username,
+        password=password, build=build, timeout=timeout,
+        pattern=pattern, sort=True)
+    if colerror:
+        raise Exception(colerror)
+    # reduce to files within the directory
+    remote_files,remote_mtimes = ([],[])
+    for colname,remote_mtime in zip(colnames,collastmod):
+        if not colname.endswith('/'):
+            remote_files.append(posixpath.join(*HOST,colname))
+            remote_mtimes.append(remote_mtime)
+    # download new or changed files using the installed opener
+    return sync_files(remote_files, local_dir, remote_mtimes=remote_mtimes,
+        timeout=timeout, **kwargs)
+
+# PURPOSE: mirror a directory on a ftp host
+def ftp_sync(HOST, local_dir, username=None, password=None, timeout=None,
+    pattern=None, verbose=False, fid=sys.stdout, mode=0o775):
+    """
+    Mirror a directory on a ftp host downloading only new or changed files
+
+    Arguments
+    ---------
+    HOST: remote ftp host path split as list
+    local_dir: local directory for synchronized files
+
+    Keyword arguments
+    -----------------
+    username: ftp username
+    password: ftp password
+    timeout: timeout in seconds for blocking operations
+    pattern: regular expression pattern for reducing list
+    verbose: print file transfer information
+    fid: open file object to print if verbose
+    mode: permissions mode of output local files
+
+    Returns
+    -------
+    synced: list of downloaded local files
+    skipped: list of unchanged local files
+    """
+    # verify inputs for remote ftp host
+    if isinstance(HOST, str):
+        HOST = url_split(HOST)
+    # reuse a single connection for listing and downloading
+    pool = FTPPool(HOST[0], username=username, password=password,
+        timeout=timeout, size=1)
+    # list the remote directory with modification times and sizes
+    remote_files,remote_mtimes,remote_sizes = ftp_list(HOST, basename=True,
+        pattern=pattern, sort=True, pool=pool, size=True)
+    local_dir = os.path.abspath(os.path.expanduser(local_dir))
+    # output lists of downloaded and unchanged files
+    synced = []
+    skipped = []
+    for remote_file,remote_mtime,remote_size in zip(remote_files,
+        remote_mtimes,remote_sizes):
+        local = os.path.join(local_dir, remote_file)
+        # compare files without listed modification times or sizes using
+        # the remote size (directories will not have modification times
+        # or sizes)
+        if (remote_mtime is None) and (remote_size is None):
+            with pool.connection() as ftp:
+                try:
+                    ftp.voidcmd('TYPE I')
+                    remote_size = ftp.size(posixpath.join(*HOST[1:],
+                        remote_file))
+                except ftplib.error_perm:
+                    continue
+        # skip files that are current with the remote listing
+        if is_current(local, remote_mtime=remote_mtime,
+            remote_size=remote_size):
+            skipped.append(local)
+            continue
+        # download the file and keep the remote modification time
+        from_ftp([*HOST,remote_file], local=local, verbose=verbose,
+            fid=fid, mode=mode, pool=pool)
+        synced.append(local)
+    # close the ftp connection
+    pool.close()
+    # return the lists of downloaded and unchanged files
+    return (synced, skipped)
+
+# PURPOSE: build formatted query string for ICESat-2 release
+def query_release(release):
+    """
+    Build formatted query string for ICESat-2 release
+
+    Arguments
+    ---------
+    release: ICESat-2 data release to query
+
+    Returns
+    -------
+    query_params: formatted string for CMR queries
+    """
+    if release is None:
+        return ''
+    # maximum length of version in CMR queries
+    desired_pad_length = 3
+    if len(str(release)) > desired_pad_length:
+        raise RuntimeError('Release string too long: "{0}"'.format(release))
+    # Strip off any leading zeros
+    release = str(release).lstrip('0')
+    query_params = ''
+    while len(release) <= desired_pad_length:
+        padded_release = release.zfill(desired_pad_length)
+        query_params += '&version={0}'.format(padded_release)
+        desired_pad_length -= 1
+    return query_params
+
+# number of GPS seconds between the GPS epoch and ATLAS SDP epoch
+ATLAS_SDP_GPS_EPOCH = 1198800018.0
+# Unix time of the first ATLAS data point (partway through cycle 1)
+ATLAS_UNIX_START_TIME = ATLAS_SDP_GPS_EPOCH + 24710205.39202261 + \
+    calendar.timegm((1980,1,6,0,0,0))
+# number of ICESat-2 reference ground tracks in each 91-day cycle
+NUMBER_OF_RGTS = 1387
+# length in seconds of each orbital cycle and reference ground track
+CYCLE_LENGTH = 91.0*86400.0
+ORBIT_PERIOD = CYCLE_LENGTH/NUMBER_OF_RGTS
+# Unix time of the start of reference ground track 1 of cycle 1
+# (2018-09-28T06:36:22) calculated from the start of granule region 3
+# of RGT 338 in cycle 3 (ATL06_20190420093051_03380303_005_01) as data
+# collection started partway through the first cycle
+ATLAS_RGT_EPOCH = calendar.timegm((2019,4,20,9,30,51)) - 937.8 - \
+    (2*NUMBER_OF_RGTS + 337)*ORBIT_PERIOD
+
+# PURPOSE: zero-padded strings for a range of valid values
+@functools.lru_cache(maxsize=None)
+def _valid_strings(width, stop, start=1):
+    return frozenset(str(v).zfill(width) for v in range(start, stop))
+
+# PURPOSE: convert times to Unix timestamps
+def _unix_time(times):
+    # convert datetimes, date strings or numpy datetimes to Unix seconds
+    times = np.asarray(times)
+    if (times.dtype.kind in ('M','U','S','O')):
+        if (times.dtype.kind == 'O'):
+            # convert timezone-aware datetimes to naive UTC datetimes
+            def naive(t):
+                if isinstance(t, datetime.datetime) and t.tzinfo:
+                    t = t.astimezone(datetime.timezone.utc)
+                    return t.replace(tzinfo=None)
+                return t
+            times = np.array([naive(t) for t in times.flat],
+                dtype='M8[ms]').reshape(times.shape)
+        return times.astype('M8[ms]').astype(np.float64)/1000.0
+    return times.astype(np.float64)
+
+# PURPOSE: calculate the number of available orbital cycles
+def number_of_cycles(present_time=None):
+    """
+    Calculate the number of ICESat-2 orbital cycles started by a time
+
+    Keyword arguments
+    -----------------
+    present_time: Unix timestamp (default is the current time)
+    """
+    present_time = time.time() if (present_time is None) else present_time
+    # divide total time by cycle length to get the number of orbital cycles
+    return ceil((present_time - ATLAS_RGT_EPOCH)/CYCLE_LENGTH)
+
+# PURPOSE: map times to orbital cycles and reference ground tracks
+def orbit_calendar(times):
+    """
+    Calculate the ICESat-2 orbital cycle and reference ground track
+    for an array of times
+
+    Arguments
+    ---------
+    times: array of datetimes, numpy datetime64, date strings
+        or Unix timestamps
+
+    Returns
+    -------
+    cycle: 91-day orbital cycle of each time
+    rgt: reference ground track of each time
+    """
+    # time since the start of reference ground track 1 of cycle 1
+    elapsed = _unix_time(times) - ATLAS_RGT_EPOCH
+    cycle = np.floor_divide(elapsed, CYCLE_LENGTH).astype(np.int64) + 1
+    rgt = np.floor_divide(np.mod(elapsed, CYCLE_LENGTH),
+        ORBIT_PERIOD).astype(np.int64) + 1
+    return (cycle, rgt)
+
+# PURPOSE: find the orbital cycles within a time range
+def cycle_range(start=None, end=None):
+    """
+    Find the ICESat-2 orbital cycles overlapping a time range
+
+    Keyword arguments
+    -----------------
+    start: start of the time range (default is the first ATLAS data)
+    end: end of the time range (default is the current time)
+
+    Returns
+    -------
+    list of orbital cycles for the time range
+    """
+    start = ATLAS_UNIX_START_TIME if (start is None) else \
+        float(_unix_time(start))
+    end = time.time() if (end is None) else float(_unix_time(end))
+    first,last = orbit_calendar([max(start, ATLAS_UNIX_START_TIME), end])[0]
+    return list(range(int(first), int(last) + 1))
+
+# PURPOSE: convert submitted values to zero-padded strings
+def _zero_pad(values, width, message):
+    if isinstance(values, (str,int)):
+        values = [values]
+    elif not isinstance(values, (list,tuple,range)):
+        raise TypeError(message)
+    value_list = [str(v).zfill(width) for v in values]
+    return value_list
+
+# PURPOSE: check if the submitted cycles are valid
+def cycles(cycle):
+    """
+    Check if the submitted cycles are valid
+
+    Arguments
+    ---------
+    cycle: ICESat-2 orbital cycle
+    """
+    # string length of cycles in granules
+    cycle_length = 2
+    # all cycles started by the present time
+    all_cycles = _valid_strings(cycle_length, number_of_cycles() + 1)
+    if cycle is None:
+        return ["??"]
+    else:
+        cycle_list = _zero_pad(cycle, cycle_length,
+            "Please enter the cycle number as a list or string")
+        assert all(int(c) > 0 for c in cycle_list), \
+            "Cycle number must be positive"
+        # check if user-entered cycle is outside of currently available range
+        if all_cycles.isdisjoint(cycle_list):
+            warnings.filterwarnings("always")
+            warnings.warn("Listed cycle is not presently available")
+        return cycle_list
+
+# PURPOSE: check if the submitted RGTs are valid
+def tracks(track):
+    """
+    Check if the submitted RGTs are valid
+
+    Arguments
+    ---------
+    track: ICESat-2 reference ground track (RGT)
+    """
+    # string length of RGTs in granules
+    track_length = 4
+    # total number of ICESat-2 satellite RGTs is 1387
+    all_tracks = _valid_strings(track_length, NUMBER_OF_RGTS + 1)
+    if track is None:
+        return ["????"]
+    else:
+        track_list = _zero_pad(track, track_length,
+            "Reference Ground Track as a list or string")
+        assert all(int(t) > 0 for t in track_list), \
+            "Reference Ground Track must be positive"
+        # check if user-entered RGT is outside of the valid range
+        if all_tracks.isdisjoint(track_list):
+            warnings.filterwarnings("always")
+            warnings.warn("Listed Reference Ground Track is not available")
+        return track_list
+
+# PURPOSE: check if the submitted granule regions are valid
+def granules(granule):
+    """
+    Check if the submitted granule regions are valid
+
+    Arguments
+    ---------
+    granule: ICESat-2 granule region
     """
     # string length of granule regions in granule files
     granule_length = 2
     # total number of ICESat-2 granule regions is 14
-    all_granules = [str(g).zfill(granule_length) for g in range(1,15)]
+    all_granules = _valid_strings(granule_length, 15)
     if granule is None:
         return ["??"]
     else:
-        if isinstance(granule, (str,int)):
-            assert int(granule) > 0, "Cycle region must be positive"
-            granule_list = [str(granule).zfill(granule_length)]
-        elif isinstance(granule, list):
-            granule_list = []
-            for g in granule:
-                assert int(g) > 0, "Granule region must be positive"
-                granule_list.append(str(g).zfill(granule_length))
-        else:
-            raise TypeError("Please enter the cycle number as a list or string")
+        granule_list = _zero_pad(granule, granule_length,
+            "Please enter the cycle number as a list or string")
+        assert all(int(g) > 0 for g in granule_list), \
+            "Granule region must be positive"
         # check if user-entered granule is outside of currently available range
-        if not set(all_granules) & set(granule_list):
+        if all_granules.isdisjoint(granule_list):
             warnings.filterwarnings("always")
             warnings.warn("Listed cycle is not presently available")
         return granule_list
@@ -929,23 +3495,458 @@ def resolutions(resolution):
             warnings.warn("Listed resolution is not presently available")
         return resolution_list
 
-def readable_granules(product, **kwargs):
+# PURPOSE: parse ICESat-2 granule names into a structured array
+def parse_granules(producer_granule_ids, dataframe=False):
     """
-    Create list of readable granule names for CMR queries
+    Parse lists of ICESat-2 granule names into a structured array
+    using fixed-width character arrays rather than regular expressions
 
     Arguments
     ---------
-    product: ICESat-2 data product
+    producer_granule_ids: list of ICESat-2 granule names
 
     Keyword arguments
     -----------------
-    cycles: List of 91-day orbital cycle strings to query
-    tracks: List of Reference Ground Track (RGT) strings to query
-    granules: List of ICESat-2 granule region strings to query
+    dataframe: return a pandas DataFrame instead of a structured array
 
     Returns
     -------
-    list of readable granule names for CMR queries
+    granules: structured array of granule names with fields
+        product: ICESat-2 data product
+        hemisphere: sea ice product hemisphere (0 if not applicable)
+        time: acquisition date and time (NaT for ATL11)
+        rgt: Reference Ground Track
+        cycle: 91-day orbital cycle (first cycle for ATL11)
+        region: granule region (pair region for ATL11)
+        release: ICESat-2 data release
+        revision: granule revision
+        valid: name matched a known granule naming convention
+    """
+    # convert the granule names to a two-dimensional character array
+    names = np.atleast_1d(np.asarray(producer_granule_ids, dtype='S'))
+    # pad to the last column of the longest naming convention
+    width = max(names.dtype.itemsize, 40)
+    chars = np.zeros((len(names), width), dtype=np.uint8)
+    chars[:,:names.dtype.itemsize] = names.view(np.uint8).reshape(
+        len(names), names.dtype.itemsize)
+    # parse integer values from columns of digits
+    def digits(columns, offset=0):
+        index = np.add.outer(offset, np.asarray(columns)) if \
+            np.ndim(offset) else np.asarray(columns) + offset
+        values = np.take_along_axis(chars, np.broadcast_to(index,
+            (len(names), len(columns))), axis=1).astype(np.int64) - 48
+        valid = np.all((values >= 0) & (values <= 9), axis=1)
+        powers = 10**np.arange(len(columns) - 1, -1, -1)
+        return (values @ powers, valid)
+    # check for underscores separating the fields
+    def separators(columns, offset=0):
+        index = np.add.outer(offset, np.asarray(columns)) if \
+            np.ndim(offset) else np.asarray(columns) + offset
+        values = np.take_along_axis(chars, np.broadcast_to(index,
+            (len(names), len(columns))), axis=1)
+        return np.all(values == ord('_'), axis=1)
+    # output structured array
+    dtype = [('product','S5'),('hemisphere','i1'),('time','M8[s]'),
+        ('rgt','i2'),('cycle','i1'),('region','i1'),('release','i2'),
+        ('revision','i1'),('valid','?')]
+    granules = np.zeros(len(names), dtype=dtype)
+    granules['time'] = np.datetime64('NaT')
+    granules['product'] = names.astype('S5')
+    product = chars[:,:5]
+    is_atl = np.all(product[:,:3] == np.frombuffer(b'ATL', np.uint8), axis=1)
+    # along-track products: ATLxx(-HH)_YYYYMMDDhhmmss_TTTTCCGG_RRR_VV
+    # sea ice products include the hemisphere after the product name
+    sea_ice = (chars[:,5] == ord('-'))
+    hemisphere,valid_hemisphere = digits(np.arange(6,8))
+    shift = np.where(sea_ice, 3, 0)
+    year,v1 = digits(np.arange(6,10), shift)
+    month,v2 = digits(np.arange(10,12), shift)
+    day,v3 = digits(np.arange(12,14), shift)
+    hms,v4 = digits(np.arange(14,20), shift)
+    rgt,v5 = digits(np.arange(21,25), shift)
+    cycle,v6 = digits(np.arange(25,27), shift)
+    region,v7 = digits(np.arange(27,29), shift)
+    release,v8 = digits(np.arange(30,33), shift)
+    revision,v9 = digits(np.arange(34,36), shift)
+    along_track = is_atl & (~sea_ice | valid_hemisphere) & \
+        v1 & v2 & v3 & v4 & v5 & v6 & v7 & v8 & v9 & \
+        separators([5,20,29,33], shift)
+    # calculate the acquisition times from the date and time digits
+    months = (year - 1970)*12 + (month - 1)
+    seconds = (hms//10000)*3600 + ((hms//100) % 100)*60 + (hms % 100)
+    time = months.astype('M8[M]').astype('M8[D]') + (day - 1) + \
+        seconds.astype('m8[s]')
+    # ATL11 products: ATL11_TTTTGG_CCcc_RRR_VV
+    atl11 = is_atl & np.all(product[:,3:5] == np.frombuffer(b'11', np.uint8),
+        axis=1) & (chars[:,5] == ord('_'))
+    rgt11,w1 = digits(np.arange(6,10))
+    region11,w2 = digits(np.arange(10,12))
+    cycle11,w3 = digits(np.arange(13,15))
+    release11,w4 = digits(np.arange(18,21))
+    revision11,w5 = digits(np.arange(22,24))
+    atl11 &= w1 & w2 & w3 & w4 & w5 & separators([5,12,17,21])
+    along_track &= ~atl11
+    granules['hemisphere'] = np.where(sea_ice & along_track, hemisphere, 0)
+    # fill the structured array for each naming convention
+    for mask,values in ((along_track, (time,rgt,cycle,region,release,revision)),
+        (atl11, (None,rgt11,cycle11,region11,release11,revision11))):
+        for key,value in zip(('time','rgt','cycle','region','release',
+            'revision'), values):
+            if value is not None:
+                granules[key][mask] = value[mask]
+        granules['valid'] |= mask
+    # return the parsed granule names
+    if dataframe:
+        df = pd.DataFrame({key:granules[key] for key in granules.dtype.names})
+        df['product'] = df['product'].str.decode('utf-8').astype('category')
+        return df
+    return granules
+
+# PURPOSE: default path for the cached reference ground track table
+def rgt_cache_file():
+    """
+    Get the default path for the cached reference ground track table
+    """
+    return get_cache_home('icesat2', 'rgt.npz')
+
+# PURPOSE: read reference ground track points from KML files
+def read_rgt_kml(kml_files):
+    """
+    Read ICESat-2 reference ground track points from the NSIDC KML files
+
+    Arguments
+    ---------
+    kml_files: list of KML files, directories or zip archives of KML files
+
+    Returns
+    -------
+    generator of track numbers, longitudes and latitudes for each file
+    """
+    if isinstance(kml_files, str):
+        kml_files = [kml_files]
+    # reference ground track number from the file name
+    rx = re.compile(r'RGT_(\d{4})', re.IGNORECASE)
+    def parse(fileobj, name):
+        tree = lxml.etree.parse(fileobj)
+        # use track points if available and otherwise the track lines
+        coordinates = tree.findall('.//{*}Point/{*}coordinates') or \
+            tree.findall('.//{*}LineString/{*}coordinates')
+        points = [[float(v) for v in c.split(',')[:2]]
+            for element in coordinates for c in element.text.split()]
+        lon,lat = np.array(points, dtype=np.float64).T
+        return (int(rx.search(name).group(1)), lon, lat)
+    for kml_file in kml_files:
+        kml_file = os.path.expanduser(kml_file)
+        if os.path.isdir(kml_file):
+            for f in sorted(os.listdir(kml_file)):
+                if rx.search(f) and f.lower().endswith('.kml'):
+                    with open(os.path.join(kml_file, f), 'rb') as fileobj:
+                        yield parse(fileobj, f)
+        elif kml_file.lower().endswith('.zip'):
+            import zipfile
+            with zipfile.ZipFile(kml_file) as z:
+                for f in sorted(z.namelist()):
+                    if rx.search(f) and f.lower().endswith('.kml'):
+                        with z.open(f) as fileobj:
+                            yield parse(fileobj, f)
+        else:
+            with open(kml_file, 'rb') as fileobj:
+                yield parse(fileobj, os.path.basename(kml_file))
+
+# PURPOSE: calculate the granule regions of reference ground track points
+def rgt_granule_regions(lat, ascending):
+    """
+    Calculate the ICESat-2 granule regions for reference ground track
+    points using the latitude boundaries of the 14 granule regions
+
+    Arguments
+    ---------
+    lat: latitude of each point
+    ascending: point is on an ascending (northward) part of the orbit
+
+    Returns
+    -------
+    region: granule region of each point
+    """
+    lat = np.asarray(lat)
+    ascending = np.asarray(ascending, dtype=bool)
+    # northern hemisphere regions: 0, 27, 59.5 and 80 degrees north
+    north_asc = np.digitize(lat, [27.0, 59.5, 80.0]) + 1
+    north_desc = 7 - np.digitize(lat, [27.0, 59.5, 80.0])
+    # southern hemisphere regions: 0, 27, 50 and 79 degrees south
+    south_desc = 11 - np.digitize(lat, [-79.0, -50.0, -27.0])
+    south_asc = np.digitize(lat, [-79.0, -50.0, -27.0]) + 11
+    region = np.where(lat >= 0.0,
+        np.where(ascending, north_asc, north_desc),
+        np.where(ascending, south_asc, south_desc))
+    # polar regions are independent of the orbit direction
+    region[lat >= 80.0] = 4
+    region[lat < -79.0] = 11
+    return region.astype(np.int8)
+
+# PURPOSE: build or load the table of reference ground track points
+def rgt_table(kml_files=None, cache=None):
+    """
+    Build or load a table of ICESat-2 reference ground track points
+    labelled by granule region
+
+    Keyword arguments
+    -----------------
+    kml_files: list of NSIDC reference ground track KML files,
+        directories or zip archives to build the table
+    cache: path to the cached table (default ~/.cache/icesat2/rgt.npz)
+
+    Returns
+    -------
+    table: dictionary with the track, longitude, latitude and granule
+        region of each reference ground track point
+    """
+    cache = rgt_cache_file() if (cache is None) else \
+        os.path.abspath(os.path.expanduser(cache))
+    # load the cached table
+    if (kml_files is None):
+        if not os.access(cache, os.F_OK):
+            raise FileNotFoundError('Reference ground track table not found: '
+                'build from the NSIDC reference ground track KML files')
+        with np.load(cache) as npz:
+            return {key:npz[key] for key in npz.files}
+    # read the reference ground track points
+    rgt,lon,lat,region = ([],[],[],[])
+    for t,x,y in read_rgt_kml(kml_files):
+        # orbit direction from the change in latitude along the track
+        dlat = np.gradient(y) if (len(y) > 1) else np.ones_like(y)
+        rgt.append(np.full(len(x), t, dtype=np.int16))
+        lon.append(x)
+        lat.append(y)
+        region.append(rgt_granule_regions(y, dlat >= 0.0))
+    table = dict(rgt=np.concatenate(rgt), lon=np.concatenate(lon),
+        lat=np.concatenate(lat), region=np.concatenate(region))
+    # save the table to the cache
+    if not os.access(os.path.dirname(cache), os.F_OK):
+        os.makedirs(os.path.dirname(cache))
+    temp = '{0}.{1:d}.tmp.npz'.format(cache, os.getpid())
+    np.savez_compressed(temp, **table)
+    os.replace(temp, cache)
+    return table
+
+# PURPOSE: find segments intersecting a bounding box
+def _segments_in_bbox(x0, y0, x1, y1, bbox):
+    # Liang-Barsky line clipping for each segment
+    xmin,ymin,xmax,ymax = bbox
+    dx,dy = (x1 - x0, y1 - y0)
+    t0 = np.zeros_like(x0)
+    t1 = np.ones_like(x0)
+    valid = np.ones(x0.shape, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p,q in ((-dx, x0 - xmin), (dx, xmax - x0),
+            (-dy, y0 - ymin), (dy, ymax - y0)):
+            parallel = (p == 0)
+            valid &= ~(parallel & (q < 0))
+            r = q/p
+            t0 = np.where(~parallel & (p < 0), np.maximum(t0, r), t0)
+            t1 = np.where(~parallel & (p > 0), np.minimum(t1, r), t1)
+    return (valid & (t0 <= t1), t0, t1)
+
+# PURPOSE: find segments intersecting a polygon
+def _segments_in_polygon(x0, y0, x1, y1, polygon):
+    px,py = np.asarray(polygon, dtype=np.float64).T
+    # polygon edges
+    ex0,ey0 = (px, py)
+    ex1,ey1 = (np.roll(px, -1), np.roll(py, -1))
+    # segment endpoints inside the polygon using ray casting
+    def inside(x, y):
+        crosses = ((ey0[None,:] > y[:,None]) != (ey1[None,:] > y[:,None]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = ex0[None,:] + (y[:,None] - ey0[None,:]) * \
+                (ex1 - ex0)[None,:]/(ey1 - ey0)[None,:]
+        return np.count_nonzero(crosses & (x[:,None] < xc), axis=1) % 2 == 1
+    # segments crossing any polygon edge
+    def orientation(ax, ay, bx, by, cx, cy):
+        return np.sign((bx - ax)*(cy - ay) - (by - ay)*(cx - ax))
+    o1 = orientation(x0[:,None], y0[:,None], x1[:,None], y1[:,None], ex0, ey0)
+    o2 = orientation(x0[:,None], y0[:,None], x1[:,None], y1[:,None], ex1, ey1)
+    o3 = orientation(ex0, ey0, ex1, ey1, x0[:,None], y0[:,None])
+    o4 = orientation(ex0, ey0, ex1, ey1, x1[:,None], y1[:,None])
+    crossing = np.any((o1 != o2) & (o3 != o4), axis=1)
+    return crossing | inside(x0, y0) | inside(x1, y1)
+
+# PURPOSE: find the reference ground tracks and granule regions for an area
+def rgt_intersects(bbox=None, polygon=None, table=None, buffer=0.05):
+    """
+    Find the ICESat-2 reference ground tracks and granule regions
+    that can intersect a bounding box or polygon
+
+    Keyword arguments
+    -----------------
+    bbox: bounding box as [lon_min, lat_min, lon_max, lat_max]
+    polygon: list of polygon vertices as (lon, lat)
+    table: reference ground track table from rgt_table
+    buffer: distance in degrees to expand the area for the beam spread
+
+    Returns
+    -------
+    list of (RGT, granule region) pairs
+    """
+    table = rgt_table() if (table is None) else table
+    rgt,lon,lat,region = (table['rgt'], table['lon'], table['lat'],
+        table['region'])
+    # segments between consecutive points of the same track
+    same = (rgt[1:] == rgt[:-1])
+    x0,y0 = (lon[:-1][same], lat[:-1][same])
+    x1,y1 = (lon[1:][same], lat[1:][same])
+    # unwrap segments crossing the antimeridian
+    x1 = x1 - 360.0*np.round((x1 - x0)/360.0)
+    # bounding box of the area of interest with buffer
+    if polygon is not None:
+        px,py = np.asarray(polygon, dtype=np.float64).T
+        bbox = [px.min(), py.min(), px.max(), py.max()]
+    xmin,ymin,xmax,ymax = np.array(bbox, dtype=np.float64) + \
+        np.array([-buffer, -buffer, buffer, buffer])
+    # test segments against the area and its shifted copies
+    pairs = set()
+    for shift in (-360.0, 0.0, 360.0):
+        candidates,t0,t1 = _segments_in_bbox(x0, y0, x1, y1,
+            (xmin + shift, ymin, xmax + shift, ymax))
+        if (polygon is not None) and np.any(candidates):
+            shifted = np.c_[px + shift, py]
+            candidates[candidates] = _segments_in_polygon(x0[candidates],
+                y0[candidates], x1[candidates], y1[candidates], shifted)
+        # granule regions at the ends of the clipped segments
+        dy = (y1 - y0)[candidates]
+        ascending = (dy >= 0.0)
+        r0 = rgt_granule_regions(y0[candidates] + t0[candidates]*dy, ascending)
+        r1 = rgt_granule_regions(y0[candidates] + t1[candidates]*dy, ascending)
+        # add each granule region along the clipped segments
+        for t,g0,g1 in zip(rgt[:-1][same][candidates], r0, r1):
+            for g in range(g0, g0 + (g1 - g0) % 14 + 1):
+                pairs.add((int(t), (g - 1) % 14 + 1))
+    return sorted(pairs)
+
+# PURPOSE: find the granules that can intersect an area and time range
+def granule_combinations(bbox=None, polygon=None, start=None, end=None,
+    table=None, buffer=0.05):
+    """
+    Find the (RGT, cycle, granule region) combinations of ICESat-2
+    granules that can intersect a bounding box or polygon within a
+    time range
+
+    Keyword arguments
+    -----------------
+    bbox: bounding box as [lon_min, lat_min, lon_max, lat_max]
+    polygon: list of polygon vertices as (lon, lat)
+    start: start of the time range as a datetime or YYYY-MM-DD string
+    end: end of the time range as a datetime or YYYY-MM-DD string
+        (dates without a time include the whole day)
+    table: reference ground track table from rgt_table
+    buffer: distance in degrees to expand the area for the beam spread
+
+    Returns
+    -------
+    list of (RGT, cycle, granule region) combinations for
+        readable_granules and cmr (None if the reference ground
+        track table is not available)
+    """
+    # reference ground tracks and granule regions for the area
+    try:
+        pairs = rgt_intersects(bbox=bbox, polygon=polygon, table=table,
+            buffer=buffer)
+    except FileNotFoundError as exc:
+        # query without the combinations if there is no table
+        logging.warning('{0}: not filtering granules by area'.format(exc))
+        return None
+    # convert the time range to Unix timestamps
+    def timestamp(t, default, inclusive=False):
+        if t is None:
+            return default
+        try:
+            value = float(_unix_time(t))
+            valid = not np.isnat(np.asarray(t, dtype='M8[ms]')) \
+                if isinstance(t, str) else not np.isnan(value)
+        except ValueError:
+            valid = False
+        if not valid:
+            raise ValueError('Invalid date: {0!r}'.format(t))
+        # include the whole day for an end date without a time
+        date_only = (isinstance(t, str) and
+            re.match(r'^\s*\d{4}-\d{2}-\d{2}\s*$', t)) or \
+            (isinstance(t, datetime.date) and
+            not isinstance(t, datetime.datetime))
+        if inclusive and date_only:
+            value += 86400.0
+        return value
+    start = timestamp(start, ATLAS_UNIX_START_TIME)
+    end = timestamp(end, time.time(), inclusive=True)
+    # orbital cycles within the time range with a margin of one orbit
+    first,last = np.floor_divide(np.array([start - ORBIT_PERIOD,
+        end + ORBIT_PERIOD]) - ATLAS_RGT_EPOCH, CYCLE_LENGTH).astype(int) + 1
+    # for each cycle within the time range
+    combinations = []
+    for c in range(max(first, 1), last + 1):
+        for t,g in pairs:
+            # time range of the orbit with a margin of one orbit
+            orbit_start = ATLAS_RGT_EPOCH + (c - 1)*CYCLE_LENGTH + \
+                (t - 1)*ORBIT_PERIOD
+            if (orbit_start - ORBIT_PERIOD <= end) and \
+                (orbit_start + 2.0*ORBIT_PERIOD >= start):
+                combinations.append((t, c, g))
+    return combinations
+
+# PURPOSE: collapse sets of digit strings into wildcard patterns
+def compress_patterns(values, universe):
+    """
+    Collapse a set of fixed-width digit strings into single character
+    wildcard patterns that match the same subset of valid values
+
+    Arguments
+    ---------
+    values: list of fixed-width digit strings
+    universe: list of all valid fixed-width digit strings
+
+    Returns
+    -------
+    list of wildcard patterns
+    """
+    values = set(values)
+    # wildcards cannot be compressed further
+    if any('?' in v for v in values):
+        return sorted(values)
+    universe = set(universe) | values
+    width = max(len(v) for v in values)
+    # recursively fix the leading digits of the pattern
+    def expand(prefix, covered):
+        requested = covered & values
+        if not requested:
+            return []
+        elif (requested == covered):
+            return [prefix + '?'*(width - len(prefix))]
+        patterns = []
+        for d in '0123456789':
+            subset = {u for u in covered if (u[len(prefix)] == d)}
+            patterns.extend(expand(prefix + d, subset))
+        return patterns
+    return expand('', universe)
+
+def readable_granules(product, compress=False, **kwargs):
+    """
+    Create list of readable granule names for CMR queries
+
+    Arguments
+    ---------
+    product: ICESat-2 data product
+
+    Keyword arguments
+    -----------------
+    compress: collapse sets of cycles, tracks and granules into
+        single character wildcard patterns
+    cycles: List of 91-day orbital cycle strings to query
+    tracks: List of Reference Ground Track (RGT) strings to query
+    granules: List of ICESat-2 granule region strings to query
+    combinations: List of (RGT, cycle, granule region) combinations
+        to query instead of the cartesian product of tracks and granules
+
+    Returns
+    -------
+    list of readable granule names for CMR queries
     """
     # default keyword arguments
     kwargs.setdefault("cycles", None)
@@ -953,6 +3954,26 @@ def readable_granules(product, **kwargs):
     kwargs.setdefault("granules", None)
     kwargs.setdefault("regions", None)
     kwargs.setdefault("resolutions", None)
+    kwargs.setdefault("combinations", None)
+    # groups of cycles, tracks and granule regions
+    if kwargs["combinations"] is not None:
+        # group the tracks for each cycle and granule region
+        combinations = collections.OrderedDict()
+        for t,c,g in kwargs["combinations"]:
+            combinations.setdefault((int(c),int(g)), []).append(int(t))
+        groups = [(cycles([c]), tracks(t), granules([g]))
+            for (c,g),t in combinations.items()]
+    else:
+        groups = [(cycles(kwargs["cycles"]), tracks(kwargs["tracks"]),
+            granules(kwargs["granules"]))]
+    if compress:
+        groups = [(compress_patterns(cycle_list,
+                [str(c).zfill(2) for c in range(1,100)]),
+            compress_patterns(track_list,
+                [str(t).zfill(4) for t in range(1,1388)]),
+            compress_patterns(granule_list,
+                [str(g).zfill(2) for g in range(1,15)]))
+            for cycle_list,track_list,granule_list in groups]
     # list of readable granule names
     readable_granule_list = []
     # check if querying along-track or gridded products
@@ -966,25 +3987,25 @@ def readable_granules(product, **kwargs):
                 readable_granule_list.append(pattern.format(*args))
     else:
         # along-track products
-        # for each available cycle of interest
-        for c in cycles(kwargs["cycles"]):
-            # for each available track of interest
-            for t in tracks(kwargs["tracks"]):
-                # for each available granule region of interest
-                for g in granules(kwargs["granules"]):
-                    # use single character wildcards "?" for date strings,
-                    # sea ice product hemispheres, and any unset parameters
-                    if product in ("ATL07", "ATL10", "ATL20", "ATL21"):
-                        args = (product, 14 * "?", t, c, g)
-                        pattern = "{0}-??_{1}_{2}{3}{4}_*"
-                    elif product in ("ATL11",):
-                        args = (product, t, g)
-                        pattern = "{0}_{1}{2}_*"
-                    else:
-                        args = (product, 14 * "?", t, c, g)
-                        pattern = "{0}_{1}_{2}{3}{4}_*"
-                    # append the granule pattern
-                    readable_granule_list.append(pattern.format(*args))
+        # for each group of cycles, tracks and granule regions
+        for cycle_list,track_list,granule_list in groups:
+            # for each cycle, track and granule region of interest
+            for c,t,g in itertools.product(cycle_list,track_list,granule_list):
+                # use single character wildcards "?" for date strings,
+                # sea ice product hemispheres, and any unset parameters
+                if product in ("ATL07", "ATL10", "ATL20", "ATL21"):
+                    args = (product, 14 * "?", t, c, g)
+                    pattern = "{0}-??_{1}_{2}{3}{4}_*"
+                elif product in ("ATL11",):
+                    args = (product, t, g)
+                    pattern = "{0}_{1}{2}_*"
+                else:
+                    args = (product, 14 * "?", t, c, g)
+                    pattern = "{0}_{1}_{2}{3}{4}_*"
+                # append the granule pattern
+                readable_granule_list.append(pattern.format(*args))
+        # remove duplicate patterns for products without cycles
+        readable_granule_list = list(dict.fromkeys(readable_granule_list))
     # for each ATL14/ATL15 parameter
     # return readable granules list
     return readable_granule_list
@@ -1023,13 +4044,161 @@ def cmr_filter_json(search_results, request_type="application/x-hdfeos"):
     # return the list of urls and granule ids
     return (producer_granule_ids,granule_urls)
 
-# PURPOSE: cmr queries for orbital parameters
-def cmr(product=None, release=None, cycles=None, tracks=None,
+# PURPOSE: get the fields of a granule from a CMR JSON feed entry
+def _cmr_json_fields(entry, request_type="application/x-hdfeos"):
+    # granule url for the request type
+    url = next((link['href'] for link in entry.get('links',[])
+        if (link.get('type') == request_type)), '')
+    # bounding box from the granule boxes or polygons
+    coords = []
+    for box in entry.get('boxes',[]):
+        coords.append([float(c) for c in box.split()])
+    for polygon in entry.get('polygons',[]):
+        for ring in polygon:
+            coords.append([float(c) for c in ring.split()])
+    lat = [c for ring in coords for c in ring[0::2]]
+    lon = [c for ring in coords for c in ring[1::2]]
+    bbox = (min(lon),min(lat),max(lon),max(lat)) if lat else (float('nan'),)*4
+    return (entry['producer_granule_id'], url,
+        float(entry.get('granule_size', 'nan')), '',
+        entry.get('time_start','NaT'), entry.get('time_end','NaT'), bbox)
+
+# PURPOSE: get the fields of a granule from a CMR UMM JSON item
+def _cmr_umm_fields(item, request_type="application/x-hdfeos"):
+    umm = item['umm']
+    granule = umm.get('DataGranule', {})
+    # producer granule id
+    producer_granule_id = next((i['Identifier']
+        for i in granule.get('Identifiers',[])
+        if (i.get('IdentifierType') == 'ProducerGranuleId')),
+        umm.get('GranuleUR'))
+    # granule url for the request type
+    url = next((u['URL'] for u in umm.get('RelatedUrls',[])
+        if (u.get('MimeType') == request_type)), '')
+    # granule size in megabytes and checksum
+    scale = dict(B=1.0/1048576.0, KB=1.0/1024.0, MB=1.0, GB=1024.0,
+        TB=1024.0**2)
+    size,checksum = (float('nan'), '')
+    for info in granule.get('ArchiveAndDistributionInformation',[]):
+        if info.get('Name', producer_granule_id) != producer_granule_id:
+            continue
+        if 'Size' in info:
+            size = float(info['Size'])*scale.get(info.get('SizeUnit'),1.0)
+        checksum = info.get('Checksum',{}).get('Value','')
+        break
+    # time range of the granule
+    temporal = umm.get('TemporalExtent',{}).get('RangeDateTime',{})
+    # bounding box from the granule polygons
+    geometry = umm.get('SpatialExtent',{}).get('HorizontalSpatialDomain',
+        {}).get('Geometry',{})
+    lon,lat = ([],[])
+    for polygon in geometry.get('GPolygons',[]):
+        for point in polygon['Boundary']['Points']:
+            lon.append(float(point['Longitude']))
+            lat.append(float(point['Latitude']))
+    for rect in geometry.get('BoundingRectangles',[]):
+        lon.extend([rect['WestBoundingCoordinate'],
+            rect['EastBoundingCoordinate']])
+        lat.extend([rect['SouthBoundingCoordinate'],
+            rect['NorthBoundingCoordinate']])
+    bbox = (min(lon),min(lat),max(lon),max(lat)) if lat else (float('nan'),)*4
+    return (producer_granule_id, url, size, checksum,
+        temporal.get('BeginningDateTime','NaT'),
+        temporal.get('EndingDateTime','NaT'), bbox)
+
+# PURPOSE: incrementally parse a CMR response for granule fields
+def cmr_filter_records(fileobj, cmr_format='json',
+    request_type="application/x-hdfeos", columns=None):
+    """
+    Incrementally parse a CMR response for the fields of each granule
+
+    Arguments
+    ---------
+    fileobj: open file object with a CMR json or umm_json response
+
+    Keyword arguments
+    -----------------
+    cmr_format: format of the CMR response
+    request_type: data type for reducing CMR query
+    columns: dictionary of lists to extend with granule fields
+
+    Returns
+    -------
+    columns: dictionary of lists of granule fields
+
+    Notes
+    -----
+    Granules are parsed one at a time with ijson if available,
+        otherwise the full page is read into memory and parsed with json
+    """
+    if columns is None:
+        columns = {key:[] for key in _cmr_record_fields}
+    # prefix and parser for each granule in the response
+    if (cmr_format == 'umm_json'):
+        prefix,fields = ('items.item', _cmr_umm_fields)
+    else:
+        prefix,fields = ('feed.entry.item', _cmr_json_fields)
+    # parse granules one at a time if ijson is available
+    if ijson is not None:
+        entries = ijson.items(fileobj, prefix, use_float=True)
+    else:
+        search_results = json.loads(fileobj.read().decode('utf-8'))
+        if (cmr_format == 'umm_json'):
+            entries = search_results.get('items', [])
+        else:
+            entries = search_results.get('feed', {}).get('entry', [])
+    # append the fields of each granule
+    for entry in entries:
+        for key,value in zip(_cmr_record_fields, fields(entry, request_type)):
+            columns[key].append(value)
+    return columns
+
+# fields of the granule records
+_cmr_record_fields = ('producer_granule_id','granule_url','size','checksum',
+    'start_time','end_time','bbox')
+
+# PURPOSE: convert lists of granule fields to a structured array
+def cmr_records_array(columns):
+    """
+    Convert lists of granule fields to a compact numpy structured array
+
+    Arguments
+    ---------
+    columns: dictionary of lists of granule fields
+
+    Returns
+    -------
+    records: structured array of granule producer ids, urls, sizes
+        in megabytes, checksums, time ranges and bounding boxes
+    """
+    # convert each field to a compact array
+    def to_datetime(times):
+        return np.array([t.rstrip('Z') for t in times], dtype='M8[ms]')
+    arrays = dict(
+        producer_granule_id=np.array(columns['producer_granule_id'],
+            dtype='S'),
+        granule_url=np.array(columns['granule_url'], dtype='S'),
+        size=np.array(columns['size'], dtype='f8'),
+        checksum=np.array(columns['checksum'], dtype='S'),
+        start_time=to_datetime(columns['start_time']),
+        end_time=to_datetime(columns['end_time']),
+        bbox=np.array(columns['bbox'], dtype='f8').reshape(-1,4))
+    # allocate and fill the structured array
+    dtype = [(key,arrays[key].dtype,arrays[key].shape[1:])
+        for key in _cmr_record_fields]
+    records = np.empty(len(arrays['size']), dtype=dtype)
+    for key in _cmr_record_fields:
+        records[key] = arrays[key]
+    return records
+
+# PURPOSE: cmr queries for compact arrays of granule metadata
+def cmr_records(product=None, release=None, cycles=None, tracks=None,
     granules=None, regions=None, resolutions=None,
-    request_type="application/x-hdfeos", verbose=False,
-    fid=sys.stdout):
+    request_type="application/x-hdfeos", cmr_format='umm_json',
+    page_size=2000, catalog=None, verbose=False, fid=sys.stdout):
     """
     Query the NASA Common Metadata Repository (CMR) for ICESat-2 data
+    and incrementally parse the granule metadata into compact arrays
 
     Keyword arguments
     -----------------
@@ -1041,13 +4210,20 @@ def cmr(product=None, release=None, cycles=None, tracks=None,
     regions: List of ICESat-2 ATL14/15 region strings to query
     resolutions: List of ICESat-2 ATL14/15 resolution strings to query
     request_type: data type for reducing CMR query
+    cmr_format: format of the CMR response
+        json: CMR JSON granule feed
+        umm_json: Unified Metadata Model (UMM) JSON granules
+    page_size: number of granules per page of results
+    catalog: local granule catalog to add the queried granules
     verbose: print file transfer information
     fid: open file object to print if verbose
 
     Returns
     -------
-    producer_granule_ids: list of ICESat-2 granules
-    granule_urls: list of ICESat-2 granule urls from NSIDC
+    records: structured array of granule producer ids, urls, sizes
+        in megabytes, checksums, time ranges and bounding boxes
+        (sorted by start time and granule name if the query is
+        split into batches)
     """
     # create logger
     loglevel = logging.INFO if verbose else logging.CRITICAL
@@ -1055,18 +4231,135 @@ def cmr(product=None, release=None, cycles=None, tracks=None,
     # build urllib.request opener with SSL context
     build_opener(None, None, context=ssl.SSLContext(),
         password_manager=False)
+    # batches of CMR query urls within the maximum url length
+    cmr_batches = cmr_query_urls(product=product, release=release,
+        cycles=cycles, tracks=tracks, granules=granules,
+        regions=regions, resolutions=resolutions,
+        page_size=page_size, cmr_format=cmr_format)
+    # output lists of granule fields
+    columns = {key:[] for key in _cmr_record_fields}
+    # query each batch using a separate scroll session
+    for cmr_query in cmr_batches:
+        logging.info('CMR request={0}'.format(cmr_query))
+        cmr_scroll_id = None
+        try:
+            while True:
+                headers = {'cmr-scroll-id': cmr_scroll_id} \
+                    if cmr_scroll_id else {}
+                timer = TransferTimer('cmr', cmr_query)
+                req = urllib.request.Request(cmr_query, headers=headers)
+                try:
+                    response = timer.response(urllib.request.urlopen(req))
+                except (urllib.request.HTTPError,
+                    urllib.request.URLError) as e:
+                    timer.finish(error=e)
+                    raise
+                # get scroll id for next iteration
+                if not cmr_scroll_id:
+                    cmr_scroll_id = response.headers['cmr-scroll-id']
+                # parse the page while it is being read
+                count = len(columns['size'])
+                cmr_filter_records(timer.wrap(response),
+                    cmr_format=cmr_format, request_type=request_type,
+                    columns=columns)
+                timer.finish()
+                if (len(columns['size']) == count):
+                    break
+        finally:
+            # clear the scroll session
+            if cmr_scroll_id:
+                cmr_clear_scroll(cmr_query, cmr_scroll_id)
+    records = cmr_records_array(columns)
+    # restore the order of a single query
+    if (len(cmr_batches) > 1):
+        order = np.lexsort((records['producer_granule_id'],
+            records['start_time']))
+        records = records[order]
+    # add the granules to the local catalog
+    if catalog is not None:
+        catalog.add_records(records)
+    # return the granule metadata as a structured array
+    return records
+
+# PURPOSE: build the url for a cmr query
+def cmr_query_url(product=None, release=None, cycles=None, tracks=None,
+    granules=None, regions=None, resolutions=None,
+    combinations=None, page_size=2000,
+    scroll=True, cmr_format='json'):
+    """
+    Build the url for querying the NASA Common Metadata Repository (CMR)
+
+    Keyword arguments
+    -----------------
+    product: ICESat-2 data product to query
+    release: ICESat-2 data release to query
+    cycles: List of 91-day orbital cycle strings to query
+    tracks: List of Reference Ground Track (RGT) strings to query
+    granules: List of ICESat-2 granule region strings to query
+    regions: List of ICESat-2 ATL14/15 region strings to query
+    resolutions: List of ICESat-2 ATL14/15 resolution strings to query
+    combinations: List of (RGT, cycle, granule region) combinations
+        to query instead of the cartesian product of tracks and granules
+    page_size: number of granules per page of results
+    scroll: use a CMR scroll session for paging results
+    cmr_format: format of the CMR response
+        json: CMR JSON granule feed
+        umm_json: Unified Metadata Model (UMM) JSON granules
+
+    Returns
+    -------
+    cmr_query_url: full CMR query url
+    """
+    cmr_query, = cmr_query_urls(product=product, release=release,
+        cycles=cycles, tracks=tracks, granules=granules,
+        regions=regions, resolutions=resolutions,
+        combinations=combinations, page_size=page_size,
+        scroll=scroll, cmr_format=cmr_format, max_length=None)
+    return cmr_query
+
+# PURPOSE: build batches of urls for a cmr query
+def cmr_query_urls(product=None, release=None, cycles=None, tracks=None,
+    granules=None, regions=None, resolutions=None,
+    combinations=None, page_size=2000,
+    scroll=True, cmr_format='json', max_length=6000):
+    """
+    Build batches of urls for querying the NASA Common Metadata
+    Repository (CMR) that are each within a maximum url length
+
+    Keyword arguments
+    -----------------
+    product: ICESat-2 data product to query
+    release: ICESat-2 data release to query
+    cycles: List of 91-day orbital cycle strings to query
+    tracks: List of Reference Ground Track (RGT) strings to query
+    granules: List of ICESat-2 granule region strings to query
+    regions: List of ICESat-2 ATL14/15 region strings to query
+    resolutions: List of ICESat-2 ATL14/15 resolution strings to query
+    combinations: List of (RGT, cycle, granule region) combinations
+        to query instead of the cartesian product of tracks and granules
+    page_size: number of granules per page of results
+    scroll: use a CMR scroll session for paging results
+    cmr_format: format of the CMR response
+        json: CMR JSON granule feed
+        umm_json: Unified Metadata Model (UMM) JSON granules
+    max_length: maximum length of each query url
+
+    Returns
+    -------
+    cmr_query_urls: list of full CMR query urls
+    """
     # build CMR query
-    cmr_format = 'json'
     cmr_provider = 'NSIDC_ECS'
-    cmr_page_size = 2000
-    cmr_host = ['https://cmr.earthdata.nasa.gov','search',
+    cmr_page_size = page_size
+    cmr_host = [CMR_HOST,'search',
         'granules.{0}'.format(cmr_format)]
     # build list of CMR query parameters
     cmr_keys = []
     cmr_keys.append('?provider={0}'.format(cmr_provider))
     cmr_keys.append('&sort_key[]=start_date')
     cmr_keys.append('&sort_key[]=producer_granule_id')
-    cmr_keys.append('&scroll=true')
+    if scroll:
+        cmr_keys.append('&scroll=true')
     cmr_keys.append('&page_size={0}'.format(cmr_page_size))
     # append product string
     cmr_keys.append('&short_name={0}'.format(product))
@@ -1075,34 +4368,821 @@ def cmr(product=None, release=None, cycles=None, tracks=None,
     # append keys for querying specific granules
     cmr_keys.append("&options[readable_granule_name][pattern]=true")
     cmr_keys.append("&options[spatial][or]=true")
-    readable_granule_list = readable_granules(product,
+    cmr_base = "".join([posixpath.join(*cmr_host),*cmr_keys])
+    # compressed list of readable granule patterns
+    readable_granule_list = readable_granules(product, compress=True,
         cycles=cycles, tracks=tracks, granules=granules,
-        regions=regions, resolutions=resolutions)
+        regions=regions, resolutions=resolutions,
+        combinations=combinations)
+    # split the granule patterns into batches within the url length
+    cmr_batches = [[]]
+    length = len(cmr_base)
     for gran in readable_granule_list:
-        cmr_keys.append("&readable_granule_name[]={0}".format(gran))
-    # full CMR query url
-    cmr_query_url = "".join([posixpath.join(*cmr_host),*cmr_keys])
-    logging.info('CMR request={0}'.format(cmr_query_url))
+        key = "&readable_granule_name[]={0}".format(gran)
+        if max_length and cmr_batches[-1] and (length + len(key) > max_length):
+            cmr_batches.append([])
+            length = len(cmr_base)
+        cmr_batches[-1].append(key)
+        length += len(key)
+    # full CMR query urls
+    return ["".join([cmr_base,*batch]) for batch in cmr_batches]
+
+# PURPOSE: default directory for cached CMR responses
+def cmr_cache_directory():
+    """
+    Get the default directory for cached CMR responses
+    """
+    return get_cache_home('icesat2', 'cmr')
+
+# PURPOSE: build the key for a cached CMR response
+def cmr_cache_key(cmr_query, request_type="application/x-hdfeos"):
+    """
+    Build the key for a cached CMR response from the normalized query url
+
+    Arguments
+    ---------
+    cmr_query: full CMR query url
+
+    Keyword arguments
+    -----------------
+    request_type: data type for reducing CMR query
+    """
+    # normalize the query url by sorting the query parameters
+    url = urllib.parse.urlsplit(cmr_query)
+    query = sorted(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+    normalized = urllib.parse.urlunsplit((url.scheme, url.netloc.lower(),
+        url.path, urllib.parse.urlencode(query), ''))
+    # hash the normalized url and the request type
+    key = '{0}\n{1}'.format(normalized, request_type).encode('utf-8')
+    return hashlib.sha256(key).hexdigest()
+
+# PURPOSE: check if there are CMR granules revised since a given time
+def cmr_revised_since(product=None, release=None, cycles=None, tracks=None,
+    granules=None, regions=None, resolutions=None,
+    combinations=None, revision_date=None):
+    """
+    Check if any granules matching a CMR query have been revised
+    since a given time
+
+    Keyword arguments
+    -----------------
+    product: ICESat-2 data product to query
+    release: ICESat-2 data release to query
+    cycles: List of 91-day orbital cycle strings to query
+    tracks: List of Reference Ground Track (RGT) strings to query
+    granules: List of ICESat-2 granule region strings to query
+    regions: List of ICESat-2 ATL14/15 region strings to query
+    resolutions: List of ICESat-2 ATL14/15 resolution strings to query
+    combinations: List of (RGT, cycle, granule region) combinations
+        to query instead of the cartesian product of tracks and granules
+    revision_date: Unix timestamp of the previous query
+
+    Returns
+    -------
+    True if granules have been added or revised since the time
+    """
+    # build batches of queries for only the number of matching granules
+    cmr_batches = cmr_query_urls(product=product, release=release,
+        cycles=cycles, tracks=tracks, granules=granules,
+        regions=regions, resolutions=resolutions,
+        combinations=combinations,
+        page_size=0, scroll=False)
+    revision_time = datetime.datetime.fromtimestamp(revision_date,
+        datetime.timezone.utc)
+    revision_query = '&revision_date[]={0},'.format(
+        revision_time.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    # check each batch until a revised granule is found
+    for cmr_query in cmr_batches:
+        request = urllib.request.Request(cmr_query + revision_query)
+        response = urllib.request.urlopen(request)
+        headers = {k.lower():v for k,v in dict(response.info()).items()}
+        if (int(headers['cmr-hits']) > 0):
+            return True
+    return False
+
+# PURPOSE: sort granules combined from batches of CMR queries
+def cmr_sort_granules(producer_granule_ids, granule_urls):
+    """
+    Sort granules combined from batches of CMR queries into the order
+    of a single query (by start time and then by granule name)
+
+    Arguments
+    ---------
+    producer_granule_ids: list of ICESat-2 granules
+    granule_urls: list of ICESat-2 granule urls
+
+    Returns
+    -------
+    producer_granule_ids: sorted list of ICESat-2 granules
+    granule_urls: sorted list of ICESat-2 granule urls
+
+    Notes
+    -----
+    The start time is taken from the granule name, so granules of
+        products without a time in the name (ATL11, ATL14 and ATL15)
+        are only sorted by name
+    """
+    # start time of the granule from the name
+    rx = re.compile(r'_(\d{14})_')
+    def key(granule):
+        match = rx.search(granule[0])
+        return ('' if match is None else match.group(1), granule[0])
+    pairs = sorted(zip(producer_granule_ids, granule_urls), key=key)
+    return ([g for g,u in pairs], [u for g,u in pairs])
+
+# PURPOSE: query a single page of CMR results
+def cmr_page(cmr_query, request_type="application/x-hdfeos", headers=None):
+    """
+    Query a single page of results from the NASA Common Metadata
+    Repository (CMR)
+
+    Arguments
+    ---------
+    cmr_query: full CMR query url
+
+    Keyword arguments
+    -----------------
+    request_type: data type for reducing CMR query
+    headers: additional request headers
+
+    Returns
+    -------
+    producer_granule_ids: list of ICESat-2 granules
+    granule_urls: list of ICESat-2 granule urls from NSIDC
+    response_headers: CMR response headers
+    """
+    timer = TransferTimer('cmr', cmr_query)
+    req = urllib.request.Request(cmr_query, headers=headers or {})
+    try:
+        response = timer.response(urllib.request.urlopen(req))
+    except (urllib.request.HTTPError, urllib.request.URLError) as e:
+        timer.finish(error=e)
+        raise
+    response_headers = {k.lower():v for k,v in dict(response.info()).items()}
+    # read the CMR search as JSON
+    content = response.read()
+    timer.finish(nbytes=len(content))
+    search_page = json.loads(content.decode('utf-8'))
+    ids,urls = cmr_filter_json(search_page, request_type=request_type)
+    return (ids, urls, response_headers)
+
+# PURPOSE: query CMR serially using a scroll session
+def cmr_scroll(cmr_query, request_type="application/x-hdfeos"):
+    """
+    Query all pages of results from the NASA Common Metadata
+    Repository (CMR) serially using a scroll session
+
+    Arguments
+    ---------
+    cmr_query: full CMR query url with scrolling enabled
+
+    Keyword arguments
+    -----------------
+    request_type: data type for reducing CMR query
+
+    Returns
+    -------
+    producer_granule_ids: list of ICESat-2 granules
+    granule_urls: list of ICESat-2 granule urls from NSIDC
+    """
     # output list of granule names and urls
     producer_granule_ids = []
     granule_urls = []
     cmr_scroll_id = None
-    while True:
-        req = urllib.request.Request(cmr_query_url)
+    try:
+        while True:
+            headers = {'cmr-scroll-id': cmr_scroll_id} if cmr_scroll_id else {}
+            ids,urls,headers = cmr_page(cmr_query,
+                request_type=request_type, headers=headers)
+            # get scroll id for next iteration
+            if not cmr_scroll_id:
+                cmr_scroll_id = headers['cmr-scroll-id']
+            if not urls:
+                break
+            # extend lists
+            producer_granule_ids.extend(ids)
+            granule_urls.extend(urls)
+    finally:
+        # clear the scroll session
         if cmr_scroll_id:
-            req.add_header('cmr-scroll-id', cmr_scroll_id)
-        response = urllib.request.urlopen(req)
-        # get scroll id for next iteration
-        if not cmr_scroll_id:
-            headers = {k.lower():v for k,v in dict(response.info()).items()}
-            cmr_scroll_id = headers['cmr-scroll-id']
-        # read the CMR search as JSON
-        search_page = json.loads(response.read().decode('utf-8'))
-        ids,urls = cmr_filter_json(search_page, request_type=request_type)
-        if not urls:
-            break
-        # extend lists
+            cmr_clear_scroll(cmr_query, cmr_scroll_id)
+    # return the list of granule ids and urls
+    return (producer_granule_ids, granule_urls)
+
+# PURPOSE: clear a CMR scroll session
+def cmr_clear_scroll(cmr_query, cmr_scroll_id):
+    """
+    Clear a NASA Common Metadata Repository (CMR) scroll session
+
+    Arguments
+    ---------
+    cmr_query: full CMR query url
+    cmr_scroll_id: CMR scroll session identifier
+    """
+    url = urllib.parse.urlsplit(cmr_query)
+    clear_url = urllib.parse.urlunsplit((url.scheme, url.netloc,
+        posixpath.join('/search','clear-scroll'), '', ''))
+    data = json.dumps({'scroll_id': cmr_scroll_id}).encode('utf-8')
+    req = urllib.request.Request(clear_url, data=data,
+        headers={'Content-Type': 'application/json'})
+    # scroll sessions will expire if unable to clear
+    try:
+        urllib.request.urlopen(req)
+    except (urllib.request.HTTPError, urllib.request.URLError):
+        pass
+
+# PURPOSE: query CMR in parallel using page numbers
+def cmr_parallel(product=None, release=None, cycles=None, tracks=None,
+    granules=None, regions=None, resolutions=None,
+    combinations=None,
+    request_type="application/x-hdfeos", page_size=2000, max_workers=8):
+    """
+    Query all pages of results from the NASA Common Metadata
+    Repository (CMR) in parallel using page numbers
+
+    Keyword arguments
+    -----------------
+    product: ICESat-2 data product to query
+    release: ICESat-2 data release to query
+    cycles: List of 91-day orbital cycle strings to query
+    tracks: List of Reference Ground Track (RGT) strings to query
+    granules: List of ICESat-2 granule region strings to query
+    regions: List of ICESat-2 ATL14/15 region strings to query
+    resolutions: List of ICESat-2 ATL14/15 resolution strings to query
+    combinations: List of (RGT, cycle, granule region) combinations
+        to query instead of the cartesian product of tracks and granules
+    request_type: data type for reducing CMR query
+    page_size: number of granules per page of results
+    max_workers: maximum number of parallel requests
+
+    Returns
+    -------
+    producer_granule_ids: list of ICESat-2 granules
+    granule_urls: list of ICESat-2 granule urls from NSIDC
+        (sorted with cmr_sort_granules if the query is split into batches)
+    """
+    # batches of CMR query urls within the maximum url length
+    # without scroll sessions
+    cmr_batches = cmr_query_urls(product=product, release=release,
+        cycles=cycles, tracks=tracks, granules=granules,
+        regions=regions, resolutions=resolutions,
+        combinations=combinations,
+        page_size=page_size, scroll=False)
+    # output list of granule names and urls
+    producer_granule_ids = []
+    granule_urls = []
+    for cmr_query in cmr_batches:
+        # query the first page and get the total number of granules
+        ids,urls,headers = cmr_page(cmr_query, request_type=request_type)
+        npages = ceil(int(headers['cmr-hits'])/page_size)
         producer_granule_ids.extend(ids)
         granule_urls.extend(urls)
+        # CMR does not allow paging past one million granules
+        # continue serially from the first page using search-after
+        if (npages*page_size > 1000000):
+            while urls and ('cmr-search-after' in headers):
+                search_after = {'CMR-Search-After': headers['cmr-search-after']}
+                ids,urls,headers = cmr_page(cmr_query,
+                    request_type=request_type, headers=search_after)
+                producer_granule_ids.extend(ids)
+                granule_urls.extend(urls)
+            continue
+        # query the remaining pages in parallel
+        page_urls = ['{0}&page_num={1:d}'.format(cmr_query, p)
+            for p in range(2, npages + 1)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            # results are returned in order of the pages
+            for ids,urls,_ in executor.map(cmr_page, page_urls,
+                itertools.repeat(request_type)):
+                producer_granule_ids.extend(ids)
+                granule_urls.extend(urls)
+    # restore the order of a single query for batched queries
+    if (len(cmr_batches) > 1):
+        return cmr_sort_granules(producer_granule_ids, granule_urls)
+    # return the list of granule ids and urls
+    return (producer_granule_ids, granule_urls)
+
+# PURPOSE: cmr queries for orbital parameters
+def cmr(product=None, release=None, cycles=None, tracks=None,
+    granules=None, regions=None, resolutions=None,
+    combinations=None,
+    request_type="application/x-hdfeos", cache=None, ttl=86400,
+    check_revisions=False, max_workers=None, catalog=None, verbose=False,
+    fid=sys.stdout):
+    """
+    Query the NASA Common Metadata Repository (CMR) for ICESat-2 data
+
+    Keyword arguments
+    -----------------
+    product: ICESat-2 data product to query
+    release: ICESat-2 data release to query
+    cycles: List of 91-day orbital cycle strings to query
+    tracks: List of Reference Ground Track (RGT) strings to query
+    granules: List of ICESat-2 granule region strings to query
+    regions: List of ICESat-2 ATL14/15 region strings to query
+    resolutions: List of ICESat-2 ATL14/15 resolution strings to query
+    combinations: List of (RGT, cycle, granule region) combinations
+        to query instead of the cartesian product of tracks and granules
+    request_type: data type for reducing CMR query
+    cache: directory for caching CMR responses
+        True: use the default cache directory
+    ttl: time in seconds before cached responses expire
+    check_revisions: for expired cached responses, check for granules
+        revised since the response was cached and only refresh the
+        cache if there are new revisions
+    max_workers: query pages of results in parallel with a pool of
+        threads instead of serially with a scroll session, or the
+        number of concurrent batches for queries exceeding the
+        maximum url length
+    catalog: local granule catalog to add the queried granules
+    verbose: print file transfer information
+    fid: open file object to print if verbose
+
+    Returns
+    -------
+    producer_granule_ids: list of ICESat-2 granules
+    granule_urls: list of ICESat-2 granule urls from NSIDC
+        (sorted with cmr_sort_granules if the query is split into batches)
+    """
+    # create logger
+    loglevel = logging.INFO if verbose else logging.CRITICAL
+    logging.basicConfig(stream=fid, level=loglevel)
+    # build urllib.request opener with SSL context
+    build_opener(None, None, context=ssl.SSLContext(),
+        password_manager=False)
+    # full CMR query url
+    cmr_query = cmr_query_url(product=product, release=release,
+        cycles=cycles, tracks=tracks, granules=granules,
+        regions=regions, resolutions=resolutions,
+        combinations=combinations)
+    logging.info('CMR request={0}'.format(cmr_query))
+    # check for a cached response to the query
+    if cache:
+        cache = cmr_cache_directory() if (cache is True) else cache
+        cache = os.path.abspath(os.path.expanduser(cache))
+        cache_file = os.path.join(cache, '{0}.json'.format(
+            cmr_cache_key(cmr_query, request_type=request_type)))
+    if cache and os.access(cache_file, os.F_OK):
+        with open(cache_file, 'r') as f:
+            cached = json.load(f)
+        current = (time.time() - cached['time']) <= ttl
+        # check if any granules have been revised since the cached query
+        if not current and check_revisions:
+            check_time = time.time()
+            current = not cmr_revised_since(product=product,
+                release=release, cycles=cycles, tracks=tracks,
+                granules=granules, regions=regions, resolutions=resolutions,
+                combinations=combinations,
+                revision_date=cached['time'])
+            # update the time of the cached response
+            if current:
+                cached['time'] = check_time
+                # write to a temporary file and move into place
+                temp = '{0}.{1:d}.tmp'.format(cache_file, os.getpid())
+                with open(temp, 'w') as f:
+                    json.dump(cached, f)
+                os.replace(temp, cache_file)
+        # use the cached response if current
+        if current:
+            logging.info('CMR cache={0}'.format(cache_file))
+            # add the granules to the local catalog
+            if catalog is not None:
+                catalog.add_cmr(cached['producer_granule_ids'],
+                    cached['granule_urls'])
+            return (cached['producer_granule_ids'], cached['granule_urls'])
+    # time of the query
+    query_time = time.time()
+    # batches of CMR query urls within the maximum url length
+    cmr_batches = cmr_query_urls(product=product, release=release,
+        cycles=cycles, tracks=tracks, granules=granules,
+        regions=regions, resolutions=resolutions,
+        combinations=combinations)
+    # query CMR for the granule names and urls
+    if (len(cmr_batches) > 1):
+        # query each batch concurrently using separate scroll sessions
+        producer_granule_ids = []
+        granule_urls = []
+        nworkers = max_workers or min(8, len(cmr_batches))
+        with concurrent.futures.ThreadPoolExecutor(nworkers) as executor:
+            # results are returned in order of the batches
+            for ids,urls in executor.map(cmr_scroll, cmr_batches,
+                itertools.repeat(request_type)):
+                producer_granule_ids.extend(ids)
+                granule_urls.extend(urls)
+        # restore the order of a single query
+        producer_granule_ids,granule_urls = cmr_sort_granules(
+            producer_granule_ids, granule_urls)
+    elif max_workers:
+        # query pages of results in parallel
+        producer_granule_ids,granule_urls = cmr_parallel(product=product,
+            release=release, cycles=cycles, tracks=tracks,
+            granules=granules, regions=regions, resolutions=resolutions,
+            combinations=combinations,
+            request_type=request_type, max_workers=max_workers)
+    else:
+        # query pages of results serially using a scroll session
+        producer_granule_ids,granule_urls = cmr_scroll(cmr_query,
+            request_type=request_type)
+    # save the response to the cache
+    if cache:
+        if not os.access(cache, os.F_OK):
+            os.makedirs(cache)
+        cached = dict(url=cmr_query, request_type=request_type,
+            time=query_time, producer_granule_ids=producer_granule_ids,
+            granule_urls=granule_urls)
+        # write to a temporary file unique to this process
+        # and move into place
+        temp = '{0}.{1:d}.tmp'.format(cache_file, os.getpid())
+        with open(temp, 'w') as f:
+            json.dump(cached, f)
+        os.replace(temp, cache_file)
+    # add the granules to the local catalog
+    if catalog is not None:
+        catalog.add_cmr(producer_granule_ids, granule_urls)
     # return the list of granule ids and urls
     return (producer_granule_ids, granule_urls)
+
+# PURPOSE: get NASA Earthdata credentials for asynchronous requests
+def async_credentials(username=None, password=None,
+    urs='urs.earthdata.nasa.gov'):
+    """
+    Get NASA Earthdata credentials for asynchronous requests
+
+    Keyword arguments
+    -----------------
+    username: NASA Earthdata username
+    password: NASA Earthdata password
+    urs: Earthdata login URS 3 host
+
+    Returns
+    -------
+    auth: aiohttp basic authentication helper
+    """
+    # use netrc credentials
+    if not (username or password):
+        username,login,password = netrc.netrc().authenticators(urs)
+    return aiohttp.BasicAuth(username, password)
+
+# maximum number of concurrent asynchronous requests without a semaphore
+ASYNC_CONCURRENCY = 8
+# shared semaphores for each event loop
+_ASYNC_SEMAPHORES = weakref.WeakKeyDictionary()
+
+# PURPOSE: get the shared semaphore for asynchronous requests
+def async_semaphore():
+    """
+    Get the bounded semaphore shared by all asynchronous requests
+    in the running event loop that are not given their own semaphore
+
+    Returns
+    -------
+    semaphore: asyncio bounded semaphore limiting requests to
+        ASYNC_CONCURRENCY at a time
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _ASYNC_SEMAPHORES:
+        _ASYNC_SEMAPHORES[loop] = asyncio.BoundedSemaphore(ASYNC_CONCURRENCY)
+    return _ASYNC_SEMAPHORES[loop]
+
+# PURPOSE: create a session for asynchronous requests
+def async_session(limit=100, timeout=None):
+    """
+    Create an aiohttp client session with a shared connection pool
+
+    Keyword arguments
+    -----------------
+    limit: maximum number of simultaneous connections
+    timeout: timeout in seconds for requests
+
+    Returns
+    -------
+    session: aiohttp client session
+    """
+    connector = aiohttp.TCPConnector(limit=limit)
+    # keep cookies from the NASA Earthdata redirects
+    cookie_jar = aiohttp.CookieJar()
+    # time name resolution and connection for transfer events
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_dns_resolvehost_start.append(_trace_dns_start)
+    trace_config.on_dns_resolvehost_end.append(_trace_dns_end)
+    trace_config.on_connection_create_start.append(_trace_connect_start)
+    trace_config.on_connection_create_end.append(_trace_connect_end)
+    return aiohttp.ClientSession(connector=connector, cookie_jar=cookie_jar,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        trace_configs=[trace_config])
+
+# PURPOSE: send an asynchronous request following Earthdata redirects
+async def async_request(session, url, auth=None,
+    urs='urs.earthdata.nasa.gov', max_redirects=10, **kwargs):
+    """
+    Send an asynchronous GET request following any redirects and
+    only sending credentials to the NASA Earthdata login host
+
+    Arguments
+    ---------
+    session: aiohttp client session
+    url: remote url
+
+    Keyword arguments
+    -----------------
+    auth: aiohttp basic authentication helper
+    urs: Earthdata login URS 3 host
+    max_redirects: maximum number of redirects to follow
+    **kwargs: keyword arguments for the aiohttp request
+
+    Returns
+    -------
+    response: aiohttp client response
+    """
+    for redirect in range(max_redirects):
+        # only send credentials to the login host
+        host_auth = auth if (urllib.parse.urlsplit(url).hostname == urs) else None
+        response = await session.get(url, auth=host_auth,
+            allow_redirects=False, **kwargs)
+        if response.status not in (301,302,303,307,308):
+            # release the connection of failed requests
+            try:
+                response.raise_for_status()
+            except aiohttp.ClientResponseError:
+                response.release()
+                raise
+            return response
+        # follow the redirect
+        url = urllib.parse.urljoin(url, response.headers['Location'])
+        response.release()
+    raise RuntimeError('Too many redirects for {0}'.format(url))
+
+# PURPOSE: asynchronous cmr queries for orbital parameters
+async def async_cmr(product=None, release=None, cycles=None, tracks=None,
+    granules=None, regions=None, resolutions=None,
+    request_type="application/x-hdfeos", session=None, verbose=False,
+    fid=sys.stdout):
+    """
+    Asynchronously query the NASA Common Metadata Repository (CMR)
+    for ICESat-2 data
+
+    Keyword arguments
+    -----------------
+    product: ICESat-2 data product to query
+    release: ICESat-2 data release to query
+    cycles: List of 91-day orbital cycle strings to query
+    tracks: List of Reference Ground Track (RGT) strings to query
+    granules: List of ICESat-2 granule region strings to query
+    regions: List of ICESat-2 ATL14/15 region strings to query
+    resolutions: List of ICESat-2 ATL14/15 resolution strings to query
+    request_type: data type for reducing CMR query
+    session: aiohttp client session
+    verbose: print file transfer information
+    fid: open file object to print if verbose
+
+    Returns
+    -------
+    producer_granule_ids: list of ICESat-2 granules
+    granule_urls: list of ICESat-2 granule urls from NSIDC
+    """
+    # create logger
+    loglevel = logging.INFO if verbose else logging.CRITICAL
+    logging.basicConfig(stream=fid, level=loglevel)
+    # create session if not provided
+    close_session = session is None
+    if close_session:
+        session = async_session()
+    # full CMR query url
+    cmr_query = cmr_query_url(product=product, release=release,
+        cycles=cycles, tracks=tracks, granules=granules,
+        regions=regions, resolutions=resolutions)
+    logging.info('CMR request={0}'.format(cmr_query))
+    # output list of granule names and urls
+    producer_granule_ids = []
+    granule_urls = []
+    cmr_scroll_id = None
+    try:
+        while True:
+            headers = {'cmr-scroll-id': cmr_scroll_id} if cmr_scroll_id else {}
+            timer = TransferTimer('cmr', cmr_query)
+            try:
+                async with session.get(cmr_query, headers=headers) as response:
+                    timer.response(response)
+                    response.raise_for_status()
+                    # get scroll id for next iteration
+                    if not cmr_scroll_id:
+                        cmr_scroll_id = response.headers['cmr-scroll-id']
+                    content = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                timer.finish(error=e)
+                raise
+            timer.finish(nbytes=len(content))
+            # read the CMR search as JSON
+            search_page = json.loads(content)
+            ids,urls = cmr_filter_json(search_page, request_type=request_type)
+            if not urls:
+                break
+            # extend lists
+            producer_granule_ids.extend(ids)
+            granule_urls.extend(urls)
+    finally:
+        # clear the scroll session
+        if cmr_scroll_id:
+            url = urllib.parse.urlsplit(cmr_query)
+            clear_url = urllib.parse.urlunsplit((url.scheme, url.netloc,
+                posixpath.join('/search','clear-scroll'), '', ''))
+            try:
+                async with session.post(clear_url,
+                    json={'scroll_id': cmr_scroll_id}) as response:
+                    pass
+            except aiohttp.ClientError:
+                pass
+        if close_session:
+            await session.close()
+    # return the list of granule ids and urls
+    return (producer_granule_ids, granule_urls)
+
+# PURPOSE: asynchronously list a directory on NSIDC https server
+async def async_nsidc_list(HOST, username=None, password=None, auth=None,
+    session=None, semaphore=None, parser=None,
+    pattern='', sort=False):
+    """
+    Asynchronously list a directory on NSIDC
+
+    Arguments
+    ---------
+    HOST: remote https host path split as list
+
+    Keyword arguments
+    -----------------
+    username: NASA Earthdata username
+    password: NASA Earthdata password
+    auth: aiohttp basic authentication helper
+    session: aiohttp client session
+    semaphore: asyncio semaphore for limiting concurrent requests
+        (default is the semaphore shared by all requests)
+    parser: deprecated and unused (directory indexes are parsed
+        with a streaming parser)
+    pattern: regular expression pattern for reducing list
+    sort: sort output list
+
+    Returns
+    -------
+    colnames: list of column names in a directory
+    collastmod: list of last modification times for items in the directory
+    colerror: notification for list error
+    """
+    # warn if using the deprecated parser argument
+    _deprecated_parser(parser)
+    # use netrc credentials
+    if auth is None:
+        auth = async_credentials(username=username, password=password)
+    # create session if not provided
+    close_session = session is None
+    if close_session:
+        session = async_session()
+    # verify inputs for remote https host
+    if isinstance(HOST, str):
+        HOST = url_split(HOST)
+    # try listing from https
+    if semaphore is None:
+        semaphore = async_semaphore()
+    timer = TransferTimer('list', posixpath.join(*HOST))
+    try:
+        async with semaphore:
+            response = timer.response(await async_request(session,
+                posixpath.join(*HOST), auth=auth))
+            try:
+                content = await response.read()
+            finally:
+                response.release()
+    except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+        timer.finish(error=e)
+        colerror = 'List error from {0}'.format(posixpath.join(*HOST))
+        return (False,False,colerror)
+    else:
+        timer.finish(nbytes=len(content))
+        # read and parse request for files (column names and modified times)
+        colnames,collastmod = parse_index(io.BytesIO(content), columns='nsidc')
+        # reduce using regular expression pattern and sort the list
+        colnames,collastmod = reduce_listing(colnames, collastmod,
+            pattern=pattern, sort=sort)
+        # return the list of column names and last modified times
+        return (colnames,collastmod,None)
+    finally:
+        if close_session:
+            await session.close()
+
+# PURPOSE: asynchronously download a file from a NSIDC https server
+async def async_from_nsidc(HOST, username=None, password=None, auth=None,
+    session=None, semaphore=None, local=None, hash='', chunk=16384,
+    verbose=False, fid=sys.stdout, mode=0o775):
+    """
+    Asynchronously download a file from a NSIDC https server
+
+    Arguments
+    ---------
+    HOST: remote https host path split as list
+
+    Keyword arguments
+    -----------------
+    username: NASA Earthdata username
+    password: NASA Earthdata password
+    auth: aiohttp basic authentication helper
+    session: aiohttp client session
+    semaphore: asyncio semaphore for limiting concurrent requests
+        (default is the semaphore shared by all requests)
+    local: path to local file
+    hash: MD5 hash of local file
+    chunk: chunk size for transfer encoding
+    verbose: print file transfer information
+    fid: open file object to print if verbose
+    mode: permissions mode of output local file
+
+    Returns
+    -------
+    remote_buffer: BytesIO representation of file
+    response_error: notification for response error
+    """
+    # create logger
+    loglevel = logging.INFO if verbose else logging.CRITICAL
+    logging.basicConfig(stream=fid, level=loglevel)
+    # use netrc credentials
+    if auth is None:
+        auth = async_credentials(username=username, password=password)
+    # create session if not provided
+    close_session = session is None
+    if close_session:
+        session = async_session()
+    # verify inputs for remote https host
+    if isinstance(HOST, str):
+        HOST = url_split(HOST)
+    if semaphore is None:
+        semaphore = async_semaphore()
+    # run blocking file operations in the default executor
+    loop = asyncio.get_running_loop()
+    # stream to a temporary file next to the local file
+    local_file = None
+    if local:
+        # convert to absolute path
+        local = os.path.abspath(os.path.expanduser(local))
+        temp = '{0}.part'.format(local)
+        def open_temp():
+            # create directory if non-existent
+            if not os.access(os.path.dirname(local), os.F_OK):
+                os.makedirs(os.path.dirname(local), mode)
+            return open(temp, 'wb')
+        local_file = await loop.run_in_executor(None, open_temp)
+    # copy remote file contents to bytesIO object
+    remote_buffer = io.BytesIO()
+    # generate checksum hash for remote file while streaming
+    remote_hash = hashlib.md5()
+    # try downloading from https
+    timer = TransferTimer('download', posixpath.join(*HOST))
+    try:
+        async with semaphore:
+            response = timer.response(await async_request(session,
+                posixpath.join(*HOST), auth=auth))
+            try:
+                async for data in response.content.iter_chunked(chunk):
+                    remote_buffer.write(data)
+                    remote_hash.update(data)
+                    timer.event['bytes'] += len(data)
+                    if local_file is not None:
+                        await loop.run_in_executor(None, local_file.write,
+                            data)
+            finally:
+                response.release()
+    except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError,
+        OSError) as e:
+        timer.finish(error=e)
+        if local_file is not None:
+            local_file.close()
+            await loop.run_in_executor(None, os.remove, temp)
+        response_error = 'Download error from {0}'.format(posixpath.join(*HOST))
+        return (False,response_error)
+    else:
+        timer.finish()
+    finally:
+        if close_session:
+            await session.close()
+    # save file basename with bytesIO object
+    remote_buffer.seek(0)
+    remote_buffer.filename = HOST[-1]
+    if local_file is None:
+        return (remote_buffer,None)
+    # keep remote modification time of file and local access time
+    remote_mtime = get_unix_time(response.headers.get('Last-Modified', ''),
+        format='%a, %d %b %Y %H:%M:%S GMT')
+    def finalize():
+        local_file.close()
+        # compare checksums
+        if (hash == remote_hash.hexdigest()):
+            os.remove(temp)
+            return
+        # print file information
+        args = (posixpath.join(*HOST),local)
+        logging.info('{0} -->\n\t{1}'.format(*args))
+        os.replace(temp, local)
+        # change the permissions mode
+        os.chmod(local,mode)
+        if remote_mtime is not None:
+            os.utime(local, (os.stat(local).st_atime, remote_mtime))
+    await loop.run_in_executor(None, finalize)
+    # return the bytesIO object
+    return (remote_buffer,None)